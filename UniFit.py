@@ -1,7 +1,7 @@
 from __future__ import print_function
 import os
+import warnings
 from optparse import OptionParser
-from astropy.table import Table
 
 def makeCommand(cDict):
     """
@@ -33,12 +33,32 @@ parser.add_option("-c", "--config", dest="config", default=None,
                   help="Assign the config file for a list of objects.")
 parser.add_option("-p", "--path", dest="path", default=None,
                   help="Assign the path of the SED data for a list of objects.")
+parser.add_option("-j", "--jobs", dest="jobs", default="1",
+                  help="The number of objects in the list fitted at the same time, e.g., the number of cores.")
+parser.add_option("-t", "--timeout", dest="timeout", default=None,
+                  help="The maximum time (second) to fit one object of the list.")
+parser.add_option("-g", "--logpath", dest="logpath", default=None,
+                  help="Save the output of each object of the list in the path.")
+parser.add_option("-n", "--ranks", dest="ranks", default="1",
+                  help="The number of MPI processes to fit one object of the list, if ncores>1.")
+parser.add_option("--threads", dest="threads", default=None,
+                  help="Overwrite the threads of emcee in the config file for a list of objects.")
+parser.add_option("--resume", dest="resume", action="store_true", default=False,
+                  help="Continue the fitting from the last checkpoint.")
+parser.add_option("--manifest", dest="manifest", default=None,
+                  help="Track the objects of the list in the SQLite file, and continue the list from it.")
+parser.add_option("--retry", dest="retry", action="store_true", default=False,
+                  help="Fit the failed objects in the manifest again.")
 (options, args) = parser.parse_args()
-if options.list is None:
+if options.retry and (options.manifest is None):
+    parser.error("Option --retry only works with --manifest.")
+if (options.list is None) and (options.manifest is None):
     if not options.config is None:
         parser.error("Option -c only works with -l.")
     if not options.path is None:
         parser.error("Option -p only works with -l.")
+    if options.jobs != "1":
+        parser.error("Option -j only works with -l.")
 
 #->Determine whether use MPI or not.
 commandDict = {}
@@ -53,7 +73,7 @@ commandDict = {
 
 #->Determine whether to run a list of objects.
 targetList = options.list
-if targetList is None:
+if (targetList is None) and (options.manifest is None):
     commandDict["options"] = []
     commandDict["args"] = args
     if options.overwrite:
@@ -62,44 +82,63 @@ if targetList is None:
         commandDict["options"].append("-w")
     if options.refit: # Force to refit the objects
         commandDict["options"].append("-r")
+    if options.resume:
+        commandDict["options"].append("--resume")
     commandLine = makeCommand(commandDict)
     os.system(commandLine)
-else: #If the target list is provided, fit the targets one by one.
-    sedPath = options.path
-    if sedPath is None:
-        sedPath = ""
-    targTable = Table.read(targetList, format=options.list_format)
-    nameList  = targTable["Name"]
-    zList     = targTable["z"]
-    sedList   = targTable["sed"]
-    print("\n***There are {0} targets to fit!\n".format(len(nameList)))
-    for loop in range(len(nameList)):
-        targname = nameList[loop]
-        redshift = zList[loop]
-        if options.config is None:
-            try:
-                configName = targTable["config"][loop]
-            except:
-                raise RuntimeError("Fail to find the config file information.")
+else: #If the target list or the manifest is provided, fit the targets one by one.
+    if ncores == 1: #->Fit the targets in one process and fork for each target
+        from gsf_core import read_targetList, batch_fitter
+        sedPath = options.path
+        if sedPath is None:
+            sedPath = ""
+        if targetList is None: #->Only continue the targets in the manifest
+            taskList = []
         else:
-            configName = options.config
-        commandArgs = [configName, targname, "{0}".format(redshift)]
-        if "DL" in targTable.colnames:
-            distance = targTable["DL"][loop]
-            commandArgs.append("{0}".format(distance))
+            taskList = read_targetList(targetList, options.list_format, options.config, sedPath)
+        if options.manifest is None:
+            manifest = None
         else:
-            distance = None
-        sedFile = sedPath + sedList[loop]
-        commandArgs.append(sedFile)
-        #-> Add options
-        commandDict["options"] = ["-o"] #We need to overwrite the target info.
+            from gsf_manifest import BatchManifest
+            manifest = BatchManifest(options.manifest)
+        if not options.warning:
+            warnings.simplefilter("ignore")
+        jobs = eval(options.jobs)
+        if options.timeout is None:
+            timeout = None
+        else:
+            timeout = eval(options.timeout)
+        if options.threads is None:
+            threads = None
+        else:
+            threads = eval(options.threads)
+        logPath = options.logpath
+        if (not logPath is None) and (not logPath.endswith("/")):
+            logPath += "/"
+        batch_fitter(taskList, jobs, timeout, logPath, threads, options.refit,
+                     options.resume, manifest, options.retry)
+    else: #->Split the MPI processes into the groups to fit the targets
+        commandDict["options"] = ["-f", options.list_format, "-n", options.ranks]
+        if not targetList is None:
+            commandDict["options"] += ["-l", targetList]
+        if not options.manifest is None:
+            commandDict["options"] += ["--manifest", options.manifest]
+        if options.retry:
+            commandDict["options"].append("--retry")
+        if not options.config is None:
+            commandDict["options"] += ["-c", options.config]
+        if not options.path is None:
+            commandDict["options"] += ["-p", options.path]
+        if not options.logpath is None:
+            commandDict["options"] += ["-g", options.logpath]
+        if not options.threads is None:
+            commandDict["options"] += ["--threads", options.threads]
         if options.refit: # Force to refit the objects
             commandDict["options"].append("-r")
         if options.warning:
             commandDict["options"].append("-w")
-        commandDict["args"] = commandArgs
+        if options.resume:
+            commandDict["options"].append("--resume")
+        commandDict["args"] = []
         commandLine = makeCommand(commandDict)
-        try:
-            os.system(commandLine)
-        except:
-            print("***Fail to run:\n    '{0}'!".format(commandLine))
+        os.system(commandLine)
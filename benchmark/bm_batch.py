@@ -0,0 +1,60 @@
+#This script compares the cost of calculating the combined model of all the
+#walkers one by one with the batch evaluation.
+#
+#Usage: python benchmark/bm_batch.py [nwalkers]
+from __future__ import print_function
+import os
+import sys
+import numpy as np
+from time import time
+from collections import OrderedDict
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from sedfit.fitter import basicclass as bc
+
+def parameter(value, parRange):
+    return {"value": value, "range": parRange, "type": "c", "vary": True}
+
+if __name__ == "__main__":
+    if len(sys.argv) > 1:
+        nwalkers = int(sys.argv[1])
+    else:
+        nwalkers = 100
+    nloop = 20
+    wave = 10**np.linspace(-0.1, 7.0, 1000)
+    modelDict = OrderedDict()
+    modelDict["Hot_Dust"] = bc.ModelFunction("BlackBody", "wave",
+                                             {"logOmega": parameter(-20., [-25., -15.]),
+                                              "T": parameter(800., [300., 1500.])})
+    modelDict["Cold_Dust"] = bc.ModelFunction("Modified_BlackBody", "wave",
+                                              {"logM": parameter(8., [6., 10.]),
+                                               "beta": parameter(2., [1.5, 2.5]),
+                                               "T": parameter(30., [20., 70.])},
+                                              {"DL": 100., "z": 0.02, "frame": "rest"})
+    modelDict["Radio"] = bc.ModelFunction("Synchrotron", "wave",
+                                          {"Sn_alpha": parameter(0.7, [0., 2.]),
+                                           "Sn_logsf": parameter(1., [-2., 3.])})
+    modelDict["Power"] = bc.ModelFunction("Power_Law", "wave",
+                                          {"PL_alpha": parameter(1., [-2., 2.]),
+                                           "PL_logsf": parameter(-10., [-15., -5.])})
+    sedModel = bc.ModelCombiner(modelDict, wave)
+    parRange = np.array(sedModel.get_parVaryRanges())
+    parArray = parRange[:, 0] + np.random.rand(nwalkers, len(parRange)) * \
+               (parRange[:, 1] - parRange[:, 0])
+    #-> Loop over the walkers
+    t0 = time()
+    for loop in range(nloop):
+        fluxList = []
+        for params in parArray:
+            sedModel.updateParList(params)
+            fluxList.append(sedModel.combineResult())
+    t_loop = (time() - t0) / nloop * 1e3
+    #-> Batch evaluation
+    t0 = time()
+    for loop in range(nloop):
+        fluxBatch = sedModel.combineResult_batch(parArray)
+    t_batch = (time() - t0) / nloop * 1e3
+    #-> The results should be numerically identical.
+    assert np.allclose(np.array(fluxList), fluxBatch, rtol=1e-12, atol=0)
+    print("nwalkers: {0}, nwave: {1}".format(nwalkers, len(wave)))
+    print("loop (ms): {0:.2f}, batch (ms): {1:.2f}, speedup: {2:.1f}".format(t_loop,
+          t_batch, t_loop / t_batch))
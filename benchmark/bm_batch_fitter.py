@@ -0,0 +1,49 @@
+#This script compares fitting a list of targets with one "python gsf.py" per
+#target, as UniFit.py did, with batch_fitter(), which imports the configs and
+#the models once and forks a process for each target.  The targets are refitted
+#and the results are saved to the savepath of the config files.
+#
+#Usage: python benchmark/bm_batch_fitter.py [list] [sedpath] [jobs]
+from __future__ import print_function
+import os
+import sys
+import warnings
+from time import time
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from gsf_core import read_targetList, batch_fitter
+
+def fit_system(taskList):
+    """
+    Fit the targets one by one with gsf.py.
+    """
+    for task in taskList:
+        commandList = ["python gsf.py -o -r", task["config"], task["targname"],
+                       "{0}".format(task["redshift"])]
+        if not task["distance"] is None:
+            commandList.append("{0}".format(task["distance"]))
+        commandList.append(task["sedFile"])
+        os.system("{0} > /dev/null 2>&1".format(" ".join(commandList)))
+
+if __name__ == "__main__":
+    argv = sys.argv[1:] + [None] * 3
+    targetList = argv[0] or "targets.ipac"
+    sedPath    = argv[1] or ""
+    jobs       = int(argv[2] or 4)
+    warnings.simplefilter("ignore")
+    taskList = read_targetList(targetList, sedPath=sedPath)
+    nTask = len(taskList)
+    t0 = time()
+    fit_system(taskList)
+    tSystem = time() - t0
+    tBatch = {}
+    for j in sorted(set([1, jobs])):
+        t0 = time()
+        report = batch_fitter(taskList, jobs=j, logPath="bm_batch_logs/", refit=True)
+        tBatch[j] = time() - t0
+        assert all([r["status"] == "done" for r in report])
+    print("\nlist: {0}, targets: {1}".format(targetList, nTask))
+    print("{0:>16s} {1:>10s} {2:>14s}".format("mode", "time (s)", "targets/min"))
+    print("{0:>16s} {1:10.1f} {2:14.2f}".format("gsf.py", tSystem, nTask / tSystem * 60))
+    for j in sorted(tBatch.keys()):
+        print("{0:>16s} {1:10.1f} {2:14.2f}".format("batch, {0} jobs".format(j), tBatch[j],
+              nTask / tBatch[j] * 60))
@@ -0,0 +1,108 @@
+#This script validates the O(N) Matern-3/2 likelihood of the spectral residual
+#against george (or the dense matrix calculation if george is not installed),
+#and compares the time of the calculations for different number of data, and
+#for a batch of residuals (the walker ensemble) with the Matern32GP workspace.
+#
+#Usage: python benchmark/bm_gp_matern32.py [nmax_dense]
+from __future__ import print_function
+import os
+import sys
+import numpy as np
+from time import time
+from scipy.linalg import cho_factor, cho_solve
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from sedfit import fit_functions as sedff
+try:
+    import george
+    from george import kernels
+except ImportError:
+    george = None
+
+def lnlike_dense(x, r, yerr, a, tau):
+    """
+    The likelihood with the dense covariance matrix, the same as george.
+    """
+    r2 = (x[:, np.newaxis] - x[np.newaxis, :])**2 / tau
+    cov = a * (1 + np.sqrt(3 * r2)) * np.exp(-np.sqrt(3 * r2))
+    cov[np.diag_indices_from(cov)] += yerr**2
+    factor, lower = cho_factor(cov, lower=True)
+    lndet = 2 * np.sum(np.log(np.diag(factor)))
+    return -0.5 * (np.dot(r, cho_solve((factor, lower), r)) + lndet + len(x) * np.log(2 * np.pi))
+
+def lnlike_george(x, r, yerr, a, tau):
+    gp = george.GP(a * kernels.Matern32Kernel(tau))
+    gp.compute(x, yerr)
+    return gp.lnlikelihood(r)
+
+def mock_spectrum(n, seed=0):
+    """
+    Generate a spectrum-like data set with a few overlapping modules.
+    """
+    rng = np.random.RandomState(seed)
+    x = np.concatenate([np.sort(rng.uniform(5., 15., n//2)),
+                        np.sort(rng.uniform(14., 38., n - n//2))])
+    yerr = rng.uniform(0.05, 0.2, n)
+    r = np.sin(x) * 0.3 + rng.normal(0, yerr)
+    return x, r, yerr
+
+def timeit(func, args, nmin=3, tmin=0.2):
+    nloop = 0
+    t0 = time()
+    while (nloop < nmin) or (time() - t0 < tmin):
+        func(*args)
+        nloop += 1
+    return (time() - t0) / nloop * 1e3
+
+if __name__ == "__main__":
+    if len(sys.argv) > 1:
+        nmaxDense = int(sys.argv[1])
+    else:
+        nmaxDense = 3000
+    if george is None:
+        refName = "dense"
+        lnlike_ref = lnlike_dense
+    else:
+        refName = "george"
+        lnlike_ref = lnlike_george
+    #-> Validation
+    print("Validation against {0}:".format(refName))
+    for n in [10, 100, 1000]:
+        x, r, yerr = mock_spectrum(n, seed=n)
+        for a, tau in [(0.01, 0.1), (0.1, 4.0), (1.0, 100.0)]:
+            l0 = lnlike_ref(x, r, yerr, a, tau)
+            l1 = sedff.Matern32_lnlikelihood(x, r, yerr, a, tau)
+            print("N={0:5d} a={1:5.2f} tau={2:6.1f}: {3:.10e} {4:.10e} ({5:.1e})".format(n, a,
+                  tau, l0, l1, abs(l1 - l0) / abs(l0)))
+    #-> Scaling
+    print("\nTime (ms), numba: {0}".format(sedff.njit is not None))
+    print("{0:>6s} {1:>12s} {2:>12s}".format("N", "O(N)", refName))
+    for n in [100, 300, 1000, 3000, 10000]:
+        x, r, yerr = mock_spectrum(n)
+        args = (x, r, yerr, 0.1, 4.0)
+        tFast = timeit(sedff.Matern32_lnlikelihood, args)
+        if n <= nmaxDense:
+            tRef = "{0:12.3f}".format(timeit(lnlike_ref, args))
+        else:
+            tRef = "{0:>12s}".format("-")
+        print("{0:6d} {1:12.3f} {2}".format(n, tFast, tRef))
+    #-> Batch of walkers
+    nBatch = 64
+    print("\nTime (ms) of {0} residuals".format(nBatch))
+    print("{0:>6s} {1:>12s} {2:>12s} {3:>10s}".format("N", "loop", "batch", "max diff"))
+    for n in [100, 300, 1000, 3000]:
+        x, r, yerr = mock_spectrum(n)
+        rng = np.random.RandomState(n)
+        rArray = r + rng.normal(0, 0.1, (nBatch, n))
+        eArray = yerr * rng.uniform(1., 2., (nBatch, n))
+        aArray = 10**rng.uniform(-2, 0, nBatch)
+        tauArray = 10**rng.uniform(-1, 2, nBatch)
+        def lnlike_loop():
+            return np.array([sedff.Matern32_lnlikelihood(x, rArray[i], eArray[i], aArray[i],
+                             tauArray[i]) for i in range(nBatch)])
+        gp = sedff.Matern32GP(x)
+        l0 = lnlike_loop()
+        l1 = gp.lnlikelihood(rArray, eArray, aArray, tauArray)
+        tLoop = timeit(lnlike_loop, ())
+        tBatch = timeit(gp.lnlikelihood, (rArray, eArray, aArray, tauArray))
+        print("{0:6d} {1:12.3f} {2:12.3f} {3:10.1e}".format(n, tLoop, tBatch,
+              np.max(np.abs(l1 - l0) / np.abs(l0))))
@@ -0,0 +1,59 @@
+#This script compares the ln probability evaluations of the burn-in from the
+#prior with those of the MAP optimization and the burn-in from the ball around
+#the MAP position, on the data and model of a config file.  The burn-in ends
+#when the median ln probability of the walkers is within ndim of the MAP.
+#
+#Usage: python benchmark/bm_map.py [config] [nwalkers] [maxsteps] [nstart] [method] [ball-r]
+from __future__ import print_function
+import os
+import sys
+import numpy as np
+from time import time
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from bm_worker_pool import load_config
+
+def burnin_steps(em, p0, maxsteps, lnpTarget):
+    """
+    Run the sampler from p0 until the median ln probability of the walkers
+    reaches lnpTarget, and return the number of steps.
+    """
+    for i, (pos, lnprob, rstate) in enumerate(em.sampler.sample(p0, iterations=maxsteps,
+                                                                storechain=False)):
+        if np.median(lnprob) >= lnpTarget:
+            return i + 1
+    return np.inf
+
+if __name__ == "__main__":
+    argv = sys.argv[1:] + [None] * 6
+    configName = argv[0] or "examples/config_example_pht.py"
+    nwalkers   = int(argv[1] or 100)
+    maxsteps   = int(argv[2] or 3000)
+    nstart     = int(argv[3] or 16)
+    method     = argv[4] or "L-BFGS-B"
+    ballR      = float(argv[5] or 0.01)
+    sedData, sedModel, unctDict = load_config(configName)
+    from sedfit.mcmc import mcmc_emcee as mcmc
+    em = mcmc.EmceeModel(sedData, sedModel, unctDict is not None, unctDict,
+                         "EnsembleSampler", random=0)
+    em.EnsembleSampler(nwalkers)
+    ndim = len(em.get_priorArrays()[0])
+    #-> MAP
+    t0 = time()
+    pmap, lnpmap, nfev = em.p_map(nstart, method)
+    tMap = time() - t0
+    lnpTarget = lnpmap - ndim
+    #-> Burn-in from the prior and from the MAP ball
+    t0 = time()
+    nPrior = burnin_steps(em, em.p_prior(), maxsteps, lnpTarget)
+    tPrior = time() - t0
+    em.reset()
+    t0 = time()
+    nBall = burnin_steps(em, em.p_ball(pmap, ratio=ballR), maxsteps, lnpTarget)
+    tBall = time() - t0
+    print("config: {0}, nwalkers: {1}, ndim: {2}".format(configName, nwalkers, ndim))
+    print("MAP ({0}, {1} starts): lnprob {2:.3e}, {3} evaluations, {4:.1f} s".format(method,
+          nstart, lnpmap, nfev, tMap))
+    print("{0:>10s} {1:>10s} {2:>12s} {3:>10s}".format("start", "steps", "evaluations", "time (s)"))
+    print("{0:>10s} {1:>10} {2:>12} {3:10.1f}".format("prior", nPrior, nPrior * nwalkers, tPrior))
+    print("{0:>10s} {1:>10} {2:>12} {3:10.1f}".format("MAP", nBall, nfev + nBall * nwalkers,
+          tMap + tBall))
@@ -0,0 +1,65 @@
+#This script compares the per-call cost of the ModelFunction with the previous
+#implementation, which used exec to call the model function every time.
+#
+#Usage: python benchmark/bm_modelfunction.py [ncall]
+from __future__ import print_function
+import os
+import sys
+import numpy as np
+from time import time
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from sedfit.fitter import basicclass as bc
+from sedfit import model_functions as sedmf
+
+def legacy_call(mf, x):
+    """
+    The ModelFunction.__call__() before the call plan is introduced.
+    """
+    kwargs = {}
+    kwargs[mf.xName] = x
+    for parName in mf.parFitDict.keys():
+        kwargs[parName] = mf.parFitDict[parName]["value"]
+    for parName in mf.parAddDict.keys():
+        kwargs[parName] = mf.parAddDict[parName]
+    exec "y = sedmf.{0}(**kwargs)".format(mf.get_function_name())
+    return y
+
+def parameter(value):
+    return {"value": value, "range": [-1e3, 1e3], "type": "c", "vary": True}
+
+if __name__ == "__main__":
+    if len(sys.argv) > 1:
+        ncall = int(sys.argv[1])
+    else:
+        ncall = 20000
+    wave = 10**np.linspace(-0.1, 3.0, 1000)
+    mfDict = {
+        "BlackBody": bc.ModelFunction("BlackBody", "wave",
+                                      {"logOmega": parameter(-20.),
+                                       "T": parameter(800.)}),
+        "Modified_BlackBody": bc.ModelFunction("Modified_BlackBody", "wave",
+                                               {"logM": parameter(8.),
+                                                "beta": parameter(2.),
+                                                "T": parameter(30.)},
+                                               {"DL": 100., "z": 0.02,
+                                                "frame": "rest"}),
+        "Power_Law": bc.ModelFunction("Power_Law", "wave",
+                                      {"PL_alpha": parameter(1.),
+                                       "PL_logsf": parameter(-10.)}),
+    }
+    print("{0:20s} {1:>12s} {2:>12s} {3:>12s}".format("Model", "exec (us)",
+          "plan (us)", "saved (us)"))
+    for funcName in mfDict.keys():
+        mf = mfDict[funcName]
+        #-> The results should be numerically identical.
+        assert np.array_equal(legacy_call(mf, wave), mf(wave))
+        t0 = time()
+        for loop in range(ncall):
+            legacy_call(mf, wave)
+        t_exec = (time() - t0) / ncall * 1e6
+        t0 = time()
+        for loop in range(ncall):
+            mf(wave)
+        t_plan = (time() - t0) / ncall * 1e6
+        print("{0:20s} {1:12.2f} {2:12.2f} {3:12.2f}".format(funcName, t_exec,
+              t_plan, t_exec - t_plan))
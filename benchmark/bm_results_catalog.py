@@ -0,0 +1,72 @@
+#This script compares reading the median of one parameter of many targets from
+#the fitrs files with reading it from the ResultCatalog.  The copies of a fitrs
+#file are saved as the targets in a temporary directory and moved to the
+#catalog with postprocess/fitrs2catalog.py.
+#
+#Usage: python benchmark/bm_results_catalog.py fitrs [ntarget]
+from __future__ import print_function
+import os
+import sys
+import glob
+import shutil
+import tempfile
+import subprocess
+import numpy as np
+import cPickle as pickle
+from time import time
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from sedfit.mcmc import mcmc_emcee as mcmc
+
+if __name__ == "__main__":
+    fitrsFile = sys.argv[1]
+    if len(sys.argv) > 2:
+        nTarget = int(sys.argv[2])
+    else:
+        nTarget = 1000
+    fp = open(fitrsFile, "r")
+    fitrs = pickle.load(fp)
+    fp.close()
+    summary = mcmc.summarize_fitrs(fitrs)
+    parKey = summary["parKeys"][0]
+    parIndex = 0
+    tempPath = tempfile.mkdtemp()
+    try:
+        for loop in range(nTarget):
+            fitrs["dataPck"]["targname"] = "T{0:05d}".format(loop)
+            fp = open("{0}/T{1:05d}.fitrs".format(tempPath, loop), "w")
+            pickle.dump(fitrs, fp)
+            fp.close()
+        catalogName = "{0}/catalog.hdf5".format(tempPath)
+        t0 = time()
+        root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+        env = dict(os.environ, PYTHONPATH=root)
+        subprocess.check_call([sys.executable, "fitrs2catalog.py", catalogName] +
+                              sorted(glob.glob("{0}/*.fitrs".format(tempPath))),
+                              cwd="{0}/postprocess".format(root), env=env,
+                              stdout=open(os.devnull, "w"))
+        tMigrate = time() - t0
+        #-> Read the median from the fitrs files
+        t0 = time()
+        pFitrs = []
+        for fileName in sorted(glob.glob("{0}/*.fitrs".format(tempPath))):
+            fp = open(fileName, "r")
+            pFitrs.append(np.percentile(pickle.load(fp)["posterior_sample"][:, parIndex], 50))
+            fp.close()
+        tFitrs = time() - t0
+        #-> Read the median from the catalog
+        t0 = time()
+        pCatalog = mcmc.ResultCatalog(catalogName).load_parameter(parKey, "center")
+        tCatalog = time() - t0
+        assert np.allclose(pFitrs, pCatalog)
+        sizeFitrs = os.path.getsize(fitrsFile) * nTarget / 1024.**2
+        catalog = mcmc.ResultCatalog(catalogName)
+        sizeCatalog = os.path.getsize(catalogName)
+        for targname in catalog.get_targets():
+            sizeCatalog += os.path.getsize(catalog.get_targetFile(targname))
+        sizeCatalog /= 1024.**2
+    finally:
+        shutil.rmtree(tempPath)
+    print("targets: {0}, parameter: {1}".format(nTarget, parKey))
+    print("fitrs files: {0:.1f} MB, catalog: {1:.1f} MB, migration: {2:.1f} s".format(sizeFitrs,
+          sizeCatalog, tMigrate))
+    print("read the median, fitrs: {0:.3f} s, catalog: {1:.4f} s".format(tFitrs, tCatalog))
@@ -0,0 +1,59 @@
+#This script compares the nearest template lookup with the KDTree and the grid
+#index on rectilinear grids like those of the templates in the project.
+#
+#Usage: python benchmark/bm_template_index.py [ncall]
+from __future__ import print_function
+import os
+import sys
+import itertools
+import numpy as np
+from time import time
+from sklearn.neighbors import KDTree
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from sedfit.fitter.template import Template
+
+#-> The grids similar to the templates.
+gridDict = {
+    "DL07 (umin, umax, qpah)": [10**np.linspace(-1, 1.4, 23), [1e6], np.linspace(0.47, 4.58, 7)],
+    "BC03 (age)": [10**np.linspace(-2.5, 1.1, 200)],
+    "CAT3D (a, theta, N0, i)": [np.linspace(-2.5, -0.25, 10), [15, 30, 45, 60],
+                                np.linspace(5, 10, 6), np.linspace(0, 90, 7)],
+    "dust_xl (type, size)": [[0, 1], np.linspace(0.01, 10, 100)],
+}
+
+if __name__ == "__main__":
+    if len(sys.argv) > 1:
+        ncall = int(sys.argv[1])
+    else:
+        ncall = 5000
+    nbatch = 100
+    print("{0:26s} {1:>10s} {2:>10s} {3:>12s} {4:>12s}".format("Grid", "KDTree(us)",
+          "grid (us)", "KDTree-b(us)", "grid-b (us)"))
+    for gridName in gridDict.keys():
+        axes = gridDict[gridName]
+        parList = [list(p) for p in itertools.product(*axes)]
+        tckList = [None] * len(parList) # The splines are not used here.
+        tKDT = Template(tckList, KDTree(np.array(parList)), parList)
+        tKDT._Template__gridAxes = None # Force to use the KDTree
+        tGrid = Template(tckList, KDTree(np.array(parList)), parList)
+        assert tGrid._Template__gridAxes is not None
+        pMin = np.array([np.min(a) for a in axes])
+        pMax = np.array([np.max(a) for a in axes])
+        pars = pMin + (pMax - pMin) * np.random.rand(ncall, len(axes))
+        #-> The results should be identical.
+        for p in pars[:1000]:
+            assert tKDT.get_nearestIndex(list(p)) == tGrid.get_nearestIndex(list(p))
+        pBatch = [pars[:nbatch, loop] for loop in range(len(axes))]
+        assert np.array_equal(tKDT.get_nearestIndex(pBatch), tGrid.get_nearestIndex(pBatch))
+        timeList = []
+        for t in [tKDT, tGrid]:
+            t0 = time()
+            for p in pars:
+                t.get_nearestIndex(list(p))
+            timeList.append((time() - t0) / ncall * 1e6)
+        for t in [tKDT, tGrid]:
+            t0 = time()
+            for loop in range(ncall // nbatch):
+                t.get_nearestIndex(pBatch)
+            timeList.append((time() - t0) / (ncall // nbatch) * 1e6)
+        print("{0:26s} {1:10.2f} {2:10.2f} {3:12.2f} {4:12.2f}".format(gridName, *timeList))
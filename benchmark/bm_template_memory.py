@@ -0,0 +1,121 @@
+#This script measures the memory of the templates in several processes, as the
+#MPI ranks or the emcee workers, with the private templates (pickled template
+#baked in each process) and with the shared templates (template store and the
+#baked fluxes mapped from a shared directory).
+#
+#Usage: python benchmark/bm_template_memory.py [nproc] [ntemplate]
+from __future__ import print_function
+import os
+import sys
+import shutil
+import tempfile
+import subprocess
+import numpy as np
+import cPickle as pickle
+from scipy.interpolate import splrep
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from sedfit.fitter import template as tp
+
+def get_memory():
+    """
+    Return the RSS and the PSS (MB) of the current process.  The PSS counts
+    the shared pages divided by the number of processes using them.
+    """
+    memDict = {"Rss": 0., "Pss": 0.}
+    if os.path.isfile("/proc/self/smaps_rollup"):
+        smapsPath = "/proc/self/smaps_rollup"
+    else:
+        smapsPath = "/proc/self/smaps"
+    for line in open(smapsPath):
+        items = line.split()
+        if items[0][:-1] in memDict:
+            memDict[items[0][:-1]] += float(items[1]) / 1024.
+    return memDict["Rss"], memDict["Pss"]
+
+def make_templates(workDir, ntemplate, nwave=2000):
+    """
+    Generate the synthetic templates in a pickle file and a template store.
+    """
+    wave = 10**np.linspace(-1, 3, nwave)
+    tckList = []
+    parList = []
+    for loop in range(ntemplate):
+        flux = np.exp(-(np.log10(wave) - 2. * loop / ntemplate)**2) + 1.
+        tckList.append(splrep(wave, flux))
+        parList.append([loop])
+    tmpltDict = {"tckList": tckList, "kdTree": None, "parList": parList,
+                 "modelInfo": {}, "parFormat": ["n"], "readMe": "Synthetic"}
+    fp = open(os.path.join(workDir, "synthetic.tmplt"), "wb")
+    pickle.dump(tmpltDict, fp, protocol=2)
+    fp.close()
+    tp.dump_store(tmpltDict, os.path.join(workDir, "synthetic.tstore"))
+    return wave
+
+def worker(mode, workDir, shareDir):
+    """
+    Load and bake the template like a rank, and report the memory before,
+    after, and when all the ranks have loaded the template.
+    """
+    wave = 10**np.linspace(-0.5, 2.5, 1000)
+    memBefore = get_memory()
+    if mode == "private":
+        fp = open(os.path.join(workDir, "synthetic.tmplt"), "rb")
+        t = tp.Template(**pickle.load(fp))
+        fp.close()
+        t.bake(wave)
+    else:
+        t = tp.load_template(os.path.join(workDir, "synthetic"))
+        t.bake(wave, shareDir=shareDir)
+    for loop in range(len(t.get_parList())):
+        t(wave, [loop])
+    memAfter = get_memory()
+    print(*(memBefore + memAfter))
+    sys.stdout.flush()
+    sys.stdin.readline() # Wait until all the ranks are loaded
+    print(*get_memory())
+    sys.stdout.flush()
+
+def run(mode, nproc, workDir, shareDir):
+    procList = [subprocess.Popen([sys.executable, os.path.abspath(__file__), "--worker",
+                                  mode, workDir, shareDir], stdin=subprocess.PIPE,
+                                 stdout=subprocess.PIPE) for loop in range(nproc)]
+    memList = [[float(v) for v in p.stdout.readline().split()] for p in procList]
+    for p in procList:
+        p.stdin.write("\n")
+        p.stdin.flush()
+    for loop, p in enumerate(procList):
+        memList[loop] += [float(v) for v in p.stdout.readline().split()]
+        p.wait()
+    print("[{0}]".format(mode))
+    print("{0:>6s} {1:>12s} {2:>12s} {3:>12s}".format("rank", "RSS before",
+          "RSS after", "PSS all"))
+    for loop, mem in enumerate(memList):
+        print("{0:6d} {1:12.1f} {2:12.1f} {3:12.1f}".format(loop, mem[0], mem[2], mem[5]))
+    print("{0:>6s} {1:12.1f} {2:12.1f} {3:12.1f}".format("total", *np.sum(memList, axis=0)[[0, 2, 5]]))
+
+if __name__ == "__main__":
+    if (len(sys.argv) > 1) and (sys.argv[1] == "--worker"):
+        worker(*sys.argv[2:5])
+        sys.exit(0)
+    if len(sys.argv) > 1:
+        nproc = int(sys.argv[1])
+    else:
+        nproc = 4
+    if len(sys.argv) > 2:
+        ntemplate = int(sys.argv[2])
+    else:
+        ntemplate = 5000
+    if os.path.isdir("/dev/shm"):
+        shmDir = "/dev/shm"
+    else:
+        shmDir = None
+    workDir = tempfile.mkdtemp()
+    shareDir = tempfile.mkdtemp(dir=shmDir)
+    try:
+        make_templates(workDir, ntemplate)
+        print("{0} processes, {1} templates (MB)".format(nproc, ntemplate))
+        run("private", nproc, workDir, shareDir)
+        run("shared", nproc, workDir, shareDir)
+    finally:
+        shutil.rmtree(workDir)
+        shutil.rmtree(shareDir)
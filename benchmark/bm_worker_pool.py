@@ -0,0 +1,77 @@
+#This script compares the threads of emcee, which send the data and model with
+#every walker, with the WorkerPool, which sends them to the processes once, on
+#the data and model of a config file.  The two samplers start from the same
+#positions and random state, so the chains should be identical.
+#
+#Usage: python benchmark/bm_worker_pool.py [config] [threads] [nwalkers] [nsteps]
+from __future__ import print_function
+import os
+import sys
+import numpy as np
+import cPickle as pickle
+from time import time
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from gsf_core import configImporter
+import sedfit.SED_Toolkit as sedt
+
+def load_config(configName):
+    """
+    Setup the data and model of the config file as gsf_fitter().
+    """
+    config = configImporter(configName)
+    from sedfit import sedclass as sedsc
+    from sedfit import model_functions as sedmf
+    from sedfit.sedmodel import SedModel
+    sedPck = sedt.Load_SED(config.sedFile)
+    sedData = sedsc.setSedData(config.targname, config.redshift, config.distance,
+                               config.dataDict, sedPck, True)
+    try:
+        parAddDict_all = config.parAddDict_all
+    except:
+        parAddDict_all = {}
+    parAddDict_all["DL"]    = sedData.dl
+    parAddDict_all["z"]     = config.redshift
+    parAddDict_all["frame"] = "rest"
+    funcLib = sedmf.load_models(config.modelDict)
+    sedModel = SedModel(config.modelDict, funcLib, config.waveModel, parAddDict_all)
+    return sedData, sedModel, config.unctDict
+
+def run(mode, sedData, sedModel, unctDict, threads, nwalkers, nsteps):
+    from sedfit.mcmc import mcmc_emcee as mcmc
+    em = mcmc.EmceeModel(sedData, sedModel, unctDict is not None, unctDict, "EnsembleSampler")
+    if mode == "threads":
+        pool = None
+        sampler = em.EnsembleSampler(nwalkers, threads=threads)
+    else:
+        pool = mcmc.WorkerPool(sedData, sedModel, threads)
+        sampler = em.EnsembleSampler(nwalkers, pool=pool)
+    np.random.seed(0)
+    sampler.random_state = np.random.RandomState(1).get_state()
+    p0 = np.array([em.from_prior() for i in range(nwalkers)])
+    t0 = time()
+    sampler.run_mcmc(p0, nsteps)
+    t = (time() - t0) / nsteps * 1e3
+    if pool is None:
+        sampler.pool.close()
+    else:
+        pool.close()
+    return t, sampler.chain
+
+if __name__ == "__main__":
+    argv = sys.argv[1:] + [None] * 4
+    configName = argv[0] or "examples/config_example_pht.py"
+    threads    = int(argv[1] or 4)
+    nwalkers   = int(argv[2] or 100)
+    nsteps     = int(argv[3] or 20)
+    sedData, sedModel, unctDict = load_config(configName)
+    argSize = len(pickle.dumps([sedData, sedModel, unctDict is not None, unctDict], 2))
+    print("config: {0}".format(configName))
+    print("threads: {0}, nwalkers: {1}, nsteps: {2}".format(threads, nwalkers, nsteps))
+    print("pickled data and model: {0:.1f} kB per walker with threads".format(argSize / 1024.))
+    tThreads, chainThreads = run("threads", sedData, sedModel, unctDict, threads,
+                                 nwalkers, nsteps)
+    tPool, chainPool = run("workerpool", sedData, sedModel, unctDict, threads,
+                           nwalkers, nsteps)
+    assert np.array_equal(chainThreads, chainPool)
+    print("threads (ms/step): {0:.2f}, workerpool (ms/step): {1:.2f}, speedup: {2:.1f}".format(
+          tThreads, tPool, tThreads / tPool))
@@ -146,6 +146,12 @@ modelDict = OrderedDict(
         ),
     )
 )
+bakeDict = {
+    "bake": True, #Precalculate the template fluxes on the model wavelength
+    "maxMemory": 1024, #The maximum memory (MB) of each baked template
+    "shareDir": None, #The directory (e.g., "/dev/shm") to share the baked templates among the processes of a fitting, in a subdirectory removed after the fitting
+}
+cacheSize = 0 #The number of the model component results to cache, 0 to disable
 parTruth = None  #Whether to provide the truth of the model
 modelUnct = True #Whether to consider the model uncertainty in the fitting
 unctDict = OrderedDict(
@@ -189,6 +195,7 @@ final = OrderedDict(
         ("iteration", [1000]), #[1000, 600]),
         ("thin"     , 1),
         ("ball-r"   , 0.01),
+        ("converge" , None), #E.g., {"check": 100, "ntau": 50, "dtau": 0.01, "maxiter": 3000}, stop with the autocorrelation time.
     )
 )
 setup = OrderedDict(
@@ -198,6 +205,12 @@ setup = OrderedDict(
         ("pslow"    , 16),
         ("pscenter" , 50),
         ("pshigh"   , 84),
+        ("vectorize", False), #Calculate the models of all the walkers at once
+        ("workerpool", False), #Send the data and model to the threads only once
+        ("linearAmp", False), #Solve the amplitudes of the models instead of sampling them
+        ("checkpoint", 0), #The steps to save the chains for the resume, 0 to turn off
+        ("seed"     , None), #The seed of the initial positions and the samplers
+        ("map"      , None), #E.g., {"nstart": 16, "method": "L-BFGS-B", "ball-r": 0.01}, start around the MAP position
     )
 )
 emceeDict = OrderedDict(
@@ -218,4 +231,5 @@ ppDict = {
     "high"    : 84,
     "nuisance": True, #False, #
     "fraction": 0, #The fraction of walkers to be dropped.
+    "catalog" : None, #E.g., "catalog.hdf5", collect the results in the save path instead of the fitrs files.
 }
@@ -16,6 +16,8 @@ parser.add_option("-o", "--overwrite", dest="overwrite",
                   help="Overwrite the object information with the command-line inputs.")
 parser.add_option("-r", "--refit", dest="refit", action="store_true", default=False,
                   help="Refit the SED though there is a result found.")
+parser.add_option("--resume", dest="resume", action="store_true", default=False,
+                  help="Continue the fitting from the last checkpoint.")
 (options, args) = parser.parse_args()
 if len(args) == 0:
     raise AssertionError("The config file is not specified!")
@@ -30,6 +32,7 @@ if options.refit:
     refit = True
 else:
     refit = False
+resume = options.resume
 
 #The starter of this module#
 #--------------------------#
@@ -44,7 +47,7 @@ len_args = len(args)
 if not options.overwrite:
     if len_args > 1:
         print("**Warning[UniFit]: there are more arguments may not be used...")
-    gsf_fitter(configName, refit=refit)
+    gsf_fitter(configName, refit=refit, resume=resume)
 else:
     if len_args < 4:
         raise AssertionError("The object information is lacking!")
@@ -60,4 +63,5 @@ else:
         sedFile  = args[4]
     else:
         print("**Warning[UniFit]: there are more arguments may not be used...")
-    gsf_fitter(configName, targname, redshift, distance, sedFile, refit=refit)
+    gsf_fitter(configName, targname, redshift, distance, sedFile, refit=refit,
+               resume=resume)
@@ -9,15 +9,22 @@ plt.rc('font',family='Times New Roman')
 import os
 import sys
 import types
+import shutil
+import signal
+import socket
+import tempfile
+import traceback
 import numpy as np
-import importlib
-from time import time
+import imp
+import hashlib
+import multiprocessing
+from time import time, sleep
 import cPickle as pickle
-from sedfit.dir_list import root_path
 import sedfit.SED_Toolkit as sedt
 from sedfit.mcmc import mcmc_emcee as mcmc
 
-__all__ = ["configImporter", "fitter", "gsf_fitter"]
+__all__ = ["configImporter", "fitter", "gsf_fitter", "read_targetList",
+           "batch_fitter", "mpi_batch_fitter"]
 
 def configImporter(configfile):
     """
@@ -35,16 +42,24 @@ def configImporter(configfile):
 
     Notes
     -----
-    None.
+    The module is named by the absolute path of the file, so the config files
+    of the same name in different directories are different modules in one
+    process (e.g., batch_fitter()), and a file is only imported once.
     """
-    pathList = configfile.split("/")
-    configPath = "/".join(pathList[0:-1])
-    sys.path.append(configPath)
-    configName = pathList[-1].split(".")[0]
-    config = importlib.import_module(configName)
+    configFile = os.path.abspath(configfile)
+    configPath, fileName = os.path.split(configFile)
+    #-> The config file may import the modules in its directory
+    if not configPath in sys.path:
+        sys.path.append(configPath)
+    moduleName = "gsf_config_{0}_{1}".format(fileName.split(".")[0],
+                                             hashlib.md5(configFile).hexdigest()[:8])
+    if moduleName in sys.modules:
+        return sys.modules[moduleName]
+    config = imp.load_source(moduleName, configFile)
     return config
 
-def fitter(sedData, sedModel, unctDict, parTruth, emceeDict, mpi_pool=None):
+def fitter(sedData, sedModel, unctDict, parTruth, emceeDict, mpi_pool=None,
+           backend=None):
     """
     This function is run the SED fitting with the MCMC method.
 
@@ -69,6 +84,9 @@ def fitter(sedData, sedModel, unctDict, parTruth, emceeDict, mpi_pool=None):
         The dict containing the parameters for emcee to sample the parameter space.
     mpi_pool : (optional) emcee.mpi_pool.MPIPool object
         The pool of MPI to run, if provided.
+    backend : (optional) ChainBackend object
+        The file to save the runs at the checkpoints, and the finished runs and
+        the last checkpoint are loaded from the file, if provided.
 
     Returns
     -------
@@ -77,7 +95,8 @@ def fitter(sedData, sedModel, unctDict, parTruth, emceeDict, mpi_pool=None):
 
     Notes
     -----
-    None.
+    With the linearAmp option, the amplitudes of sedModel are not varying
+    until em.recover_amplitudes(), or after the fitting fails.
     """
     #->Prepare to run the iteration
     t0 = time()
@@ -93,67 +112,128 @@ def fitter(sedData, sedModel, unctDict, parTruth, emceeDict, mpi_pool=None):
     psLow     = emceeDict["Setup"]["pslow"]
     psCenter  = emceeDict["Setup"]["pscenter"]
     psHigh    = emceeDict["Setup"]["pshigh"]
-    #->Start the iteration
-    runList = emceeDict.keys()
-    runList.remove("Setup")
-    for loop_run in range(len(runList)):
-        runName = runList[loop_run]
-        #->Print the fitting stage.
-        runDict = emceeDict[runName]
-        runKeys = runDict.keys()
-        SamplerType = runDict.get("sampler", "EnsembleSampler")
-        nwalkers    = runDict.get("nwalkers", 100)
-        iteration   = runDict.get("iteration", [500, 500])
-        thin        = runDict.get("thin", 1)
-        ballR       = runDict.get("ball-r", 0.1)
-        print( "\n#{:-^50}#".format( " {0} ".format(runName) ) )
-        if (SamplerType == "EnsembleSampler") & ("ntemps" in runKeys):
-            runKeys.remove("ntemps")
-        for keys in runKeys:
-            print("{0}: {1}".format(keys, runDict[keys]))
-        #->Setup the sampler
-        if unctDict is None:
-            modelUnct = False
+    vectorize = emceeDict["Setup"].get("vectorize", False)
+    if vectorize & (not mpi_pool is None):
+        print("**The vectorize option is ignored in the MPI mode")
+        vectorize = False
+    #->The walkers are calculated together in this process with vectorize
+    if vectorize:
+        samplerThreads = 1
+        if threads > 1:
+            print("**The threads are only used by the MAP with the vectorize option")
+    else:
+        samplerThreads = threads
+    #->The processes keep the data and model, instead of receiving them with every walker
+    workerPool = emceeDict["Setup"].get("workerpool", False)
+    workerPool = workerPool & (mpi_pool is None) & (not vectorize) & (threads > 1)
+    #->Solve the linear amplitudes instead of sampling them
+    linearAmp = emceeDict["Setup"].get("linearAmp", False)
+    if linearAmp:
+        sedModel.set_linearAmp(QuietMode=False)
+    #->The amplitudes are put back to the caller's model if the fitting fails
+    pool = mpi_pool
+    try:
+        if workerPool:
+            pool = mcmc.WorkerPool(sedData, sedModel, threads)
+        #->The random number generator of the initial positions
+        seed = emceeDict["Setup"].get("seed", None)
+        if seed is None:
+            random = None
         else:
-            modelUnct = True
-        em = mcmc.EmceeModel(sedData, sedModel, modelUnct, unctDict, SamplerType)
-        if SamplerType == "EnsembleSampler":
-            if mpi_pool is None:
-                sampler = em.EnsembleSampler(nwalkers, threads=threads)
-            else:
-                sampler = em.EnsembleSampler(nwalkers, pool=mpi_pool)
-            if loop_run == 0: #If it is the first iteration, the initial position of the walkers are set.
-                p0 = [em.from_prior() for i in range(nwalkers)]
-            else:
-                p0 = em.p_ball(pcen, ratio=ballR)
-        elif SamplerType == "PTSampler":
-            ntemps = runDict["ntemps"]
-            if mpi_pool is None:
-                sampler = em.PTSampler(ntemps, nwalkers, threads=threads)
-            else:
-                sampler = em.PTSampler(ntemps, nwalkers, pool=mpi_pool)
-            if loop_run == 0:#If it is the first iteration, the initial position of the walkers are set.
-                p0 = []
-                for i in range(ntemps):
-                    p0.append([em.from_prior() for i in range(nwalkers)])
+            random = np.random.RandomState(seed)
+        #->Find the MAP position to start the first stage, unless the runs are resumed
+        mapDict = emceeDict["Setup"].get("map", None)
+        if (not backend is None) and (len(backend.get_runNames()) > 0):
+            mapDict = None
+        #->Start the iteration
+        runLog = [] # The records of all the runs
+        runList = emceeDict.keys()
+        runList.remove("Setup")
+        for loop_run in range(len(runList)):
+            runName = runList[loop_run]
+            #->Print the fitting stage.
+            runDict = emceeDict[runName]
+            runKeys = runDict.keys()
+            SamplerType = runDict.get("sampler", "EnsembleSampler")
+            nwalkers    = runDict.get("nwalkers", 100)
+            iteration   = runDict.get("iteration", [500, 500])
+            thin        = runDict.get("thin", 1)
+            ballR       = runDict.get("ball-r", 0.1)
+            converge    = runDict.get("converge", None)
+            print( "\n#{:-^50}#".format( " {0} ".format(runName) ) )
+            if (SamplerType == "EnsembleSampler") & ("ntemps" in runKeys):
+                runKeys.remove("ntemps")
+            for keys in runKeys:
+                print("{0}: {1}".format(keys, runDict[keys]))
+            #->Setup the sampler
+            if unctDict is None:
+                modelUnct = False
             else:
+                modelUnct = True
+            em = mcmc.EmceeModel(sedData, sedModel, modelUnct, unctDict, SamplerType, random)
+            if SamplerType == "EnsembleSampler":
+                if pool is None:
+                    sampler = em.EnsembleSampler(nwalkers, threads=samplerThreads,
+                                                 vectorize=vectorize)
+                else:
+                    sampler = em.EnsembleSampler(nwalkers, pool=pool)
+                if loop_run == 0: #If it is the first iteration, the initial position of the walkers are set.
+                    p0 = em.p_prior()
+                else:
+                    p0 = em.p_ball(pcen, ratio=ballR)
+            elif SamplerType == "PTSampler":
+                ntemps = runDict["ntemps"]
+                if pool is None:
+                    sampler = em.PTSampler(ntemps, nwalkers, threads=samplerThreads,
+                                           vectorize=vectorize)
+                else:
+                    sampler = em.PTSampler(ntemps, nwalkers, pool=pool)
+                if loop_run == 0:#If it is the first iteration, the initial position of the walkers are set.
+                    p0 = em.p_prior()
+                else:
+                    p0 = em.p_ball(pcen, ratio=ballR)
+            if (loop_run == 0) and (not mapDict is None):
+                print( "\n{:*^35}".format(" MAP ") )
+                if (pool is None) and (threads > 1):
+                    mapPool = multiprocessing.Pool(threads)
+                else:
+                    mapPool = pool
+                pmap, lnpmap, nfev = em.p_map(nstart=mapDict.get("nstart", 16),
+                                              method=mapDict.get("method", "L-BFGS-B"),
+                                              pool=mapPool, QuietMode=False)
+                if not mapPool is pool:
+                    mapPool.close()
+                    mapPool.join()
+                p0 = em.p_ball(pmap, ratio=mapDict.get("ball-r", 0.01))
+                runLog.append({"run": "MAP", "nfev": nfev, "lnprob": lnpmap})
+            #->Run the MCMC sampling
+            for i in range(len(iteration)):
+                em.reset()
+                steps = iteration[i]
+                print( "\n{:*^35}".format(" {0}th {1} ".format(i, runName)) )
+                em.run_mcmc(p0, iterations=steps, printFrac=printFrac, thin=thin,
+                            backend=backend, runName="{0}/{1}".format(runName, i),
+                            converge=converge)
+                runLog.append(em.get_runLog()[-1])
+                em.diagnose()
+                pcen = em.p_logl_max() #pcen = em.p_median()
+                em.print_parameters(truths=parTruth, burnin=0)
+                em.plot_lnlike(filename="gsf_temp_lnprob.png", histtype="step")
+                print( "**Time ellapse: {0:.3f} hour".format( (time() - t0)/3600. ) )
                 p0 = em.p_ball(pcen, ratio=ballR)
-        #->Run the MCMC sampling
-        for i in range(len(iteration)):
-            em.reset()
-            steps = iteration[i]
-            print( "\n{:*^35}".format(" {0}th {1} ".format(i, runName)) )
-            em.run_mcmc(p0, iterations=steps, printFrac=printFrac, thin=thin)
-            em.diagnose()
-            pcen = em.p_logl_max() #pcen = em.p_median()
-            em.print_parameters(truths=parTruth, burnin=0)
-            em.plot_lnlike(filename="gsf_temp_lnprob.png", histtype="step")
-            print( "**Time ellapse: {0:.3f} hour".format( (time() - t0)/3600. ) )
-            p0 = em.p_ball(pcen, ratio=ballR)
+    except:
+        if linearAmp:
+            sedModel.reset_linearAmp()
+        raise
+    finally:
+        if not pool is mpi_pool:
+            pool.close()
+    em.set_runLog(runLog)
     return em
 
 def gsf_fitter(configName, targname=None, redshift=None, distance=None,
-               sedFile=None, mpi_pool=None, refit=False):
+               sedFile=None, mpi_pool=None, refit=False, resume=False,
+               runLog=None):
     """
     The wrapper of fitter() function. If the targname, redshift and sedFile are
     provided as arguments, they will be used overriding the values in the config
@@ -174,10 +254,18 @@ def gsf_fitter(configName, targname=None, redshift=None, distance=None,
         The full path of the sed data file.
     mpi_pool : (optional) emcee.mpi_pool.MPIPool object
         The pool of MPI to run, if provided.
+    refit : bool, default: False
+        Refit the SED though there is a result found.
+    resume : bool, default: False
+        Continue the fitting from the last checkpoint of the chain file.
+    runLog : list or None by default
+        The records of the runs (EmceeModel.get_runLog()) are appended to the
+        list, if provided, e.g., to count the likelihood calls ("nfev").
 
     Returns
     -------
-    None.
+    code : int
+        0 if the target is fitted and 1 if it is skipped.
 
     Notes
     -----
@@ -217,18 +305,25 @@ def gsf_fitter(configName, targname=None, redshift=None, distance=None,
         print("[gsf] Warning: cannot find ppDict in the configure file!")
         ppDict = {}
     savePath = ppDict.get("savepath", "results/")
-    if os.path.isfile("{0}{1}.fitrs".format(savePath, targname)):
+    #-> Collect the results in the catalog of the save path, if provided
+    catalogName = ppDict.get("catalog", None)
+    if catalogName is None:
+        catalog = None
+        saveFitrs = True
+        fitted = False
+    else:
+        if not os.path.isdir(savePath):
+            os.makedirs(savePath)
+        catalog = mcmc.ResultCatalog("{0}{1}".format(savePath, catalogName))
+        saveFitrs = ppDict.get("fitrs", False)
+        fitted = catalog.has_target(targname)
+    if fitted or os.path.isfile("{0}{1}.fitrs".format(savePath, targname)):
         if refit:
             print("The object {0} is overwrited!".format(targname))
         else:
             print("The object {0} is skipped!".format(targname))
             return 1
-    #-> Dump the modelDict for model_functions.py to choose the modules to import
     modelDict = config.modelDict
-    modelDictPath = "{0}temp_model.dict".format(root_path)
-    fp = open(modelDictPath, "w")
-    pickle.dump(modelDict, fp)
-    fp.close()
 
     #->Setup the data Data
     dataDict = config.dataDict
@@ -256,7 +351,7 @@ def gsf_fitter(configName, targname=None, redshift=None, distance=None,
     print("#--------------------------------#")
     #--> Import the model functions
     from sedfit import model_functions as sedmf
-    funcLib   = sedmf.funcLib
+    funcLib   = sedmf.load_models(modelDict)
     waveModel = config.waveModel
     try:
         parAddDict_all = config.parAddDict_all
@@ -269,21 +364,62 @@ def gsf_fitter(configName, targname=None, redshift=None, distance=None,
     #sedModel  = bc.Model_Generator(modelDict, funcLib, waveModel, parAddDict_all)
     from sedfit.sedmodel import SedModel
     sedModel = SedModel(modelDict, funcLib, waveModel, parAddDict_all)
+    #--> Bake the templates on the wavelength of the model calculation
+    try:
+        bakeDict = config.bakeDict
+    except:
+        bakeDict = {}
+    #--> The shared templates are saved in a directory of this fitting, removed after the fitting
+    bakeDir = None
+    if bakeDict.get("bake", True) and (not bakeDict.get("shareDir", None) is None):
+        bakeDir = tempfile.mkdtemp(prefix="gsf_bake_", dir=bakeDict["shareDir"])
+    try:
+        if bakeDict.get("bake", True):
+            waveBake = sedData.get_unionWave(waveModel)[0]
+            sedModel.bake_templates(waveBake, bakeDict.get("maxMemory", None), silent,
+                                    bakeDir)
+        #--> Cache the results of the model components
+        try:
+            cacheSize = config.cacheSize
+        except:
+            cacheSize = 0
+        sedModel.set_cache(cacheSize)
 
-    ############################################################################
-    #                                   Fit                                    #
-    ############################################################################
-    parTruth  = config.parTruth  #Whether to provide the truth of the model
-    unctDict = config.unctDict
-    emceeDict = config.emceeDict
-    em = fitter(sedData, sedModel, unctDict, parTruth, emceeDict, mpi_pool)
+        ############################################################################
+        #                                   Fit                                    #
+        ############################################################################
+        parTruth  = config.parTruth  #Whether to provide the truth of the model
+        unctDict = config.unctDict
+        emceeDict = config.emceeDict
+        #-> Save the runs at the checkpoints
+        checkStep = emceeDict["Setup"].get("checkpoint", 0)
+        if checkStep > 0:
+            if not os.path.isdir(savePath):
+                os.makedirs(savePath)
+            chainFile = "{0}{1}_chain.hdf5".format(savePath, targname)
+            if resume and os.path.isfile(chainFile):
+                print("[gsf]: resume from {0}".format(chainFile))
+            backend = mcmc.ChainBackend(chainFile, checkStep, resume)
+        else:
+            if resume:
+                print("[gsf] Warning: the checkpoint is not set, so the fitting starts over!")
+            backend = None
+        em = fitter(sedData, sedModel, unctDict, parTruth, emceeDict, mpi_pool, backend)
+    finally:
+        if not bakeDir is None:
+            shutil.rmtree(bakeDir, ignore_errors=True)
+    if not runLog is None:
+        runLog.extend(em.get_runLog())
+    if (cacheSize > 0) and (not silent):
+        cacheInfo = sedModel.get_cacheInfo()
+        print("[gsf]: model cache hits {0}, misses {1}".format(cacheInfo["hits"], cacheInfo["misses"]))
 
     ############################################################################
     #                              Post process                                #
     ############################################################################
     print("#--------------------------------#")
-    #-> Remove the temp files
-    os.remove(modelDictPath)
+    #-> Put the linear amplitudes back to the posterior samples
+    em.recover_amplitudes()
 
     #-> Load the post process information
     psLow    = ppDict.get("low", 16)
@@ -318,11 +454,20 @@ def gsf_fitter(configName, targname=None, redshift=None, distance=None,
         "ppDict": ppDict,
         "posterior_sample": em.posterior_sample(burnin=burnIn, fraction=fraction),
         "chain": em.sampler.chain,
-        "lnprobability": em.sampler.lnprobability
+        "chainKeys": em.get_chainKeys(),
+        "lnprobability": em.sampler.lnprobability,
+        "runLog": em.get_runLog()
     }
-    fp = open("{0}{1}.fitrs".format(savePath, targname), "w")
-    pickle.dump(fitrs, fp)
-    fp.close()
+    if saveFitrs:
+        #--> The fitrs marks the target fitted, so it appears only after it is fully written
+        fitrsPath = "{0}{1}.fitrs".format(savePath, targname)
+        fp = open("{0}.tmp".format(fitrsPath), "w")
+        pickle.dump(fitrs, fp)
+        fp.close()
+        os.rename("{0}.tmp".format(fitrsPath), fitrsPath)
+    if not catalog is None:
+        summary = em.get_summary(psLow, psCenter, psHigh, burnIn, fraction)
+        catalog.save(targname, summary, fitrs)
     #->Save the best-fit parameters
     em.Save_BestFit("{0}{1}_bestfit.txt".format(savePath, targname), low=psLow,
                     center=psCenter, high=psHigh, burnin=burnIn, fraction=fraction)
@@ -368,3 +513,475 @@ def gsf_fitter(configName, targname=None, redshift=None, distance=None,
                    show_titles=True, title_kwargs={"fontsize": 20})
     print("Post-processed!")
     return 0
+
+def read_targetList(targetList, listFormat="ascii.ipac", configName=None,
+                    sedPath=""):
+    """
+    Read the information of the targets from the table.
+
+    Parameters
+    ----------
+    targetList : str
+        The path of the table with the columns "Name", "z", "sed", and the
+        optional "DL", "config" and "priority" (for the BatchManifest).
+    listFormat : str, default: "ascii.ipac"
+        The format of the table for astropy.
+    configName : str or None by default
+        The config file of all the targets.  The "config" column is used if
+        None.
+    sedPath : str, default: ""
+        The path of the SED files.
+
+    Returns
+    -------
+    taskList : list
+        The dicts of the targets with the keys "config", "targname",
+        "redshift", "distance" and "sedFile", as the arguments of gsf_fitter(),
+        and "priority" if it is in the table.
+    """
+    from astropy.table import Table
+    targTable = Table.read(targetList, format=listFormat)
+    if (configName is None) & (not "config" in targTable.colnames):
+        raise RuntimeError("Fail to find the config file information.")
+    taskList = []
+    for loop in range(len(targTable)):
+        if configName is None:
+            config = str(targTable["config"][loop])
+        else:
+            config = configName
+        if "DL" in targTable.colnames:
+            distance = float(targTable["DL"][loop])
+        else:
+            distance = None
+        task = {
+            "config": config,
+            "targname": str(targTable["Name"][loop]),
+            "redshift": float(targTable["z"][loop]),
+            "distance": distance,
+            "sedFile": sedPath + str(targTable["sed"][loop])
+        }
+        if "priority" in targTable.colnames:
+            task["priority"] = int(targTable["priority"][loop])
+        taskList.append(task)
+    return taskList
+
+def warm_up(configList):
+    """
+    Import the config files and the model modules (with the templates) used
+    by all the targets, so that the processes forked by batch_fitter(), or the
+    MPI ranks of mpi_batch_fitter(), fit the targets with them.
+    """
+    from sedfit import model_functions as sedmf
+    from sedfit import sedclass
+    from sedfit import sedmodel
+    for configName in set(configList):
+        config = configImporter(configName)
+        sedmf.load_models(config.modelDict)
+
+def redirect_output(logFile):
+    """
+    Redirect the stdout and stderr to the log file, and return the copies of
+    the original ones.
+    """
+    sys.stdout.flush()
+    sys.stderr.flush()
+    stdFiles = (os.dup(sys.stdout.fileno()), os.dup(sys.stderr.fileno()))
+    fp = open(logFile, "w")
+    os.dup2(fp.fileno(), sys.stdout.fileno())
+    os.dup2(fp.fileno(), sys.stderr.fileno())
+    fp.close()
+    return stdFiles
+
+def restore_output(stdFiles):
+    """
+    Restore the stdout and stderr from redirect_output().
+    """
+    sys.stdout.flush()
+    sys.stderr.flush()
+    os.dup2(stdFiles[0], sys.stdout.fileno())
+    os.dup2(stdFiles[1], sys.stderr.fileno())
+    os.close(stdFiles[0])
+    os.close(stdFiles[1])
+
+def print_progress(nDone, nTask, result, t0):
+    """
+    Print the result of the finished target and the remaining time.
+    """
+    tPass = time() - t0
+    print("[batch]: {0}/{1} {2} {3} in {4:.1f} s, {5:.1f} min to go".format(nDone, nTask,
+          result["targname"], result["status"], result["time"],
+          tPass / nDone * (nTask - nDone) / 60.))
+    sys.stdout.flush()
+
+def print_summary(report, t0):
+    """
+    Print the numbers of the targets in each status.
+    """
+    statusList = [r["status"] for r in report if not r is None]
+    print("\n[batch]: {0} done, {1} skipped, {2} failed, {3} timeout in {4:.3f} hour".format(
+          statusList.count("done"), statusList.count("skipped"),
+          statusList.count("failed"), statusList.count("timeout"), (time() - t0) / 3600.))
+
+#->The exit code of run_target()
+batchStatus = {0: "done", 1: "skipped", 2: "failed"}
+
+def run_target(task, refit=False, resume=False, threads=None, mpi_pool=None):
+    """
+    Fit one target of the batch with gsf_fitter().  Return the code, 0 if the
+    target is fitted, 1 if it is skipped and 2 if it fails, and the dict of
+    the likelihood calls of the finished runs ("nfev") and the traceback of
+    the failure ("error").  The target is refitted if it was attempted before
+    (the "attempts" from the BatchManifest), since the results may be partly
+    written.
+    """
+    if not threads is None:
+        config = configImporter(task["config"])
+        config.emceeDict["Setup"]["threads"] = threads
+    refit = refit or (task.get("attempts", 0) > 0)
+    runLog = []
+    error = None
+    try:
+        code = gsf_fitter(task["config"], task["targname"], task["redshift"],
+                          task["distance"], task["sedFile"], mpi_pool, refit,
+                          resume, runLog)
+    except:
+        error = traceback.format_exc()
+        print(error)
+        code = 2
+    nfev = int(np.sum([run.get("nfev", 0) for run in runLog]))
+    return code, {"nfev": nfev, "error": error}
+
+def stop_target(signum, frame):
+    """
+    Exit the process of fit_target() when it is killed by kill_target(), so
+    that the finally clauses are run, e.g., to remove the shared templates.
+    """
+    raise SystemExit(2)
+
+def fit_target(task, refit=False, resume=False, threads=None, logFile=None,
+               conn=None):
+    """
+    Fit one target of batch_fitter() in the forked process.  The information
+    from run_target() is sent through the connection, if provided, and the
+    process exits with the code of run_target().
+    """
+    #->Kill the processes of the sampler together with the fitting
+    os.setpgrp()
+    signal.signal(signal.SIGTERM, stop_target)
+    if not logFile is None:
+        redirect_output(logFile)
+    #->The forked processes should not share the random state
+    np.random.seed()
+    code, info = run_target(task, refit, resume, threads)
+    if not conn is None:
+        conn.send(info)
+        conn.close()
+    sys.stdout.flush()
+    sys.stderr.flush()
+    sys.exit(code)
+
+def kill_target(process):
+    """
+    Kill the process of fit_target() and the processes it started.
+    """
+    try:
+        os.killpg(process.pid, signal.SIGTERM)
+    except OSError:
+        process.terminate()
+    process.join(5)
+    if process.is_alive():
+        try:
+            os.killpg(process.pid, signal.SIGKILL)
+        except OSError:
+            pass
+    process.join()
+
+def receive_info(conn, info):
+    """
+    Update the info with that sent by fit_target(), if any.
+    """
+    try:
+        while conn.poll():
+            info.update(conn.recv())
+    except EOFError:
+        pass
+
+def next_task(queue, manifest=None, worker=None):
+    """
+    Get the next target of the batch, None if no target is left.  The target
+    is claimed from the manifest for the worker, if provided, otherwise, it
+    is taken from the queue of the targets.
+    """
+    if not manifest is None:
+        return manifest.claim_task(worker)
+    if len(queue) > 0:
+        return queue.pop(0)
+    return None
+
+def count_tasks(queue, manifest=None):
+    """
+    Count the targets left in the queue or in the manifest.
+    """
+    if manifest is None:
+        return len(queue)
+    return manifest.count()["queued"]
+
+def batch_fitter(taskList, jobs=1, timeout=None, logPath=None, threads=None,
+                 refit=False, resume=False, manifest=None, retry=False):
+    """
+    Fit a list of targets in one python process.  The config files and the
+    model modules of all the targets are imported once, and each target is
+    fitted by gsf_fitter() in a process forked from the warm process, so a
+    fitting that fails, crashes or runs out of time does not affect the
+    others.
+
+    Parameters
+    ----------
+    taskList : list
+        The dicts of the targets from read_targetList().
+    jobs : int, default: 1
+        The number of targets fitted at the same time.
+    timeout : float or None by default
+        The maximum time (second) to fit one target.  The fitting is killed
+        after the time, if provided.
+    logPath : str or None by default
+        The path to save the output of each target to "{targname}.log".  The
+        output is printed on the screen if None.
+    threads : int or None by default
+        Overwrite the threads of emcee in the config files, if provided.
+    refit : bool, default: False
+        Refit the SED though there is a result found.
+    resume : bool, default: False
+        Continue the fitting from the last checkpoint of the chain file.
+    manifest : BatchManifest or None by default
+        The manifest to track the targets, if provided.  The targets of the
+        taskList are added to the manifest, and the queued targets of the
+        manifest are fitted, including those left running by the dead
+        workers.  Each target is claimed when a job is free, so the targets
+        queued or prioritized during the batch are followed.
+    retry : bool, default: False
+        Fit the failed targets of the manifest again.
+
+    Returns
+    -------
+    report : list
+        The dicts of the targets, in the order they finish, with the keys
+        "targname", "status" ("done", "skipped", "failed" or "timeout"),
+        "time" (second) and "nfev" (the likelihood calls).
+
+    Notes
+    -----
+    The processes are forked, so it only works on the unix-like systems.
+    """
+    t0 = time()
+    if not manifest is None:
+        taskList = manifest.prepare(taskList, retry, refit)
+    nTask = len(taskList)
+    print("\n***There are {0} targets to fit with {1} jobs!\n".format(nTask, jobs))
+    warm_up([task["config"] for task in taskList])
+    if (not logPath is None) and (not os.path.isdir(logPath)):
+        os.makedirs(logPath)
+    print("[batch]: warmed up in {0:.1f} s".format(time() - t0))
+    queue = list(taskList)
+    worker = "{0}:{1}".format(socket.gethostname(), os.getpid())
+    running = {}
+    report = []
+    try:
+        while True:
+            #->Start the fittings
+            while len(running) < jobs:
+                task = next_task(queue, manifest, worker)
+                if task is None:
+                    break
+                targname = task["targname"]
+                if logPath is None:
+                    logFile = None
+                else:
+                    logFile = "{0}{1}.log".format(logPath, targname)
+                sys.stdout.flush()
+                conn, childConn = multiprocessing.Pipe(False)
+                process = multiprocessing.Process(target=fit_target,
+                                                  args=(task, refit, resume,
+                                                        threads, logFile, childConn))
+                process.start()
+                childConn.close()
+                running[process.pid] = (targname, process, time(), conn,
+                                        {"nfev": None, "error": None})
+                if not manifest is None:
+                    manifest.set_worker(targname, "{0}:{1}".format(socket.gethostname(),
+                                                                   process.pid))
+            if len(running) == 0:
+                break
+            #->Check the running fittings
+            for pid in running.keys():
+                targname, process, tStart, conn, info = running[pid]
+                receive_info(conn, info)
+                tRun = time() - tStart
+                if process.is_alive():
+                    if (timeout is None) or (tRun < timeout):
+                        continue
+                    kill_target(process)
+                    status = "timeout"
+                    info["error"] = "Killed after the timeout of {0} s.".format(timeout)
+                else:
+                    process.join()
+                    receive_info(conn, info)
+                    status = batchStatus.get(process.exitcode, "failed")
+                    if (status == "failed") and (info["error"] is None):
+                        info["error"] = "The process exits with code {0}.".format(process.exitcode)
+                conn.close()
+                running.pop(pid)
+                result = {"targname": targname, "status": status, "time": tRun,
+                          "nfev": info["nfev"]}
+                report.append(result)
+                if not manifest is None:
+                    manifest.set_result(targname, status, tRun, info["nfev"], info["error"])
+                nDone = len(report)
+                print_progress(nDone, nDone + len(running) + count_tasks(queue, manifest),
+                               result, t0)
+            sleep(0.1)
+    finally:
+        #->The killed targets are left running in the manifest, and queued
+        #  again by the next batch since their processes are dead.
+        for targname, process, tStart, conn, info in running.values():
+            kill_target(process)
+    print_summary(report, t0)
+    return report
+
+def dispatch_targets(comm, taskList, nGroups, manifest=None):
+    """
+    Send the targets of mpi_batch_fitter() to the group that finishes its
+    previous target, until all the groups are stopped.  The targets are
+    claimed from the manifest for the first rank of the group ("worker"),
+    if provided.
+    """
+    from mpi4py import MPI
+    t0 = time()
+    print("\n***There are {0} targets to fit with {1} MPI groups!\n".format(len(taskList), nGroups))
+    sys.stdout.flush()
+    queue = list(taskList)
+    report = []
+    nRun = 0
+    nStop = 0
+    status = MPI.Status()
+    while nStop < nGroups:
+        result = comm.recv(source=MPI.ANY_SOURCE, status=status)
+        worker = result.pop("worker")
+        if "targname" in result:
+            error = result.pop("error")
+            report.append(result)
+            nRun -= 1
+            if not manifest is None:
+                manifest.set_result(result["targname"], result["status"], result["time"],
+                                    result["nfev"], error)
+            nDone = len(report)
+            print_progress(nDone, nDone + nRun + count_tasks(queue, manifest), result, t0)
+        task = next_task(queue, manifest, worker)
+        if task is None:
+            nStop += 1
+        else:
+            nRun += 1
+        comm.send(task, dest=status.Get_source())
+    print_summary(report, t0)
+    return report
+
+def mpi_batch_fitter(taskList, ranksPerTarget=1, threads=None, logPath=None,
+                     refit=False, resume=False, manifest=None, retry=False):
+    """
+    Fit a list of targets with MPI.  Rank 0 sends the targets one at a time to
+    the groups of ranksPerTarget ranks split from the others, and a group gets
+    the next target once it finishes the previous one.  The first rank of
+    each group fits the target with gsf_fitter(), and the other ranks of the
+    group calculate the walkers through the MPIPool of the group.
+
+    Parameters
+    ----------
+    taskList : list
+        The dicts of the targets from read_targetList(), only used on rank 0.
+    ranksPerTarget : int, default: 1
+        The number of ranks to fit one target.
+    threads : int or None by default
+        Overwrite the threads of emcee in the config files, if provided.  The
+        threads are only used if ranksPerTarget is 1.
+    logPath : str or None by default
+        The path to save the output of each target to "{targname}.log".  The
+        output is printed on the screen if None.
+    refit : bool, default: False
+        Refit the SED though there is a result found.
+    resume : bool, default: False
+        Continue the fitting from the last checkpoint of the chain file.
+    manifest : BatchManifest or None by default
+        The manifest to track the targets as in batch_fitter(), only used on
+        rank 0.
+    retry : bool, default: False
+        Fit the failed targets of the manifest again.
+
+    Returns
+    -------
+    report : list or None
+        The dicts of the targets, in the order they finish, with the keys
+        "targname", "status" ("done", "skipped" or "failed"), "time" (second),
+        "nfev" (the likelihood calls) and "rank" (the first rank of the group)
+        on rank 0, and None on the other ranks.
+
+    Notes
+    -----
+    Rank 0 only dispatches the targets, so at least 2 ranks are needed.
+    """
+    from mpi4py import MPI
+    from emcee.utils import MPIPool
+    comm = MPI.COMM_WORLD
+    rank = comm.Get_rank()
+    size = comm.Get_size()
+    if size < 2:
+        raise ValueError("At least 2 MPI processes are needed!")
+    if (rank == 0) and (not manifest is None):
+        taskList = manifest.prepare(taskList, retry, refit)
+    taskList = comm.bcast(taskList, root=0)
+    warm_up([task["config"] for task in taskList])
+    if (rank == 0) and (not logPath is None) and (not os.path.isdir(logPath)):
+        os.makedirs(logPath)
+    #->Split the ranks except rank 0 into the groups
+    if rank == 0:
+        color = MPI.UNDEFINED
+    else:
+        color = (rank - 1) // ranksPerTarget
+    groupComm = comm.Split(color, rank)
+    if rank == 0:
+        return dispatch_targets(comm, taskList, (size - 2) // ranksPerTarget + 1, manifest)
+    if groupComm.Get_size() > 1:
+        pool = MPIPool(comm=groupComm)
+    else:
+        pool = None
+    if groupComm.Get_rank() > 0:
+        #->Calculate the walkers until the group is stopped
+        while True:
+            pool.wait()
+            if not groupComm.bcast(None, root=0):
+                break
+    else:
+        worker = "{0}:{1}".format(socket.gethostname(), os.getpid())
+        result = {}
+        while True:
+            result["worker"] = worker
+            comm.send(result, dest=0)
+            task = comm.recv(source=0)
+            if task is None:
+                break
+            tStart = time()
+            if not logPath is None:
+                stdFiles = redirect_output("{0}{1}.log".format(logPath, task["targname"]))
+            code, info = run_target(task, refit, resume, threads, pool)
+            if not logPath is None:
+                restore_output(stdFiles)
+            if not pool is None:
+                pool.close()
+                groupComm.bcast(True, root=0)
+            result = {"targname": task["targname"],
+                      "status": batchStatus[code], "time": time() - tStart,
+                      "nfev": info["nfev"], "error": info["error"], "rank": rank}
+        if not pool is None:
+            pool.close()
+            groupComm.bcast(False, root=0)
+    groupComm.Free()
+    return None
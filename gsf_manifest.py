@@ -0,0 +1,331 @@
+#This module keeps the states of the targets fitted by batch_fitter() or
+#mpi_batch_fitter() in a SQLite file, so a batch can be restarted from the
+#manifest instead of checking the results in the save path.
+#
+#Usage: python gsf_manifest.py batch.db [-p priority | -q] [target1 target2 ...]
+from __future__ import print_function
+import os
+import errno
+import socket
+import sqlite3
+from time import time
+
+__all__ = ["BatchManifest"]
+
+#->The states of the targets
+manifestStates = ["queued", "running", "done", "failed"]
+#->The columns of the targets from read_targetList()
+taskColumns = ["config", "targname", "redshift", "distance", "sedFile"]
+
+createTable = """CREATE TABLE IF NOT EXISTS targets (
+    targname TEXT PRIMARY KEY,
+    config TEXT NOT NULL,
+    redshift REAL NOT NULL,
+    distance REAL,
+    sedFile TEXT NOT NULL,
+    priority INTEGER NOT NULL DEFAULT 0,
+    state TEXT NOT NULL DEFAULT 'queued',
+    status TEXT,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    worker TEXT,
+    tstart REAL,
+    tend REAL,
+    walltime REAL,
+    nfev INTEGER,
+    error TEXT
+)"""
+
+def check_worker(worker):
+    """
+    Check whether the worker, "{host}:{pid}", is known to be dead, i.e., it is
+    on this host and the process does not exist.  The workers on the other
+    hosts and those of other formats are not known.
+    """
+    try:
+        host, pid = worker.rsplit(":", 1)
+        pid = int(pid)
+    except (AttributeError, ValueError):
+        return False
+    if host != socket.gethostname():
+        return False
+    try:
+        os.kill(pid, 0)
+    except OSError as e:
+        return e.errno == errno.ESRCH
+    return False
+
+class BatchManifest(object):
+    """
+    The SQLite file to track the targets of a batch.  Each target is in one
+    of the states:
+        queued : to be fitted.
+        running : being fitted by the worker, "{host}:{pid}" of the process.
+        done : fitted, or skipped with the results found.
+        failed : failed or killed after the timeout.
+    The batch status ("done", "skipped", "failed" or "timeout"), the attempts,
+    the worker, the wall time, the likelihood calls ("nfev", including those
+    of the runs resumed from the checkpoints) and the traceback of the
+    failure are also recorded.
+
+    Parameters
+    ----------
+    fileName : string
+        The path of the SQLite file, which is created if it does not exist.
+
+    Notes
+    -----
+    Each change is committed in one transaction, so the manifest is never
+    partly written if the batch is killed.  The targets are fitted in the
+    order of decreasing priority, then in the order they are added.  Each
+    target is claimed by claim_task() when a worker is free, so the batches
+    running at the same time share the queue, and the priorities changed
+    during a batch are followed.
+    """
+    def __init__(self, fileName):
+        self.fileName = fileName
+        self.__execute([createTable])
+
+    def __connect(self):
+        """
+        Connect to the file.  The transactions are begun explicitly, and the
+        uncommitted one is rolled back when the connection is closed.
+        """
+        conn = sqlite3.connect(self.fileName, timeout=60., isolation_level=None)
+        conn.row_factory = sqlite3.Row
+        conn.text_factory = str
+        return conn
+
+    def __execute(self, sqlList, fetch=False):
+        """
+        Run the SQL statements, (sql, parameters) or sql, in one transaction.
+        The rows of the last statement are returned if fetch is True.
+        """
+        conn = self.__connect()
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            for sql in sqlList:
+                if isinstance(sql, tuple):
+                    cursor = conn.execute(*sql)
+                else:
+                    cursor = conn.execute(sql)
+            if fetch:
+                rows = [dict(row) for row in cursor.fetchall()]
+            else:
+                rows = None
+            conn.execute("COMMIT")
+        finally:
+            conn.close()
+        return rows
+
+    def add_tasks(self, taskList):
+        """
+        Add the targets from read_targetList() as queued.  The information
+        (and the priority, if provided) of the targets already in the manifest
+        is updated, but their states are kept.
+        """
+        sqlList = []
+        for task in taskList:
+            values = [task[name] for name in taskColumns]
+            sqlList.append(("INSERT OR IGNORE INTO targets ({0}) VALUES (?, ?, ?, ?, ?)".format(
+                            ", ".join(taskColumns)), values))
+            sqlList.append(("UPDATE targets SET config=?, redshift=?, distance=?, sedFile=? "
+                            "WHERE targname=?", values[:1] + values[2:] + values[1:2]))
+            if "priority" in task:
+                sqlList.append(("UPDATE targets SET priority=? WHERE targname=?",
+                                (task["priority"], task["targname"])))
+        self.__execute(sqlList)
+
+    def requeue(self, targnames=None, states=["failed"]):
+        """
+        Queue the targets again.
+
+        Parameters
+        ----------
+        targnames : list or None by default
+            The names of the targets.  All the targets are used if None.
+        states : list, default: ["failed"]
+            Only the targets in these states are queued.
+        """
+        sql = "UPDATE targets SET state='queued' WHERE state IN ({0})".format(
+              ", ".join(["?"] * len(states)))
+        if targnames is None:
+            self.__execute([(sql, states)])
+        else:
+            self.__execute([(sql + " AND targname=?", list(states) + [targname])
+                            for targname in targnames])
+
+    def set_priority(self, targnames, priority):
+        """
+        Set the priority of the targets.
+        """
+        self.__execute([("UPDATE targets SET priority=? WHERE targname=?",
+                         (priority, targname)) for targname in targnames])
+
+    def get_tasks(self, state="queued"):
+        """
+        Get the targets in the state, with the keys of read_targetList() and
+        the "priority" and "attempts", in the order to fit.
+        """
+        return self.__execute([("SELECT {0}, priority, attempts FROM targets WHERE state=? "
+                                "ORDER BY priority DESC, rowid".format(", ".join(taskColumns)),
+                                (state,))], fetch=True)
+
+    def requeue_dead(self):
+        """
+        Queue the running targets again if their workers are known to be
+        dead, see check_worker().
+
+        Returns
+        -------
+        targnames : list
+            The names of the targets queued.
+        """
+        rowList = self.__execute(["SELECT targname, worker FROM targets WHERE state='running'"],
+                                 fetch=True)
+        rowList = [row for row in rowList if check_worker(row["worker"])]
+        #->The target is not queued if it is claimed again in the meantime
+        self.__execute([("UPDATE targets SET state='queued' WHERE targname=? AND "
+                         "state='running' AND worker=?", (row["targname"], row["worker"]))
+                        for row in rowList])
+        return [row["targname"] for row in rowList]
+
+    def prepare(self, taskList=[], retry=False, refit=False):
+        """
+        Get the targets to fit for a batch.  The targets of the taskList are
+        added, and the targets left running by the dead workers are queued
+        again.
+
+        Parameters
+        ----------
+        taskList : list, default: []
+            The dicts of the targets from read_targetList() to add.
+        retry : bool, default: False
+            Queue the failed targets again.
+        refit : bool, default: False
+            Queue the done and failed targets again.
+
+        Returns
+        -------
+        taskList : list
+            The queued targets from get_tasks().
+        """
+        self.add_tasks(taskList)
+        self.requeue_dead()
+        states = []
+        if retry or refit:
+            states.append("failed")
+        if refit:
+            states.append("done")
+        if len(states) > 0:
+            self.requeue(states=states)
+        return self.get_tasks("queued")
+
+    def claim_task(self, worker=None):
+        """
+        Mark the queued target of the highest priority as running on the
+        worker.  The target is selected and updated in one transaction, so it
+        is only claimed by one worker.
+
+        Returns
+        -------
+        task : dict or None
+            The target as those from get_tasks(), with the attempts before
+            this one, or None if no target is queued.
+        """
+        conn = self.__connect()
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            row = conn.execute("SELECT {0}, priority, attempts FROM targets WHERE state='queued' "
+                               "ORDER BY priority DESC, rowid LIMIT 1".format(
+                               ", ".join(taskColumns))).fetchone()
+            if not row is None:
+                conn.execute("UPDATE targets SET state='running', status=NULL, "
+                             "attempts=attempts+1, worker=?, tstart=?, tend=NULL, "
+                             "walltime=NULL, nfev=NULL, error=NULL WHERE targname=?",
+                             (worker, time(), row["targname"]))
+            conn.execute("COMMIT")
+        finally:
+            conn.close()
+        if row is None:
+            return None
+        return dict(row)
+
+    def set_worker(self, targname, worker):
+        """
+        Change the worker of the running target, e.g., to the process forked
+        to fit the target.
+        """
+        self.__execute([("UPDATE targets SET worker=? WHERE targname=? AND state='running'",
+                         (worker, targname))])
+
+    def set_result(self, targname, status, walltime, nfev=None, error=None):
+        """
+        Record the batch status of the target, which is done if the status is
+        "done" or "skipped", and failed otherwise.
+        """
+        if status in ["done", "skipped"]:
+            state = "done"
+        else:
+            state = "failed"
+        self.__execute([("UPDATE targets SET state=?, status=?, tend=?, walltime=?, "
+                         "nfev=?, error=? WHERE targname=?",
+                         (state, status, time(), walltime, nfev, error, targname))])
+
+    def load(self, targnames=None):
+        """
+        Load the records of the targets, all the targets if targnames is None.
+        """
+        sql = "SELECT * FROM targets"
+        if targnames is None:
+            return self.__execute([sql + " ORDER BY priority DESC, rowid"], fetch=True)
+        rowList = []
+        for targname in targnames:
+            rowList += self.__execute([(sql + " WHERE targname=?", (targname,))], fetch=True)
+        return rowList
+
+    def count(self):
+        """
+        Count the targets in each state.
+        """
+        rowList = self.__execute(["SELECT state, COUNT(*) AS n FROM targets GROUP BY state"],
+                                 fetch=True)
+        counts = dict([(state, 0) for state in manifestStates])
+        for row in rowList:
+            counts[row["state"]] = row["n"]
+        return counts
+
+if __name__ == "__main__":
+    from optparse import OptionParser
+    parser = OptionParser(usage="%prog batch.db [-p priority | -q] [target1 target2 ...]")
+    parser.add_option("-p", "--priority", dest="priority", default=None,
+                      help="Set the priority of the targets, the larger the earlier.")
+    parser.add_option("-q", "--requeue", dest="requeue", action="store_true", default=False,
+                      help="Queue the targets again, all the failed ones if no target is given. "
+                           "The given targets are queued in any state, e.g., those left running "
+                           "by the workers on other hosts.")
+    (options, args) = parser.parse_args()
+    if len(args) < 1:
+        parser.error("The manifest file is not specified!")
+    manifest = BatchManifest(args[0])
+    targnames = args[1:]
+    if not options.priority is None:
+        if len(targnames) == 0:
+            parser.error("Option -p needs the targets.")
+        manifest.set_priority(targnames, int(options.priority))
+    if options.requeue:
+        if len(targnames) == 0:
+            manifest.requeue()
+        else:
+            manifest.requeue(targnames, ["running", "done", "failed"])
+    counts = manifest.count()
+    print(", ".join(["{0} {1}".format(counts[state], state) for state in manifestStates]))
+    if len(targnames) > 0:
+        rowList = manifest.load(targnames)
+    else:
+        rowList = [row for row in manifest.load() if row["state"] != "done"]
+    for row in rowList:
+        print("{0:<20s} {1:<8s} priority: {2}, attempts: {3}, status: {4}, time: {5}, nfev: {6}".format(
+              row["targname"], row["state"], row["priority"], row["attempts"], row["status"],
+              row["walltime"], row["nfev"]))
+        if (len(targnames) > 0) and (not row["error"] is None):
+            print(row["error"])
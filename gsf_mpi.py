@@ -17,11 +17,31 @@ parser.add_option("-o", "--overwrite", dest="overwrite",
                   help="Overwrite the object information with the command-line inputs.")
 parser.add_option("-r", "--refit", dest="refit", action="store_true", default=False,
                   help="Refit the SED though there is a result found.")
+parser.add_option("--resume", dest="resume", action="store_true", default=False,
+                  help="Continue the fitting from the last checkpoint.")
+parser.add_option("-l", "--list", dest="list", default=None,
+                  help="Provide a list of target info to fit.")
+parser.add_option("-f", "--list_format", dest="list_format", default="ascii.ipac",
+                  help="The format of the target list.")
+parser.add_option("-c", "--config", dest="config", default=None,
+                  help="Assign the config file for a list of objects.")
+parser.add_option("-p", "--path", dest="path", default=None,
+                  help="Assign the path of the SED data for a list of objects.")
+parser.add_option("-n", "--ranks", dest="ranks", default="1",
+                  help="The number of MPI processes to fit one object of the list.")
+parser.add_option("-g", "--logpath", dest="logpath", default=None,
+                  help="Save the output of each object of the list in the path.")
+parser.add_option("--threads", dest="threads", default=None,
+                  help="Overwrite the threads of emcee in the config file for a list of objects.")
+parser.add_option("--manifest", dest="manifest", default=None,
+                  help="Track the objects of the list in the SQLite file, and continue the list from it.")
+parser.add_option("--retry", dest="retry", action="store_true", default=False,
+                  help="Fit the failed objects in the manifest again.")
 (options, args) = parser.parse_args()
-if len(args) == 0:
-    raise AssertionError("The config file is not specified!")
-else:
+if len(args) > 0:
     configName = args[0] #Get the input configure file information.
+elif (options.list is None) and (options.manifest is None):
+    raise AssertionError("The config file is not specified!")
 #Some times the warning may stop the code, so we ignore the warnings by default.
 if options.warning:
     pass
@@ -31,6 +51,36 @@ if options.refit:
     refit = True
 else:
     refit = False
+resume = options.resume
+
+#-> Fit the list of targets with the groups of MPI processes
+if (not options.list is None) or (not options.manifest is None):
+    from mpi4py import MPI
+    manifest = None
+    if MPI.COMM_WORLD.Get_rank() == 0:
+        sedPath = options.path
+        if sedPath is None:
+            sedPath = ""
+        if options.list is None:
+            taskList = []
+        else:
+            taskList = read_targetList(options.list, options.list_format, options.config,
+                                       sedPath)
+        if not options.manifest is None:
+            from gsf_manifest import BatchManifest
+            manifest = BatchManifest(options.manifest)
+    else:
+        taskList = None
+    if options.threads is None:
+        threads = None
+    else:
+        threads = eval(options.threads)
+    logPath = options.logpath
+    if (not logPath is None) and (not logPath.endswith("/")):
+        logPath += "/"
+    mpi_batch_fitter(taskList, eval(options.ranks), threads, logPath, refit, resume,
+                     manifest, options.retry)
+    sys.exit(0)
 
 pool = MPIPool()
 if not pool.is_master():
@@ -49,7 +99,7 @@ len_args = len(args)
 if not options.overwrite:
     if len_args > 1:
         print("**Warning[UniFit]: there are more arguments may not be used...")
-    gsf_fitter(configName, mpi_pool=pool, refit=refit)
+    gsf_fitter(configName, mpi_pool=pool, refit=refit, resume=resume)
 else:
     if len_args < 4:
         pool.close()
@@ -66,5 +116,5 @@ else:
         sedFile  = args[4]
     else:
         print("**Warning[UniFit]: there are more arguments may not be used...")
-    gsf_fitter(configName, targname, redshift, distance, sedFile, pool, refit)
+    gsf_fitter(configName, targname, redshift, distance, sedFile, pool, refit, resume)
 pool.close()
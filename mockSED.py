@@ -321,7 +321,7 @@ def gsm_mocker(configName, targname=None, redshift=None, distance=None, sedFile=
     print("#--------------------------------#")
 
     #->Build up the model
-    funcLib   = sedmf.funcLib
+    funcLib   = sedmf.load_models(modelDict)
     waveModel = config.waveModel
     try:
         parAddDict_all = config.parAddDict_all
@@ -1,9 +1,6 @@
 #This script provide some functions to do the postprocess of the fitting sampling.
 #
-import os
 import numpy as np
-import cPickle as pickle
-from sedfit.dir_list import root_path
 from scipy.interpolate import interp1d
 
 ls_mic = 2.99792458e14 #unit: micron/s
@@ -12,8 +9,7 @@ mJy = 1e26 #unit: erg/s/cm^2/Hz
 
 __all__ = ["AddDict", "MatchDict", "parStatistics", "Luminosity_Integrate",
            "Luminosity_Specific", "L_Total", "randomSampler", "CorrectParameters",
-           "Flux_Pht_Component", "dumpModelDict", "cleanTempFile", "dataLoader",
-           "modelLoader"]
+           "Flux_Pht_Component", "dataLoader", "modelLoader"]
 
 def AddDict(targetDict, quantName, quant, nFillPar=None):
     """
@@ -219,7 +215,7 @@ def CorrectParameters(sedModel, silent=True):
             inDict  = {}
             for pn in pnList:
                 inDict[pn] = fitDict[pn]["value"]
-            exec "Func_PosPar = sedmf.{0}_PosPar".format(funcName)
+            Func_PosPar = sedmf.get_function("{0}_PosPar".format(funcName))
             outDict = Func_PosPar(**inDict)
             for pn in pnList:
                 if fitDict[pn]["vary"]:
@@ -293,35 +289,6 @@ def Flux_Pht_Total(pars, sedModel, sedData):
     fluxModelPht = sedData.model_pht(waveModel, fluxModel)
     return fluxModelPht
 
-def dumpModelDict(fitrs):
-    """
-    Dump the model dict.
-
-    Parameters
-    ----------
-    fitrs : DictType
-        The dict of the fitting results.
-
-    Returns
-    -------
-    None.
-
-    Notes
-    -----
-    None.
-    """
-    modelPck = fitrs["modelPck"]
-    modelDict = modelPck["modelDict"]
-    fp = open("{0}temp_model.dict".format(root_path), "w")
-    pickle.dump(modelDict, fp)
-    fp.close()
-
-def cleanTempFile():
-    """
-    Clean the tempt file.
-    """
-    os.remove("{0}temp_model.dict".format(root_path))
-
 def modelLoader(fitrs, QuietMode=True):
     """
     Load the model object.  Import the module within the function.
@@ -343,11 +310,10 @@ def modelLoader(fitrs, QuietMode=True):
     None.
     """
     from sedfit import model_functions as sedmf
-    reload(sedmf)
     from sedfit.sedmodel import SedModel
     modelPck = fitrs["modelPck"]
-    funcLib = sedmf.funcLib
     modelDict = modelPck["modelDict"]
+    funcLib = sedmf.load_models(modelDict)
     waveModel = modelPck["waveModel"]
     parAddDict_all = modelPck["parAddDict_all"]
     DL = parAddDict_all["DL"]
@@ -391,8 +357,8 @@ if __name__ == "__main__":
 
     #->Setup the model
     modelPck = fitrs["modelPck"]
-    funcLib = sedmf.funcLib
     modelDict = modelPck["modelDict"]
+    funcLib = sedmf.load_models(modelDict)
     waveModel = modelPck["waveModel"]
     parAddDict_all = modelPck["parAddDict_all"]
     sedModel = bc.Model_Generator(modelDict, funcLib, waveModel, parAddDict_all)
@@ -32,8 +32,6 @@ if len(sys.argv) == 3:
         raise ValueError("The second argument ({0}) is not an integer!".format(sys.argv[2]))
 else:
     nSamples = 100
-#--> Dump the model dict
-dumpModelDict(fitrs)
 
 #The code starts#
 #################
@@ -80,7 +78,6 @@ sedData = dataLoader(fitrs, silent)
 
 #-> Load the model
 sedModel = modelLoader(fitrs, silent)
-cleanTempFile()
 parTruth = modelPck["parTruth"]   #Whether to provide the truth of the model
 modelUnct = False #modelPck["modelUnct"] #Whether to consider the model uncertainty in the fitting
 
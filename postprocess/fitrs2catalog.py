@@ -0,0 +1,31 @@
+#This script moves the fitrs files into the ResultCatalog.  The targets already
+#in the catalog are replaced.
+#
+#Usage: python fitrs2catalog.py catalog.hdf5 fitrs1 [fitrs2 ...]
+from __future__ import print_function
+import sys
+import cPickle as pickle
+from time import time
+from sedfit.mcmc import mcmc_emcee as mcmc
+
+if len(sys.argv) < 3:
+    raise AssertionError("Usage: python fitrs2catalog.py catalog.hdf5 fitrs1 [fitrs2 ...]")
+catalogName = sys.argv[1]
+fitrsList = sys.argv[2:]
+catalog = mcmc.ResultCatalog(catalogName)
+t0 = time()
+nFail = 0
+for loop, fitrsFile in enumerate(fitrsList):
+    try:
+        fp = open(fitrsFile, "r")
+        fitrs = pickle.load(fp)
+        fp.close()
+        targname = fitrs["dataPck"]["targname"]
+        catalog.save(targname, mcmc.summarize_fitrs(fitrs), fitrs, merge=False)
+        print("[{0}/{1}] {2}: {3}".format(loop+1, len(fitrsList), fitrsFile, targname))
+    except:
+        nFail += 1
+        print("[{0}/{1}] {2}: failed!".format(loop+1, len(fitrsList), fitrsFile))
+catalog.merge()
+print("{0} fitrs files are moved to {1} in {2:.1f} s, {3} failed.".format(len(fitrsList) - nFail,
+      catalogName, time() - t0, nFail))
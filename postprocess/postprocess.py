@@ -39,8 +39,6 @@ fitrsFile = sys.argv[1]
 fp = open(fitrsFile, "r")
 fitrs = pickle.load(fp)
 fp.close()
-#--> Dump the model dict
-dumpModelDict(fitrs)
 
 #The code starts#
 #################
@@ -65,7 +63,6 @@ sedData = dataLoader(fitrs, silent)
 
 #-> Load the model
 sedModel = modelLoader(fitrs, silent)
-cleanTempFile()
 parTruth = modelPck["parTruth"]   #Whether to provide the truth of the model
 modelUnct = False #modelPck["modelUnct"] #Whether to consider the model uncertainty in the fitting
 
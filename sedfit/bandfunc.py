@@ -136,6 +136,34 @@ def K_MonP(wave0, waveList, rsrList, alpha=-1):
     kmonp = k1 / k2
     return kmonp
 
+def trapz_weights(x):
+    """
+    Calculate the weights of the trapezoidal rule, so that
+        np.trapz(y, x) = np.dot(trapz_weights(x), y).
+
+    Parameters
+    ----------
+    x : float array
+        The sample points.
+
+    Returns
+    -------
+    w : float array
+        The weights of the sample points.
+
+    Notes
+    -----
+    None.
+    """
+    x = np.asarray(x, dtype=float)
+    w = np.zeros_like(x)
+    if len(x) < 2:
+        return w
+    dx = np.diff(x)
+    w[:-1] += 0.5 * dx
+    w[1:]  += 0.5 * dx
+    return w
+
 class BandPass(object):
     """
     A class to represent one filter bandpass of a instrument.
@@ -208,7 +236,7 @@ class BandPass(object):
             self.__rsrList = None
             self.__bandCenter = bandCenter
             self.__bandCenter_rest = bandCenter / (1 + redshift)
-            self.__bandName = bandName
+            self._bandName = bandName
             if not silent:
                 print("Band {0} ({1}) does not have bandpass.".format(bandName, bandCenter))
 
@@ -335,6 +363,58 @@ class BandPass(object):
         fluxFltr = flux[idx]
         return fluxFltr
 
+    def projection(self, wavelength):
+        """
+        Calculate the weights to project the spectrum on the given wavelength
+        to the band flux density, i.e.,
+            fluxFltr = np.dot(weights, flux[index]),
+        which is equivalent to filtering(wavelength, flux).
+
+        Parameters
+        ----------
+        wavelength : float array
+            The wavelength of the input spectrum.
+
+        Returns
+        -------
+        (index, weights) : tuple
+            The indices of the wavelength used by the band and their weights.
+
+        Notes
+        -----
+        The integrals of BandFunc_mean() and BandFunc_mono() are linear to
+        the flux, so the weights only depend on the wavelength.
+        """
+        wavelength = np.asarray(wavelength)
+        bandCenter = self.__bandCenter_rest
+        wvMin = wavelength[0]
+        wvMax = wavelength[-1]
+        if( (bandCenter <= wvMin) or (bandCenter >= wvMax) ):
+            raise ValueError("The band center '{0}' is out of the wavelength range '[{1}, {2}]!".format(bandCenter, wvMin, wvMax))
+        bandType = self.__bandType
+        if bandType == "none":
+            wave_fdev = np.abs((wavelength - bandCenter) / bandCenter)
+            idx = np.argmin(wave_fdev)
+            if wave_fdev[idx] > 0.05:
+                print("[BandPass warning]: The wavelength deviation at {0} ({1}) is large!".format(self._bandName, bandCenter))
+            return (np.array([idx]), np.array([1.]))
+        waveMin = self.__waveList[0]
+        waveMax = self.__waveList[-1]
+        fltr = (wavelength > waveMin) & (wavelength < waveMax)
+        if np.sum(fltr) == 0:
+            raise ValueError("The wavelength is not overlapped with the filter!")
+        index = np.where(fltr)[0]
+        wave = wavelength[fltr]
+        rsrList = splev(wave, self.__filtertck)
+        if bandType == "mean":
+            weights = trapz_weights(wave) * rsrList / wave
+            weights /= np.sum(weights)
+        else:
+            freq = ls_mic / wave
+            weights = trapz_weights(freq) * rsrList
+            weights *= self.k4p / np.sum(weights)
+        return (index, weights)
+
     def filtering(self, wavelength, flux):
         """
         Calculate the flux density of the input spectrum filtered by the bandpass.
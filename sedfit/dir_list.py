@@ -1,5 +1,5 @@
 import os
-__all__ = ["root_path", "filter_path", "template_path"]
+__all__ = ["root_path", "filter_path", "template_path", "cache_path"]
 
 #-> Obtain the current path
 pathList = os.path.abspath(__file__).split("/")
@@ -11,6 +11,9 @@ filter_path = "/".join(pathList)
 #-> Create the path to the templates
 pathList[-2] = "template/"
 template_path = "/".join(pathList[0:-1])
+#-> Create the path to the files derived from the templates, out of the code
+cache_path = os.environ.get("GSF_CACHE", os.path.join(os.path.expanduser("~"), ".cache", "gsf"))
+cache_path = os.path.join(cache_path, "")
 
 if __name__ == "__main__":
     print root_path
@@ -1,8 +1,15 @@
 import numpy as np
-from scipy.special import erf
-import george
-from george import kernels
+from math import exp, log
+from time import time
+from functools import partial
+from scipy.special import erf, log_ndtr
+from scipy.optimize import lsq_linear
+try:
+    from numba import njit
+except ImportError:
+    njit = None
 sqrt2 = np.sqrt(2)
+sqrt3 = np.sqrt(3)
 PI2 = 2. * np.pi
 
 #-->There are three ways to define the chi-square function to consider the
@@ -45,8 +52,9 @@ def ChiSq_erf(data, model, unct=None, flag=None):
     else:
         chsq_dtc = 0.
     if np.sum(fltr_non)>0:
-        wrsd_non = (data[fltr_non] - model[fltr_non])/(unct[fltr_non] * sqrt2)
-        chsq_non = -2.* np.sum( np.log( 0.5 * (1 + erf(wrsd_non)) ) )
+        #The log_ndtr(x) is log(0.5 * (1 + erf(x/sqrt2))) without underflow.
+        wrsd_non = (data[fltr_non] - model[fltr_non])/unct[fltr_non]
+        chsq_non = -2.* np.sum( log_ndtr(wrsd_non) )
     else:
         chsq_non = 0.
     chsq = chsq_dtc + chsq_non
@@ -155,6 +163,356 @@ def ChiSq_af(data, model, unct=None, flag=None):
     return chsq
 
 ChiSq = ChiSq_erf
+
+class ChiSqKernel(object):
+    """
+    The chi-square function of the given data, the same as ChiSq_erf(),
+    ChiSq_hg() or ChiSq_af() while the indices of the detections and upper
+    limits and the constant terms are prepared only once.
+
+    Parameters
+    ----------
+    data : float array
+        The observed data and upperlimits.
+    unct : float array or None by default
+        The uncertainties.
+    flag : float array or None by default
+        The flag of upperlimits, 0 for detection and 1 for upperlimits.
+    chiSq : function or None by default
+        One of ChiSq_erf, ChiSq_hg and ChiSq_af, the current ChiSq by default.
+
+    Notes
+    -----
+    The model can be a 2D array, shape (n, len(data)), and the chi squares
+    of all the models are returned.  For ChiSq_erf, the upper limits use the
+    log of the normal CDF, which does not underflow when the model is far
+    above the upper limit.
+    """
+    def __init__(self, data, unct=None, flag=None, chiSq=None):
+        data = np.asarray(data, dtype=float)
+        if unct is None:
+            unct = np.ones_like(data)
+        if flag is None:
+            flag = np.zeros_like(data)
+        if chiSq is None:
+            chiSq = ChiSq
+        if chiSq is ChiSq_erf:
+            self.__method = "erf"
+        elif chiSq is ChiSq_hg:
+            self.__method = "hg"
+        elif chiSq is ChiSq_af:
+            self.__method = "af"
+        else:
+            raise ValueError("The chi-square function '{0}' is not supported!".format(chiSq))
+        unct = np.asarray(unct, dtype=float)
+        flag = np.asarray(flag)
+        self.__idxDtc = np.where(flag == 0)[0]
+        self.__idxNon = np.where(flag == 1)[0]
+        self.__dataDtc = data[self.__idxDtc]
+        self.__unctDtc = unct[self.__idxDtc]
+        self.__constDtc = np.sum(np.log(PI2 * self.__unctDtc**2))
+        if self.__method == "af":
+            self.__dataNon = 0.5 * data[self.__idxNon]
+            self.__unctNon = 0.5 * data[self.__idxNon]
+            self.__constNon = np.sum(np.log(PI2 * self.__unctNon**2))
+        else:
+            self.__dataNon = data[self.__idxNon]
+            self.__unctNon = unct[self.__idxNon]
+            self.__constNon = 0.
+        self.__normNon = np.log(PI2 * self.__unctNon**2) # Used by ChiSq_hg
+
+    def __call__(self, model, unct=None):
+        """
+        Return the chi square of the model, a float for a 1D model and an
+        array for a 2D model.  The uncertainties can be replaced by unct, in
+        the same shape as the model, e.g., with the model uncertainty.
+        """
+        model = np.asarray(model)
+        if unct is None:
+            unctDtc = self.__unctDtc
+            constDtc = self.__constDtc
+        else:
+            unct = np.asarray(unct)
+            unctDtc = unct[..., self.__idxDtc]
+            constDtc = np.sum(np.log(PI2 * unctDtc**2), axis=-1)
+        if (unct is None) or (self.__method == "af"):
+            unctNon = self.__unctNon
+            normNon = self.__normNon
+        else:
+            unctNon = unct[..., self.__idxNon]
+            normNon = np.log(PI2 * unctNon**2)
+        chsq = 0.
+        if len(self.__idxDtc) > 0:
+            wrsd_dtc = (self.__dataDtc - model[..., self.__idxDtc]) / unctDtc
+            chsq = chsq + np.sum(wrsd_dtc**2, axis=-1) + constDtc
+        if len(self.__idxNon) > 0:
+            model_non = model[..., self.__idxNon]
+            if self.__method == "erf":
+                wrsd_non = (self.__dataNon - model_non) / unctNon
+                chsq = chsq - 2. * np.sum(log_ndtr(wrsd_non), axis=-1)
+            elif self.__method == "hg":
+                wrsd_non = (model_non - self.__dataNon) / unctNon
+                chsq_non = np.where(model_non > self.__dataNon, wrsd_non**2 + normNon, 0.)
+                chsq = chsq + np.sum(chsq_non, axis=-1)
+            else:
+                wrsd_non = (model_non - self.__dataNon) / unctNon
+                chsq = chsq + np.sum(wrsd_non**2, axis=-1) + self.__constNon
+        if np.ndim(chsq) == 0:
+            return float(chsq)
+        return chsq
+
+kernelCache = {} # The data arrays and the ChiSqKernel of each data part
+def get_ChiSqKernel(data, part="all"):
+    """
+    Get the ChiSqKernel of the data set.  The kernel is built again only if
+    the cached data arrays or the ChiSq function are changed.
+
+    Parameters
+    ----------
+    data : DataSet
+        The data set.
+    part : string, default: "all"
+        The part of the data, "all" for all the data and "ds" for the discrete
+        data.
+
+    Returns
+    -------
+    kernel : ChiSqKernel
+        The chi-square function of the data.
+    """
+    key = (data.get_cachedArray(part, 'y'), data.get_cachedArray(part, 'e'),
+           data.get_cachedArray(part, 'f'), ChiSq)
+    cachedKey, kernel = kernelCache.get(part, (None, None))
+    if (cachedKey is None) or any([a is not b for a, b in zip(key, cachedKey)]):
+        kernel = ChiSqKernel(key[0], key[1], key[2], ChiSq)
+        kernelCache[part] = (key, kernel)
+    return kernel
+#-->The Gaussian process of the Matern-3/2 kernel in 1D is the solution of a
+#linear stochastic differential equation, so its likelihood can be calculated
+#with the Kalman filter in O(N) instead of the O(N^3) Cholesky decomposition.
+def Matern32_kalman(x, r, var, amp, lam):
+    """
+    Calculate the log likelihood of the residual with the Kalman filter of
+    the Matern-3/2 process.
+
+    Parameters
+    ----------
+    x : float array
+        The positions, in increasing order.
+    r : float array
+        The residuals.
+    var : float array
+        The white noise variances of the residuals.
+    amp : float
+        The variance of the process.
+    lam : float
+        The sqrt(3) over the length scale.
+
+    Returns
+    -------
+    lnl : float
+        The log likelihood without the constant -0.5*N*log(2*pi).
+    """
+    lam2 = lam * lam
+    amp1 = lam2 * amp # The stationary variance of the derivative
+    m0 = 0.
+    m1 = 0.
+    p00 = amp
+    p01 = 0.
+    p11 = amp1
+    lnl = 0.
+    xPrev = x[0]
+    for i in range(len(x)):
+        dt = x[i] - xPrev
+        xPrev = x[i]
+        if dt > 0:
+            #-> Predict, P = F (P - Pinf) F^T + Pinf
+            e = exp(-lam * dt)
+            f00 = e * (1. + lam * dt)
+            f01 = e * dt
+            f10 = -e * lam2 * dt
+            f11 = e * (1. - lam * dt)
+            m0, m1 = f00 * m0 + f01 * m1, f10 * m0 + f11 * m1
+            d00 = p00 - amp
+            d11 = p11 - amp1
+            t00 = f00 * d00 + f01 * p01
+            t01 = f00 * p01 + f01 * d11
+            t10 = f10 * d00 + f11 * p01
+            t11 = f10 * p01 + f11 * d11
+            p00 = t00 * f00 + t01 * f01 + amp
+            p01 = t00 * f10 + t01 * f11
+            p11 = t10 * f10 + t11 * f11 + amp1
+        #-> Update with the observation
+        s = p00 + var[i]
+        v = r[i] - m0
+        lnl -= 0.5 * (v * v / s + log(s))
+        k0 = p00 / s
+        k1 = p01 / s
+        m0 += k0 * v
+        m1 += k1 * v
+        p11 -= k1 * p01
+        p01 -= k0 * p01
+        p00 -= k0 * p00
+    return lnl
+
+if njit is not None:
+    Matern32_kalman = njit(Matern32_kalman)
+
+def Matern32_lnlikelihood(x, r, yerr, a, tau):
+    """
+    Calculate the log likelihood of the residual with the Gaussian process of
+    the 1D Matern-3/2 kernel in O(N).  It is the same as:
+        gp = george.GP(a * kernels.Matern32Kernel(tau))
+        gp.compute(x, yerr)
+        gp.lnlikelihood(r)
+
+    Parameters
+    ----------
+    x : float array
+        The positions of the data, e.g., the wavelength.
+    r : float array
+        The residuals of the data.
+    yerr : float array
+        The uncertainties of the data.
+    a : float
+        The amplitude (variance) of the kernel.
+    tau : float
+        The metric of the kernel, i.e., the square of the length scale.
+
+    Returns
+    -------
+    lnl : float
+        The log likelihood.
+
+    Notes
+    -----
+    The Kalman filter is compiled with numba if it is available.
+    """
+    x = np.asarray(x, dtype=float)
+    idx = np.argsort(x, kind="mergesort")
+    xs = x[idx]
+    rs = np.asarray(r, dtype=float)[idx]
+    vs = np.asarray(yerr, dtype=float)[idx]**2
+    lam = sqrt3 / np.sqrt(tau)
+    if njit is None:
+        #-> The python floats are faster in the loop.
+        xs, rs, vs = xs.tolist(), rs.tolist(), vs.tolist()
+    lnl = Matern32_kalman(xs, rs, vs, float(a), float(lam))
+    return lnl - 0.5 * len(idx) * np.log(PI2)
+
+class Matern32GP(object):
+    """
+    The Gaussian process of the 1D Matern-3/2 kernel at fixed positions, to
+    calculate the likelihoods of a batch of residuals in O(N).  The order of
+    the positions and the workspace of the Kalman filter are prepared once,
+    and the filter runs for all the residuals together.
+
+    Parameters
+    ----------
+    x : float array
+        The positions of the data, e.g., the wavelength.
+
+    Notes
+    -----
+    The results are the same as Matern32_lnlikelihood() for each residual.
+    """
+    def __init__(self, x):
+        x = np.asarray(x, dtype=float)
+        self.__index = np.argsort(x, kind="mergesort")
+        self.__x = x[self.__index]
+        self.__dt = np.diff(self.__x).tolist()
+        self.__work = np.zeros((7, 0))
+
+    def get_workspace(self, nBatch):
+        """
+        Get the arrays of the filter states for nBatch residuals, which are
+        allocated only if the batch size is changed.
+        """
+        if self.__work.shape[1] != nBatch:
+            self.__work = np.zeros((7, nBatch))
+        return self.__work
+
+    def lnlikelihood(self, r, yerr, a, tau):
+        """
+        Calculate the log likelihoods of the residuals.
+
+        Parameters
+        ----------
+        r : float array
+            The residuals, shape (nBatch, N).
+        yerr : float array
+            The uncertainties, shape (nBatch, N).
+        a : float array
+            The amplitudes (variance) of the kernel, shape (nBatch,).
+        tau : float array
+            The metrics of the kernel, shape (nBatch,).
+
+        Returns
+        -------
+        lnl : float array
+            The log likelihoods, shape (nBatch,).
+        """
+        rs = np.atleast_2d(r)[:, self.__index]
+        vs = np.atleast_2d(yerr)[:, self.__index]**2
+        nBatch, nData = rs.shape
+        amp = np.broadcast_to(np.asarray(a, dtype=float), (nBatch,))
+        lam = sqrt3 / np.sqrt(np.broadcast_to(np.asarray(tau, dtype=float), (nBatch,)))
+        if njit is not None:
+            lnl = np.array([Matern32_kalman(self.__x, rs[i], vs[i], amp[i], lam[i])
+                            for i in range(nBatch)])
+            return lnl - 0.5 * nData * np.log(PI2)
+        #-> The same filter as Matern32_kalman() for all the residuals.
+        lam2 = lam * lam
+        amp1 = lam2 * amp
+        m0, m1, p00, p01, p11, lnl, s = self.get_workspace(nBatch)
+        m0[:] = 0.
+        m1[:] = 0.
+        p00[:] = amp
+        p01[:] = 0.
+        p11[:] = amp1
+        lnl[:] = 0.
+        for i in range(nData):
+            if (i > 0) and (self.__dt[i-1] > 0):
+                dt = self.__dt[i-1]
+                e = np.exp(-lam * dt)
+                f00 = e * (1. + lam * dt)
+                f01 = e * dt
+                f10 = -e * lam2 * dt
+                f11 = e * (1. - lam * dt)
+                m0[:], m1[:] = f00 * m0 + f01 * m1, f10 * m0 + f11 * m1
+                d00 = p00 - amp
+                d11 = p11 - amp1
+                t00 = f00 * d00 + f01 * p01
+                t01 = f00 * p01 + f01 * d11
+                t10 = f10 * d00 + f11 * p01
+                t11 = f10 * p01 + f11 * d11
+                p00[:] = t00 * f00 + t01 * f01 + amp
+                p01[:] = t00 * f10 + t01 * f11
+                p11[:] = t10 * f10 + t11 * f11 + amp1
+            np.add(p00, vs[:, i], out=s)
+            v = rs[:, i] - m0
+            lnl -= 0.5 * (v * v / s + np.log(s))
+            k0 = p00 / s
+            k1 = p01 / s
+            m0 += k0 * v
+            m1 += k1 * v
+            p11 -= k1 * p01
+            p01 -= k0 * p01
+            p00 -= k0 * p00
+        return lnl - 0.5 * nData * np.log(PI2)
+
+gpCache = [None, None] # The spectral wavelength and the Matern32GP
+def get_Matern32GP(data):
+    """
+    Get the Matern32GP at the wavelength of the spectral data, which is built
+    again only if the wavelength is changed.
+    """
+    xSpc = data.get_csArray("x")
+    if gpCache[0] is not xSpc:
+        gpCache[0] = xSpc
+        gpCache[1] = Matern32GP(xSpc)
+    return gpCache[1]
+
 #Model to data function#
 def Model2Data(sedModel, sedData):
     """
@@ -175,12 +533,10 @@ def Model2Data(sedModel, sedData):
 
     Notes
     -----
-    None.
+    The model is calculated once for both the photometric and spectral data.
     """
     waveModel = sedModel.get_xList()
-    fluxModel = sedModel.combineResult()
-    fluxModelPht = sedData.model_pht(waveModel, fluxModel)
-    fluxModelSpc = sedData.model_spc(sedModel.combineResult)
+    fluxModelPht, fluxModelSpc = sedData.model_sed(waveModel, sedModel.combineResult)
     fluxModel = fluxModelPht + fluxModelSpc
     return fluxModel
 
@@ -204,18 +560,177 @@ def Model2Data_gp(sedModel, sedData):
 
     Notes
     -----
-    None.
+    The model is calculated once for both the photometric and spectral data.
+    """
+    waveModel = sedModel.get_xList()
+    fluxModelPht, fluxModelSpc = sedData.model_sed(waveModel, sedModel.combineResult)
+    fluxDict = {
+        "pht": fluxModelPht,
+        "spc": fluxModelSpc
+        }
+    return fluxDict
+
+#Model to data function for a batch of parameters
+def Model2Data_batch(sedModel, sedData, parArray):
     """
+    Convert the continual models of a batch of parameters to the data-like
+    models to directly compare with the data.
+
+    Parameters
+    ----------
+    sedModel : ModelCombiner object
+        The combined model.
+    sedData : SEDClass object
+        The data set of SED.
+    parArray : 2D array
+        The variable parameters of the model, shape (nBatch, nPar).
+
+    Returns
+    -------
+    fluxDict : dict
+        The model fluxes of the photometric ("pht") and spectral ("spc") data,
+        shape (nBatch, nData) each.
+
+    Notes
+    -----
+    The parameters of the sedModel are not updated.  The models are calculated
+    once for both the photometric and spectral data.
+    """
+    parArray = np.atleast_2d(parArray)
     waveModel = sedModel.get_xList()
-    fluxModel = sedModel.combineResult()
-    fluxModelPht = sedData.model_pht(waveModel, fluxModel)
-    fluxModelSpc = sedData.model_spc(sedModel.combineResult)
+    fluxFunc = partial(sedModel.combineResult_batch, parArray)
+    fluxModelPht, fluxModelSpc = sedData.model_sed(waveModel, fluxFunc)
     fluxDict = {
         "pht": fluxModelPht,
         "spc": fluxModelSpc
         }
     return fluxDict
 
+#Model to data function solving the linear amplitudes
+def combineResult_amp(sedModel, ampModels, x):
+    """
+    Return the sum of the additive models without linear amplitudes and the
+    models with linear amplitudes at unit amplitude, shape (1+nAmp, len(x)).
+    """
+    cmpDict = sedModel.componentResult(x)
+    fluxFixed = np.zeros_like(x)
+    for modelName in cmpDict.keys():
+        if not modelName in ampModels:
+            fluxFixed += cmpDict[modelName]
+    fluxList = [fluxFixed] + [cmpDict[modelName] for modelName in ampModels]
+    return np.array(fluxList)
+
+def Model2Data_amp(sedModel, sedData, ampList=None):
+    """
+    Solve the linear amplitudes with the current nonlinear parameters and
+    convert the continual model to the data-like model.
+
+    Parameters
+    ----------
+    sedModel : ModelCombiner object
+        The combined model.
+    sedData : SEDClass object
+        The data set of SED.
+    ampList (optional) : list
+        The (modelName, parName) of the linear amplitudes, the ones of the
+        sedModel by default.
+
+    Returns
+    -------
+    fluxModel : list
+        The model flux list of the data.
+
+    Notes
+    -----
+    The amplitudes minimize the chi-square of the detected data within the
+    ranges of the amplitude parameters (bounded least squares), and they are
+    updated in the sedModel.  The upper limits are not used to solve the
+    amplitudes but they are still used in the likelihood.
+    """
+    if ampList is None:
+        ampList = sedModel.get_linearAmp()
+    modelDict = sedModel.get_modelDict()
+    ampModels = [modelName for modelName, parName in ampList]
+    #-> Calculate the models at unit amplitude
+    for modelName, parName in ampList:
+        modelDict[modelName].parFitDict[parName]["value"] = 0.
+    waveModel = sedModel.get_xList()
+    fluxFunc = partial(combineResult_amp, sedModel, ampModels)
+    fluxModelPht, fluxModelSpc = sedData.model_sed(waveModel, fluxFunc)
+    basis = np.concatenate([fluxModelPht, fluxModelSpc], axis=1)
+    #-> Solve the amplitudes with the detected data
+    y = sedData.get_Array('y')
+    e = sedData.get_Array('e')
+    f = sedData.get_Array('f')
+    fltr = f == 0
+    ampRange = 10**np.array([modelDict[modelName].parFitDict[parName]["range"]
+                             for modelName, parName in ampList], dtype=float)
+    if np.any(fltr):
+        matrix = basis[1:, fltr].T / e[fltr, np.newaxis]
+        vector = (y[fltr] - basis[0, fltr]) / e[fltr]
+        #--> Normalize the columns, since the amplitudes are very different.
+        norm = np.sqrt(np.sum(matrix**2, axis=0))
+        norm[norm == 0] = 1.
+        result = lsq_linear(matrix / norm, vector, bounds=(ampRange[:, 0] * norm,
+                            ampRange[:, 1] * norm), method="bvls")
+        amp = np.clip(result.x / norm, ampRange[:, 0], ampRange[:, 1])
+    else:
+        amp = ampRange[:, 0]
+    for loop, (modelName, parName) in enumerate(ampList):
+        modelDict[modelName].parFitDict[parName]["value"] = np.log10(amp[loop])
+    fluxModel = basis[0] + np.dot(amp, basis[1:])
+    return list(fluxModel)
+
+def get_ampIndex(model, ampList):
+    """
+    Get the indices of the linear amplitudes in the parameter list including
+    the amplitudes.
+    """
+    ampIndex = []
+    counter = 0
+    parDict = model.get_modelParDict()
+    for modelName in model._modelList:
+        parFitDict = parDict[modelName]
+        for parName in parFitDict.keys():
+            if (modelName, parName) in ampList:
+                ampIndex.append(counter)
+                counter += 1
+            elif parFitDict[parName]["vary"]:
+                counter += 1
+    return ampIndex
+
+def recover_amplitudes(samples, data, model, ampList):
+    """
+    Recover the linear amplitudes of the samples of the nonlinear parameters.
+
+    Parameters
+    ----------
+    samples : 2D array
+        The samples without the amplitudes, shape (nSample, nPar-nAmp).
+    data : DataSet
+        The data used in the fitting.
+    model : ModelCombiner
+        The model with the amplitudes as varying parameters, i.e. after
+        reset_linearAmp().
+    ampList : list
+        The (modelName, parName) of the linear amplitudes.
+
+    Returns
+    -------
+    samples : 2D array
+        The samples with the amplitudes, shape (nSample, nPar).
+    """
+    ampIndex = get_ampIndex(model, ampList)
+    insertIndex = [index - loop for loop, index in enumerate(ampIndex)]
+    samples = np.insert(np.atleast_2d(samples), insertIndex, 0., axis=1)
+    modelDict = model.get_modelDict()
+    for loop in range(len(samples)):
+        model.updateParList(samples[loop])
+        Model2Data_amp(model, data, ampList)
+        samples[loop, ampIndex] = [modelDict[modelName].parFitDict[parName]["value"]
+                                   for modelName, parName in ampList]
+    return samples
+
 #The log_likelihood function: for SED fitting
 def logLFunc(params, data, model):
     """
@@ -240,11 +755,8 @@ def logLFunc(params, data, model):
     None.
     """
     model.updateParList(params)
-    y = np.array(data.get_List('y'))
-    e = np.array(data.get_List('e'))
-    f = np.array(data.get_List('f'))
     ym = np.array(Model2Data(model, data))
-    logL = -0.5 * ChiSq(y, ym, e, f)
+    logL = -0.5 * get_ChiSqKernel(data)(ym)
     return logL
 
 #The log_likelihood function: for SED fitting using Gaussian process regression
@@ -271,12 +783,12 @@ def logLFunc_gp(params, data, model):
     None.
     """
     #Get the data and error
-    xSpc = np.array(data.get_csList("x"))
-    yPht = np.array(data.get_dsList("y"))
-    ySpc = np.array(data.get_csList("y"))
-    ePht = np.array(data.get_dsList("e"))
-    eSpc = np.array(data.get_csList("e"))
-    fPht = np.array(data.get_dsList("f"))
+    xSpc = data.get_csArray("x")
+    yPht = data.get_dsArray("y")
+    ySpc = data.get_csArray("y")
+    ePht = data.get_dsArray("e")
+    eSpc = data.get_csArray("e")
+    fPht = data.get_dsArray("f")
     #Calculate the model
     model.updateParList(params)
     yDict = Model2Data_gp(model, data)
@@ -297,11 +809,135 @@ def logLFunc_gp(params, data, model):
         a, tau = np.exp(params[nParVary:]) #The covariance for spectral residual
         a   = a * data.spc_FluxMedian   #Make "a" a relative value
         tau = tau * data.spc_WaveLength #Make "tau" a relative value
-        gp = george.GP(a * kernels.Matern32Kernel(tau))
         sSpc = np.sqrt(eSpc**2 + (ySpcModel * f)**2)
-        gp.compute(xSpc, sSpc)
-        lnlSpc = gp.lnlikelihood(ySpc - ySpcModel)
+        #The same as george.GP(a * kernels.Matern32Kernel(tau)) in O(N).
+        lnlSpc = Matern32_lnlikelihood(xSpc, ySpc - ySpcModel, sSpc, a, tau)
+    else:
+        lnlSpc = 0
+    lnL = lnlPht + lnlSpc
+    return lnL
+
+
+#The time (s) used by the model and the Gaussian process in logLFunc_gp_batch
+gpTimer = {"model": 0., "gp": 0., "ncall": 0}
+
+#The log_likelihood function: for SED fitting using Gaussian process regression
+#with a batch of parameters
+def logLFunc_gp_batch(parArray, data, model):
+    """
+    Calculate the likelihood of data according to the model for a batch of
+    parameters, with the model uncertainty and the Gaussian process.
+
+    Parameters
+    ----------
+    parArray : 2D array
+        The variable parameters of the model and the model uncertainty, shape
+        (nBatch, nPar).
+    data : DataSet
+        The data need to fit.
+    model : ModelCombiner
+        The model to fit the data.
+
+    Returns
+    -------
+    lnL : array
+        The ln likelihood of each parameter set.
+
+    Notes
+    -----
+    The results are the same as calling logLFunc_gp() for each parameter set,
+    while the models are calculated together and the Gaussian processes use
+    one Matern32GP.  The time of the two parts are added to gpTimer.
+    """
+    t0 = time()
+    parArray = np.atleast_2d(parArray)
+    nParVary = len(model.get_parVaryList())
+    yDict = Model2Data_batch(model, data, parArray)
+    yPhtModel = np.asarray(yDict["pht"])
+    ySpcModel = np.asarray(yDict["spc"])
+    t1 = time()
+    #lnlikelihood for photometric data
+    if yPhtModel.size:
+        f = np.exp(parArray[:, nParVary:nParVary+1]) #The model incompleteness
+        nParVary += 1
+        ePht = data.get_dsArray("e")
+        sPht = np.sqrt(ePht**2 + (yPhtModel * f)**2)
+        lnlPht = -0.5 * get_ChiSqKernel(data, "ds")(yPhtModel, sPht)
+    else:
+        f = 0
+        lnlPht = 0
+    #lnlikelihood for spectral data using Gaussian process regression
+    if ySpcModel.size:
+        a, tau = np.exp(parArray[:, nParVary:nParVary+2]).T #The covariance for spectral residual
+        a   = a * data.spc_FluxMedian   #Make "a" a relative value
+        tau = tau * data.spc_WaveLength #Make "tau" a relative value
+        eSpc = data.get_csArray("e")
+        sSpc = np.sqrt(eSpc**2 + (ySpcModel * f)**2)
+        gp = get_Matern32GP(data)
+        lnlSpc = gp.lnlikelihood(data.get_csArray("y") - ySpcModel, sSpc, a, tau)
     else:
         lnlSpc = 0
     lnL = lnlPht + lnlSpc
+    gpTimer["model"] += t1 - t0
+    gpTimer["gp"] += time() - t1
+    gpTimer["ncall"] += 1
     return lnL
+
+#The log_likelihood function: for SED fitting with a batch of parameters
+def logLFunc_batch(parArray, data, model):
+    """
+    Calculate the likelihood of data according to the model for a batch of
+    parameters.
+
+    Parameters
+    ----------
+    parArray : 2D array
+        The variable parameters of the model, shape (nBatch, nPar).
+    data : DataSet
+        The data need to fit.
+    model : ModelCombiner
+        The model to fit the data.
+
+    Returns
+    -------
+    logL : array
+        The log likelihood of each parameter set.
+
+    Notes
+    -----
+    The results are the same as calling logLFunc() for each parameter set,
+    while the model is calculated for all the parameter sets at once.
+    """
+    yDict = Model2Data_batch(model, data, parArray)
+    ymArray = np.concatenate([yDict["pht"], yDict["spc"]], axis=1)
+    logL = -0.5 * get_ChiSqKernel(data)(ymArray)
+    return logL
+
+#The log_likelihood function: for SED fitting with the linear amplitudes solved
+def logLFunc_amp(params, data, model):
+    """
+    Calculate the likelihood of data according to the model and its nonlinear
+    parameters, with the linear amplitudes solved, see Model2Data_amp().
+
+    Parameters
+    ----------
+    params : list
+        The variable parameter list of the model, without the amplitudes.
+    data : DataSet
+        The data need to fit.
+    model : ModelCombiner
+        The model to fit the data.
+
+    Returns
+    -------
+    logL : float
+        The log likelihood.
+
+    Notes
+    -----
+    None.
+    """
+    model.updateParList(params)
+    ym = np.array(Model2Data_amp(model, data))
+    logL = -0.5 * get_ChiSqKernel(data)(ym)
+    return logL
@@ -1,10 +1,13 @@
 #The code comes from Composite_Model_Fit/dl07/dev_DataClass.ipynb
 
 import types
+import inspect
 import numpy as np
+from functools import partial
 from collections import OrderedDict
 import matplotlib.pyplot as plt
 from .. import model_functions as sedmf
+from .template import Template
 
 
 #Data class#
@@ -96,6 +99,7 @@ class DiscreteSet(object):
             self.__yList.append(y)
             self.__eList.append(e)
             self.__fList.append(f)
+        self.__revision = 0 # Count the changes of the data
 
     def __getitem__(self, i):
         """
@@ -170,13 +174,22 @@ class DiscreteSet(object):
             name = nameList[loop]
             self.__dataUnitDict[name].set_flag(fList[loop])
             self.__fList[loop] = int(fList[loop])
+        self.__revision += 1
         return 1
 
+    def get_revision(self):
+        """
+        Get the number of changes of the data, so that the DataSet knows when
+        to update the cached arrays.
+        """
+        return self.__revision
+
     def __getstate__(self):
         return self.__dict__
 
     def __setstate__(self, dict):
         self.__dict__ = dict
+        self.__dict__.setdefault("_DiscreteSet__revision", 0)
 
 #The continual data set unit
 class ContinueSet(object):
@@ -218,6 +231,7 @@ class ContinueSet(object):
             self.__yList.append(y)
             self.__eList.append(e)
             self.__fList.append(f)
+        self.__revision = 0 # Count the changes of the data
 
     def __getitem__(self, i):
         """
@@ -283,13 +297,22 @@ class ContinueSet(object):
         for loop in range(self.__unitNumber):
             self.__dataUnitList[loop].set_flag(fList[loop])
             self.__fList[loop] = int(fList[loop])
+        self.__revision += 1
         return 1
 
+    def get_revision(self):
+        """
+        Get the number of changes of the data, so that the DataSet knows when
+        to update the cached arrays.
+        """
+        return self.__revision
+
     def __getstate__(self):
         return self.__dict__
 
     def __setstate__(self, dict):
         self.__dict__ = dict
+        self.__dict__.setdefault("_ContinueSet__revision", 0)
 
 #The total data set that contains a number of "DiscreteSet"s and "ContinueSet"s
 class DataSet(object):
@@ -318,6 +341,8 @@ class DataSet(object):
             cSet = cSetDict[cSetName]
             if isinstance(cSet, ContinueSet):
                 self.__continueSetDict[cSetName] = cSet
+        self.__arrayCache = {} # The cached data arrays
+        self.__arrayRevision = None
 
     def add_DiscreteSet(self, dSetDict):
         for dSetName in dSetDict.keys():
@@ -326,12 +351,14 @@ class DataSet(object):
                 self.__discreteSetDict[dSetName] = dSet
             else:
                 raise ValueError("The {0} discrete set is incorrect!".format(dSetName))
+        self.__arrayCache = {}
 
     def add_ContinueSet(self, cSetDict):
         for cSetName in cSetDict.keys():
             cSet = cSetDict[cSetName]
             if isinstance(cSet, ContinueSet):
                 self.__continueSetDict[cSetName] = cSet
+        self.__arrayCache = {}
 
     def get_DiscreteSetDict(self):
         return self.__discreteSetDict
@@ -411,6 +438,62 @@ class DataSet(object):
         csList = self.get_csList(typeName)
         return dsList + csList
 
+    def get_cachedArray(self, setType, typeName):
+        """
+        Get the read-only array of the data from the cache.  The arrays are
+        built only when the data sets are added or the flags are changed.
+
+        Parameters
+        ----------
+        setType : string
+            "ds" for the discrete data, "cs" for the continual data and "all"
+            for both of them.
+        typeName : string
+            The data type, "x", "y", "e" or "f".
+
+        Returns
+        -------
+        array : array
+            The read-only array of the data.
+        """
+        revision = ([dSet.get_revision() for dSet in self.__discreteSetDict.values()],
+                    [cSet.get_revision() for cSet in self.__continueSetDict.values()])
+        if revision != self.__arrayRevision:
+            self.__arrayCache = {}
+            self.__arrayRevision = revision
+        key = (setType, typeName)
+        array = self.__arrayCache.get(key, None)
+        if array is None:
+            if setType == "ds":
+                array = np.array(self.get_dsList(typeName))
+            elif setType == "cs":
+                array = np.array(self.get_csList(typeName))
+            elif setType == "all":
+                array = np.array(self.get_List(typeName))
+            else:
+                raise KeyError("The set type '{0}' is not recognised!".format(setType))
+            array.flags.writeable = False
+            self.__arrayCache[key] = array
+        return array
+
+    def get_dsArray(self, typeName):
+        """
+        Get the read-only array of the discrete data.
+        """
+        return self.get_cachedArray("ds", typeName)
+
+    def get_csArray(self, typeName):
+        """
+        Get the read-only array of the continual data.
+        """
+        return self.get_cachedArray("cs", typeName)
+
+    def get_Array(self, typeName):
+        """
+        Get the read-only array of all the data, discrete data first.
+        """
+        return self.get_cachedArray("all", typeName)
+
     def check_dsData(self):
         """
         Return the number of discrete data sets.
@@ -428,6 +511,8 @@ class DataSet(object):
 
     def __setstate__(self, dict):
         self.__dict__ = dict
+        self.__dict__.setdefault("_DataSet__arrayCache", {})
+        self.__dict__.setdefault("_DataSet__arrayRevision", None)
 
 
 #Model class#
@@ -464,17 +549,106 @@ class ModelFunction(object):
         self.parFitDict = parFitDict
         self.parAddDict = parAddDict
         self.multiList  = multiList
+        self.compile()
+
+    def compile(self):
+        """
+        Build the call plan of the model.  The function object is resolved
+        only once and the additional parameters are bound to it, so that each
+        call only needs to pass the active variable and the fitting parameters.
+        It should be called again if the parAddDict is changed.
+        """
+        func = sedmf.get_function(self.__function)
+        self.__callPlan = partial(func, **self.parAddDict)
+        #-> Keep the references of the parameter dicts, so the values updated
+        #   in place by the ModelCombiner are always used.
+        self.__parFitItems = self.parFitDict.items()
+        self.__vectorized = self.__function in sedmf.vectorFuncList
+        #-> The function to position the parameters on the template grid,
+        #   using the templates in the parAddDict if they are provided.
+        posPar = getattr(sedmf, "{0}_PosPar".format(self.__function), None)
+        if posPar is None:
+            self.__posPlan = None
+        else:
+            posArgs = inspect.getargspec(posPar).args
+            posAdd = dict([(k, v) for k, v in self.parAddDict.items() if k in posArgs])
+            self.__posPlan = partial(posPar, **posAdd)
 
     def __call__(self, x):
-        kwargs = {}
+        kwargs = {self.xName: x}
         #Add in the parameters for fit
-        kwargs[self.xName] = x
-        for parName in self.parFitDict.keys():
-            kwargs[parName] = self.parFitDict[parName]["value"]
-        for parName in self.parAddDict.keys():
-            kwargs[parName] = self.parAddDict[parName]
-        exec "y = sedmf.{0}(**kwargs)".format(self.__function)
-        return y
+        for parName, parDict in self.__parFitItems:
+            kwargs[parName] = parDict["value"]
+        return self.__callPlan(**kwargs)
+
+    def batch(self, x, parBatch, nBatch):
+        """
+        Calculate the model for a batch of parameters.
+
+        Parameters
+        ----------
+        x : array like
+            The active variable of the model.
+        parBatch : dict
+            The arrays (length nBatch) of the fitting parameters that vary in
+            the batch.  The parameters not in the dict use their current values.
+        nBatch : int
+            The number of the parameter sets in the batch.
+
+        Returns
+        -------
+        y : array
+            The results of the model, shape (nBatch, len(x)).
+
+        Notes
+        -----
+        The vectorized functions are called once with the parameters as column
+        vectors.  The other functions are called for each parameter set.
+        """
+        if self.__vectorized:
+            kwargs = {self.xName: x}
+            for parName, parDict in self.__parFitItems:
+                if parName in parBatch:
+                    kwargs[parName] = parBatch[parName][:, np.newaxis]
+                else:
+                    kwargs[parName] = parDict["value"]
+            y = self.__callPlan(**kwargs)
+            if y.ndim == 1: # None of the parameters vary in the batch
+                y = np.tile(y, (nBatch, 1))
+            return y
+        yList = []
+        for loop in range(nBatch):
+            kwargs = {self.xName: x}
+            for parName, parDict in self.__parFitItems:
+                if parName in parBatch:
+                    kwargs[parName] = parBatch[parName][loop]
+                else:
+                    kwargs[parName] = parDict["value"]
+            yList.append(self.__callPlan(**kwargs))
+        return np.array(yList)
+
+    def get_cacheKey(self):
+        """
+        Get the key of the current fitting parameters to cache the model
+        result.  The parameters of the discrete models are positioned on the
+        template grid with the *_PosPar function, so the parameters using the
+        same template share the key.
+
+        Returns
+        -------
+        key : tuple
+            The values of all the fitting parameters.
+        """
+        parDict = dict([(parName, parDict["value"]) for parName, parDict in self.__parFitItems])
+        if self.__posPlan is not None:
+            try:
+                parDict = self.__posPlan(**parDict)
+            except RuntimeError: # Cannot position the parameters, e.g. DL07
+                pass
+        key = []
+        for parName, parFit in self.__parFitItems:
+            key.extend(np.ravel(parDict[parName]).tolist())
+        return tuple(key)
 
     def if_Add(self):
         """
@@ -491,11 +665,34 @@ class ModelFunction(object):
         """
         return self.__function
 
+    def get_templates(self):
+        """
+        Get the Template objects used by the function, either provided in the
+        parAddDict or as the default values of the function arguments.
+        """
+        argDict = {}
+        argSpec = inspect.getargspec(sedmf.get_function(self.__function))
+        if argSpec.defaults is not None:
+            nDefault = len(argSpec.defaults)
+            argDict.update(zip(argSpec.args[-nDefault:], argSpec.defaults))
+        argDict.update(self.parAddDict)
+        tmpltList = []
+        for argName in argDict.keys():
+            if isinstance(argDict[argName], Template):
+                tmpltList.append(argDict[argName])
+        return tmpltList
+
     def __getstate__(self):
-        return self.__dict__
+        #-> The call plan is rebuilt after unpickling.
+        state = self.__dict__.copy()
+        state.pop("_ModelFunction__callPlan", None)
+        state.pop("_ModelFunction__parFitItems", None)
+        state.pop("_ModelFunction__posPlan", None)
+        return state
 
     def __setstate__(self, dict):
         self.__dict__ = dict
+        self.compile()
 
 class ModelCombiner(object):
     """
@@ -518,6 +715,8 @@ class ModelCombiner(object):
         self.__modelDict = modelDict
         self._modelList = modelDict.keys()
         self.__x = xList
+        self.__ampList = [] # The amplitudes solved linearly
+        self.set_cache(0)
         self._mltList = [] # The list of models to multiply to other models
         self._addList = [] # The list of models to add together
         for modelName in self._modelList:
@@ -559,6 +758,80 @@ class ModelCombiner(object):
         """
         self.__x = xList
 
+    def set_cache(self, cacheSize=128):
+        """
+        Set the least-recently-used cache of the model component results.
+
+        Parameters
+        ----------
+        cacheSize : int
+            The maximum number of the cached component results, 0 to disable
+            the cache.
+
+        Returns
+        -------
+        None.
+
+        Notes
+        -----
+        The results are cached with the key from ModelFunction.get_cacheKey(),
+        so the discrete models are only calculated once for each template.
+        The cache is reset if the active variable is changed.  The batch
+        calculation does not use the cache.
+        """
+        self.__cacheSize = int(cacheSize)
+        self.reset_cache()
+
+    def reset_cache(self):
+        """
+        Clear the cached results and the counters.
+        """
+        self.__cache = OrderedDict()
+        self.__cacheX = None
+        self.__cacheHits = 0
+        self.__cacheMisses = 0
+
+    def get_cacheInfo(self):
+        """
+        Get the information of the cache.
+
+        Returns
+        -------
+        cacheInfo : dict
+            The numbers of the hits, the misses, the cached results, and the
+            maximum cached results.
+        """
+        cacheInfo = {
+            "hits": self.__cacheHits,
+            "misses": self.__cacheMisses,
+            "size": len(self.__cache),
+            "maxSize": self.__cacheSize
+        }
+        return cacheInfo
+
+    def evaluate_model(self, modelName, x):
+        """
+        Return the result of one model component with the current parameters,
+        using the cache if it is enabled.  The returned array can be modified.
+        """
+        mf = self.__modelDict[modelName]
+        if self.__cacheSize <= 0:
+            return mf(x)
+        if (x is not self.__cacheX) and not np.array_equal(x, self.__cacheX):
+            self.__cache.clear()
+            self.__cacheX = x
+        key = (modelName, mf.get_cacheKey())
+        y = self.__cache.pop(key, None)
+        if y is None:
+            self.__cacheMisses += 1
+            y = mf(x)
+            if len(self.__cache) >= self.__cacheSize:
+                self.__cache.popitem(last=False)
+        else:
+            self.__cacheHits += 1
+        self.__cache[key] = y # The most recently used one is the last
+        return np.copy(y)
+
     def combineResult(self, x=None):
         """
         Return the model result combining all the components.
@@ -582,12 +855,11 @@ class ModelCombiner(object):
         #-> Calculate the add model components
         addCmpDict = {}
         for modelName in self._addList:
-            mf = self.__modelDict[modelName]
-            addCmpDict[modelName] = mf(x)
+            addCmpDict[modelName] = self.evaluate_model(modelName, x)
         #-> Manipulate the model components
         for modelName in self._mltList:
             mf = self.__modelDict[modelName]
-            my = mf(x) # multiplied y component
+            my = self.evaluate_model(modelName, x) # multiplied y component
             #--> Multiply the current component to the target models
             for tmn in mf.multiList:
                 addCmpDict[tmn] *= my
@@ -597,6 +869,60 @@ class ModelCombiner(object):
             result += addCmpDict[modelName]
         return result
 
+    def combineResult_batch(self, parArray, x=None):
+        """
+        Return the combined model results for a batch of parameters.
+
+        Parameters
+        ----------
+        parArray : 2D array
+            The variable parameters, shape (nBatch, nPar), in the same order as
+            get_parVaryList().  Additional columns at the end are ignored.
+        x (optional) : array like
+            The active variable of the models.
+
+        Returns
+        -------
+        result : 2D array
+            The results of the models all combined, shape (nBatch, len(x)).
+
+        Notes
+        -----
+        The parameters of the models are not updated.
+        """
+        if x is None:
+            x = self.__x
+        parArray = np.atleast_2d(parArray)
+        nBatch = parArray.shape[0]
+        #-> Distribute the parameter columns to the models
+        parBatchDict = {}
+        counter = 0
+        for modelName in self._modelList:
+            modelParDict = self.__modelDict[modelName].parFitDict
+            parBatch = {}
+            for parName in modelParDict.keys():
+                if modelParDict[parName]["vary"]:
+                    parBatch[parName] = parArray[:, counter]
+                    counter += 1
+            parBatchDict[modelName] = parBatch
+        #-> Calculate the add model components
+        addCmpDict = {}
+        for modelName in self._addList:
+            mf = self.__modelDict[modelName]
+            addCmpDict[modelName] = mf.batch(x, parBatchDict[modelName], nBatch)
+        #-> Manipulate the model components
+        for modelName in self._mltList:
+            mf = self.__modelDict[modelName]
+            my = mf.batch(x, parBatchDict[modelName], nBatch)
+            #--> Multiply the current component to the target models
+            for tmn in mf.multiList:
+                addCmpDict[tmn] = addCmpDict[tmn] * my
+        #-> Add up all the add models
+        result = np.zeros((nBatch, len(x)))
+        for modelName in self._addList:
+            result += addCmpDict[modelName]
+        return result
+
     def componentResult(self, x=None):
         """
         Return the results of all the add components multiplied by the
@@ -621,12 +947,11 @@ class ModelCombiner(object):
         #-> Calculate the add model components
         result = OrderedDict()
         for modelName in self._addList:
-            mf = self.__modelDict[modelName]
-            result[modelName] = mf(x)
+            result[modelName] = self.evaluate_model(modelName, x)
         #-> Manipulate the model components
         for modelName in self._mltList:
             mf = self.__modelDict[modelName]
-            my = mf(x) # multiplied y component
+            my = self.evaluate_model(modelName, x) # multiplied y component
             #--> Multiply the current component to the target models
             for tmn in mf.multiList:
                 result[tmn] *= my
@@ -795,12 +1120,104 @@ class ModelCombiner(object):
                 else:
                     pass
 
+    def set_linearAmp(self, QuietMode=True):
+        """
+        Take the log amplitudes of the additive models out of the varying
+        parameters, so that they are solved linearly with the data instead of
+        being sampled.  The amplitude parameter of each function is the
+        "param_amp" in the funcLib.
+
+        Parameters
+        ----------
+        QuietMode : bool
+            Print the amplitude parameters if False.
+
+        Returns
+        -------
+        ampList : list
+            The (modelName, parName) of the linear amplitudes.
+
+        Notes
+        -----
+        Only the varying amplitudes of the additive models are used.  The
+        amplitudes are varying parameters again after reset_linearAmp().
+        """
+        for modelName in self._addList:
+            model = self.__modelDict[modelName]
+            parName = sedmf.funcLib[model.get_function_name()].get("param_amp", None)
+            if parName is None:
+                continue
+            parFit = model.parFitDict[parName]
+            if parFit["vary"] and (parFit["type"] == "c"):
+                parFit["vary"] = False
+                self.__ampList.append((modelName, parName))
+                if not QuietMode:
+                    print "[ModelCombiner]: {0}-{1} is linear".format(modelName, parName)
+        return self.__ampList
+
+    def reset_linearAmp(self):
+        """
+        Put the linear amplitudes back to the varying parameters.
+        """
+        ampList = self.__ampList
+        for modelName, parName in ampList:
+            self.__modelDict[modelName].parFitDict[parName]["vary"] = True
+        self.__ampList = []
+        return ampList
+
+    def get_linearAmp(self):
+        """
+        Get the (modelName, parName) of the linear amplitudes.
+        """
+        return self.__ampList
+
+    def bake_templates(self, x=None, maxMemory=None, QuietMode=True, shareDir=None):
+        """
+        Bake the templates used by the models on the active variable, see
+        Template.bake().
+
+        Parameters
+        ----------
+        x (optional) : array like
+            The active variable to bake the templates.
+        maxMemory (optional) : float
+            The maximum memory (MB) of each template.
+        QuietMode : bool
+            Print the memory use if False.
+        shareDir (optional) : string
+            The directory to share the baked templates among the processes.
+            The unpickled templates (e.g., in the MPI workers) map the same
+            baked fluxes once per process.
+
+        Returns
+        -------
+        memory : float
+            The total memory (MB) used by the baked templates.
+        """
+        if x is None:
+            x = self.__x
+        memory = 0.
+        bakedList = []
+        for modelName in self._modelList:
+            for tmplt in self.__modelDict[modelName].get_templates():
+                if tmplt in bakedList:
+                    continue
+                if not QuietMode:
+                    print("[ModelCombiner]: {0}".format(modelName))
+                memory += tmplt.bake(x, maxMemory, QuietMode, shareDir)
+                bakedList.append(tmplt)
+        if not QuietMode:
+            print("[ModelCombiner]: {0:.1f} MB used by the baked templates".format(memory))
+        return memory
+
     def updateParAdd(self, modelName, parName, parValue, QuietMode=True):
         model = self.__modelDict[modelName]
         if not QuietMode:
             orgValue = model.parAddDict[parName]
             print "[{0}][{1}] {2}->{3}".format(modelName, parName, orgValue, parValue)
         model.parAddDict[parName] = parValue
+        model.compile()
+        self.reset_cache()
 
     def plot(self, x=None, colorList=None, FigAx=None, DisplayPars=False,
              tKwargs=None, cKwargs={}, useLabel=True):
@@ -854,10 +1271,17 @@ class ModelCombiner(object):
         return FigAx
 
     def __getstate__(self):
-        return self.__dict__
+        #-> The cached results are not saved.
+        state = self.__dict__.copy()
+        state["_ModelCombiner__cache"] = OrderedDict()
+        state["_ModelCombiner__cacheX"] = None
+        return state
 
     def __setstate__(self, dict):
         self.__dict__ = dict
+        self.__dict__.setdefault("_ModelCombiner__ampList", [])
+        if not "_ModelCombiner__cacheSize" in self.__dict__:
+            self.set_cache(0)
 
 #The function generate the ModelCombiner from input model dict
 def Model_Generator(input_model_dict, func_lib, x_list, par_add_dict_all={},
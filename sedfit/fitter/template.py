@@ -1,8 +1,33 @@
+import os
+import fcntl
+import hashlib
 import numpy as np
+import cPickle as pickle
+from bisect import bisect_left
 from sklearn.neighbors import KDTree
 from sklearn.decomposition import PCA
 from scipy.interpolate import splev
 
+#The baked fluxes mapped from the shared files in this process, {path: flux}.
+#Only the files of the latest share directory are kept, e.g., of one fitting.
+sharedFluxes = {}
+
+def map_shared(bakePath):
+    """
+    Return the baked fluxes mapped read-only from the file.  The file is only
+    mapped once in each process, so the unpickled templates use the same map.
+    """
+    bakedFlux = sharedFluxes.get(bakePath, None)
+    if bakedFlux is None:
+        shareDir = os.path.dirname(bakePath)
+        for path in sharedFluxes.keys():
+            if os.path.dirname(path) != shareDir:
+                sharedFluxes.pop(path)
+        #-> A plain array view keeps the memory map open.
+        bakedFlux = np.load(bakePath, mmap_mode="r").view(np.ndarray)
+        sharedFluxes[bakePath] = bakedFlux
+    return bakedFlux
+
 class Template(object):
     """
     This is the object of a model template.
@@ -15,29 +40,271 @@ class Template(object):
         self.__modelInfo = modelInfo
         self.__parFormat = parFormat
         self._readMe    = readMe
+        self.__bakedWave = None # The wavelength of the baked fluxes
+        self.__bakedFlux = None
+        self.__bakedPath = None # The file of the shared baked fluxes
+        self.set_gridIndex()
 
     def __call__(self, x, pars):
         """
         Return the interpolation result of the template nearest the input
-        parameters.
+        parameters.  If any of the parameters is an array, the parameters are
+        treated as a batch and the results are returned in shape (n, len(x)).
         """
         x = np.array(x)
-        ind = np.squeeze(self.__kdTree.query(np.atleast_2d(pars), return_distance=False))
-        tck = self.__tckList[ind]
-        return splev(x, tck)
+        ind = self.get_nearestIndex(pars)
+        #-> Use the baked fluxes if x is a part of the baked wavelength.
+        bakedSlice = self.get_bakedSlice(x)
+        if bakedSlice is not None:
+            if np.ndim(ind) == 0:
+                return self.__bakedFlux[ind, bakedSlice].copy()
+            return self.__bakedFlux[ind, bakedSlice]
+        if np.ndim(ind) == 0:
+            tck = self.__tckList[ind]
+            return splev(x, tck)
+        #-> Only calculate the templates that are used by the batch.
+        indUnq, indInv = np.unique(ind, return_inverse=True)
+        fluxUnq = np.array([splev(x, self.__tckList[i]) for i in indUnq])
+        return fluxUnq[indInv]
+
+    def bake(self, wave, maxMemory=None, QuietMode=True, shareDir=None):
+        """
+        Calculate the fluxes of all the templates on the given wavelength,
+        so that the evaluation on the wavelength (or any contiguous part of
+        it) is only an index lookup.
+
+        Parameters
+        ----------
+        wave : float array
+            The wavelength to bake the templates, in increasing order.
+        maxMemory (optional) : float
+            The maximum memory (MB) to use.  The template is not baked if the
+            flux matrix is larger.
+        QuietMode : bool
+            Print the memory use if False.
+        shareDir (optional) : string
+            The directory (e.g., /dev/shm) to share the baked fluxes.  The
+            fluxes are calculated by the first process and saved in the
+            directory, and all the processes map the same file read-only.
+            The pickled template maps the file again when it is loaded, so
+            the file should be kept until the processes are started.
+
+        Returns
+        -------
+        memory : float
+            The memory (MB) used by the baked fluxes, 0 if not baked.
+
+        Notes
+        -----
+        The baked fluxes are identical to the spline interpolation.  Nothing
+        is done if the template is already baked on the same wavelength.
+        """
+        wave = np.array(wave, dtype=float)
+        memory = len(self.__tckList) * len(wave) * 8. / 1024.**2
+        if (self.__bakedWave is not None) and np.array_equal(self.__bakedWave, wave):
+            if shareDir is None:
+                return memory
+            if (self.__bakedPath is not None) and \
+               (os.path.dirname(self.__bakedPath) == os.path.normpath(shareDir)):
+                return memory
+        if (maxMemory is not None) and (memory > maxMemory):
+            if not QuietMode:
+                print("[Template]: {0:.1f} MB exceeds {1:.1f} MB, not baked!".format(memory, maxMemory))
+            return 0.
+        if shareDir is None:
+            self.__bakedFlux = np.array([splev(wave, tck) for tck in self.__tckList])
+            self.__bakedPath = None
+        else:
+            self.__bakedPath = self.bake_shared(wave, shareDir)
+            self.__bakedFlux = map_shared(self.__bakedPath)
+        self.__bakedWave = wave
+        if not QuietMode:
+            print("[Template]: {0} templates baked, {1:.1f} MB".format(len(self.__tckList), memory))
+        return memory
+
+    def bake_shared(self, wave, shareDir):
+        """
+        Return the path of the file of the baked fluxes in shareDir.  The
+        file is named by the digest of the template and the wavelength, and
+        it is only calculated once by the processes sharing the directory.
+        """
+        bakePath = os.path.join(os.path.normpath(shareDir),
+                                "tmplt_{0}.npy".format(self.get_digest(wave)))
+        #-> The lock makes the other processes wait until the file is written.
+        fpLock = open("{0}.lock".format(bakePath), "a")
+        fcntl.flock(fpLock, fcntl.LOCK_EX)
+        try:
+            if not os.path.isfile(bakePath):
+                #-> Write the fluxes directly into the file to avoid a
+                # private copy in the first process.
+                tempPath = "{0}.{1}.tmp".format(bakePath, os.getpid())
+                bakedFlux = np.lib.format.open_memmap(tempPath, mode="w+", dtype=float,
+                                                      shape=(len(self.__tckList), len(wave)))
+                for loop, tck in enumerate(self.__tckList):
+                    bakedFlux[loop, :] = splev(wave, tck)
+                bakedFlux.flush()
+                del bakedFlux
+                os.rename(tempPath, bakePath)
+        finally:
+            fcntl.flock(fpLock, fcntl.LOCK_UN)
+            fpLock.close()
+        return bakePath
+
+    def get_digest(self, wave=None):
+        """
+        Return the md5 digest identifying the template (and the wavelength).
+        The store path is used for the store-backed templates, otherwise the
+        digest is calculated from all the splines.
+        """
+        md5 = hashlib.md5()
+        if isinstance(self.__tckList, SplineStore):
+            storePath = os.path.realpath(self.__tckList.get_storePath())
+            md5.update(storePath)
+            md5.update(repr(os.path.getmtime(os.path.join(storePath, "coefs.npy"))))
+        else:
+            for tck in self.__tckList:
+                md5.update(np.ascontiguousarray(tck[0], dtype=float).tostring())
+                md5.update(np.ascontiguousarray(tck[1], dtype=float).tostring())
+                md5.update(repr(tck[2]))
+        if wave is not None:
+            md5.update(np.ascontiguousarray(wave, dtype=float).tostring())
+        return md5.hexdigest()
+
+    def unbake(self):
+        """
+        Release the baked fluxes.
+        """
+        self.__bakedWave = None
+        self.__bakedFlux = None
+        self.__bakedPath = None
+
+    def get_bakedSlice(self, x):
+        """
+        Return the slice of the baked wavelength that is the same as x, or
+        None if x is not a contiguous part of the baked wavelength.
+        """
+        bakedWave = self.__bakedWave
+        if (bakedWave is None) or (np.ndim(x) != 1) or (len(x) == 0):
+            return None
+        i0 = np.searchsorted(bakedWave, x[0])
+        i1 = i0 + len(x)
+        if (i1 > len(bakedWave)) or (not np.array_equal(bakedWave[i0:i1], x)):
+            return None
+        return slice(i0, i1)
+
+    def get_nearestIndex(self, pars):
+        """
+        Return the index of the template nearest the input parameters.  The
+        input is the list of parameters; each one is either a scalar or an
+        array of the batch.  An integer is returned if all of the parameters
+        are scalars, otherwise an array of indices is returned.
+        """
+        if self.__gridAxes is not None:
+            return self.get_nearestIndex_grid(pars)
+        if np.all([np.ndim(p) == 0 for p in pars]):
+            return np.squeeze(self.get_kdTree().query(np.atleast_2d(pars), return_distance=False))
+        parArray = np.column_stack(np.broadcast_arrays(*[np.ravel(p) for p in pars]))
+        ind = self.get_kdTree().query(parArray, return_distance=False)
+        return ind[:, 0]
+
+    def set_gridIndex(self):
+        """
+        Use the grid index to find the nearest template if the parameters are
+        on a rectilinear grid, which is also the space of the KDTree.
+        Otherwise, the KDTree is used.
+        """
+        gridAxes, gridIndex = grid_index(self.__parList)
+        if (gridAxes is not None) and (self.__kdTree is not None):
+            try:
+                kdtData = np.asarray(self.__kdTree.data)
+                if not np.array_equal(kdtData, np.asarray(self.__parList, dtype=float)):
+                    gridAxes, gridIndex = None, None
+            except AttributeError:
+                gridAxes, gridIndex = None, None
+        self.__gridAxes = gridAxes
+        self.__gridIndex = gridIndex
+        if gridAxes is None:
+            self.__gridLists = None
+        else:
+            self.__gridLists = [list(axis) for axis in gridAxes]
+
+    def get_kdTree(self):
+        """
+        Get the KDTree of the template parameters.  It is built from the
+        parList if it is not provided.
+        """
+        if self.__kdTree is None:
+            self.__kdTree = KDTree(np.array(self.__parList, dtype=float))
+        return self.__kdTree
+
+    def get_nearestIndex_grid(self, pars):
+        """
+        Return the index of the template nearest the input parameters using
+        the grid index.  The nearest node of a rectilinear grid is found on
+        each axis independently, which is the same as the KDTree query.
+        """
+        gridAxes = self.__gridAxes
+        if len(pars) != len(gridAxes):
+            raise ValueError("The number of parameters ({0}) is incorrect!".format(len(pars)))
+        #-> Scalar parameters are located with bisect to avoid numpy overhead.
+        if all([np.ndim(p) == 0 for p in pars]):
+            idxList = []
+            for loop, axis in enumerate(self.__gridLists):
+                p = float(pars[loop])
+                nAxis = len(axis)
+                if nAxis == 1:
+                    idxList.append(0)
+                    continue
+                idx = min(max(bisect_left(axis, p), 1), nAxis - 1)
+                if (p - axis[idx - 1]) <= (axis[idx] - p):
+                    idx -= 1
+                idxList.append(idx)
+            return self.__gridIndex[tuple(idxList)]
+        idxList = []
+        for loop, axis in enumerate(gridAxes):
+            p = pars[loop]
+            nAxis = len(axis)
+            if nAxis == 1:
+                idxList.append(np.zeros(np.shape(p), dtype=int))
+                continue
+            idx = np.clip(np.searchsorted(axis, p), 1, nAxis - 1)
+            #-> Move to the lower node if it is closer.
+            idx = idx - ((p - axis[idx - 1]) <= (axis[idx] - p))
+            idxList.append(idx)
+        idxList = np.broadcast_arrays(*[np.ravel(idx) for idx in idxList])
+        return self.__gridIndex[tuple(idxList)]
 
     def get_nearestParameters(self, pars):
         """
-        Return the nearest template parameters to the input parameters.
+        Return the nearest template parameters to the input parameters.  The
+        result is in shape (n, npar) if the parameters are a batch.
         """
-        ind = np.squeeze(self.__kdTree.query(np.atleast_2d(pars), return_distance=False))
-        return self.__parList[ind]
+        ind = self.get_nearestIndex(pars)
+        if np.ndim(ind) == 0:
+            return self.__parList[ind]
+        return np.asarray(self.__parList)[ind]
 
     def __getstate__(self):
-        return self.__dict__.copy()
+        #-> The baked fluxes are not saved, only the file of the shared ones.
+        state = self.__dict__.copy()
+        if self.__bakedPath is None:
+            state["_Template__bakedWave"] = None
+        state["_Template__bakedFlux"] = None
+        return state
 
     def __setstate__(self, dict):
         self.__dict__ = dict
+        self.__dict__.setdefault("_Template__bakedWave", None)
+        self.__dict__.setdefault("_Template__bakedFlux", None)
+        self.__dict__.setdefault("_Template__bakedPath", None)
+        if not "_Template__gridAxes" in self.__dict__:
+            self.set_gridIndex()
+        #-> Map the shared baked fluxes, or use the splines if the file is removed.
+        if self.__bakedPath is not None:
+            try:
+                self.__bakedFlux = map_shared(self.__bakedPath)
+            except (IOError, OSError):
+                self.unbake()
 
     def get_parList(self):
         return self.__parList
@@ -51,6 +318,215 @@ class Template(object):
     def readme(self):
         return self._readMe
 
+class SplineStore(object):
+    """
+    The list of the spline tcks of a template store.  The arrays are opened
+    with memory mapping when a spline is first requested, so only the used
+    parts of the templates are read into the memory.
+
+    Parameters
+    ----------
+    storePath : string
+        The path of the template store.
+    nSpline : int
+        The number of the splines.
+    """
+    def __init__(self, storePath, nSpline):
+        self.__storePath = storePath
+        self.__nSpline = nSpline
+        self.__arrays = None
+
+    def get_arrays(self):
+        """
+        Open the arrays of the splines with memory mapping.
+        """
+        if self.__arrays is None:
+            self.__arrays = [np.load(os.path.join(self.__storePath, "{0}.npy".format(n)), mmap_mode="r")
+                             for n in ["knots", "coefs", "nknots", "ncoefs", "degree"]]
+        return self.__arrays
+
+    def get_storePath(self):
+        return self.__storePath
+
+    def __len__(self):
+        return self.__nSpline
+
+    def __getitem__(self, i):
+        knots, coefs, nknots, ncoefs, degree = self.get_arrays()
+        return (knots[i, :nknots[i]], coefs[i, :ncoefs[i]], int(degree[i]))
+
+    def __iter__(self):
+        for loop in range(self.__nSpline):
+            yield self[loop]
+
+    def __getstate__(self):
+        #-> Only the path is saved and the arrays are opened again.
+        state = self.__dict__.copy()
+        state["_SplineStore__arrays"] = None
+        return state
+
+    def __setstate__(self, dict):
+        self.__dict__ = dict
+
+def dump_store(tmpltDict, storePath):
+    """
+    Save the template into a template store, i.e., a directory of npy files
+    of the splines and the parameters and a small header of the other
+    information.
+
+    Parameters
+    ----------
+    tmpltDict : dict
+        The dict of the template, the input of the Template class.
+    storePath : string
+        The path of the template store.
+
+    Returns
+    -------
+    None.
+
+    Notes
+    -----
+    The KDTree is built from the parameters when the store is loaded.  Its
+    data is saved only if it is different from the parameters.
+    """
+    if not os.path.isdir(storePath):
+        os.makedirs(storePath)
+    tckList = tmpltDict["tckList"]
+    nSpline = len(tckList)
+    nknots = np.array([len(tck[0]) for tck in tckList], dtype=int)
+    ncoefs = np.array([len(tck[1]) for tck in tckList], dtype=int)
+    degree = np.array([tck[2] for tck in tckList], dtype=int)
+    knots = np.zeros((nSpline, np.max(nknots)))
+    coefs = np.zeros((nSpline, np.max(ncoefs)))
+    for loop in range(nSpline):
+        knots[loop, :nknots[loop]] = tckList[loop][0]
+        coefs[loop, :ncoefs[loop]] = tckList[loop][1]
+    parList = np.array(tmpltDict["parList"], dtype=float)
+    arrayDict = {
+        "knots": knots,
+        "coefs": coefs,
+        "nknots": nknots,
+        "ncoefs": ncoefs,
+        "degree": degree,
+        "parList": parList,
+    }
+    kdTree = tmpltDict.get("kdTree", None)
+    if kdTree is not None:
+        kdtData = np.asarray(kdTree.data)
+        if not np.array_equal(kdtData, parList):
+            arrayDict["kdtData"] = kdtData
+    for arrayName in arrayDict.keys():
+        np.save(os.path.join(storePath, "{0}.npy".format(arrayName)), arrayDict[arrayName])
+    header = {
+        "nSpline": nSpline,
+        "modelInfo": tmpltDict.get("modelInfo", {}),
+        "parFormat": tmpltDict.get("parFormat", []),
+        "readMe": tmpltDict.get("readMe", ""),
+    }
+    fp = open(os.path.join(storePath, "header.pkl"), "wb")
+    pickle.dump(header, fp, protocol=2)
+    fp.close()
+
+def read_store(storePath):
+    """
+    Load the template from a template store.  Only the header and the
+    parameters are read; the splines are memory mapped when they are used.
+
+    Parameters
+    ----------
+    storePath : string
+        The path of the template store.
+
+    Returns
+    -------
+    template : Template
+        The template object.
+    """
+    fp = open(os.path.join(storePath, "header.pkl"), "rb")
+    header = pickle.load(fp)
+    fp.close()
+    parList = np.load(os.path.join(storePath, "parList.npy")).tolist()
+    kdtPath = os.path.join(storePath, "kdtData.npy")
+    if os.path.isfile(kdtPath):
+        kdTree = KDTree(np.load(kdtPath))
+    else:
+        kdTree = None
+    tckList = SplineStore(storePath, header["nSpline"])
+    template = Template(tckList, kdTree, parList, header["modelInfo"],
+                        header["parFormat"], header["readMe"])
+    return template
+
+def load_template(tmpltPath, subName=None):
+    """
+    Load the template.  The template store (tmpltPath.tstore) is used if it
+    exists, otherwise the pickled template (tmpltPath.tmplt) is loaded.
+
+    Parameters
+    ----------
+    tmpltPath : string
+        The path of the template without the extension.
+    subName (optional) : string
+        The name of the template if the file contains several templates.
+
+    Returns
+    -------
+    template : Template
+        The template object.
+    """
+    storePath = "{0}.tstore".format(tmpltPath)
+    if subName is not None:
+        storePath = os.path.join(storePath, subName)
+    if os.path.isdir(storePath):
+        return read_store(storePath)
+    fp = open("{0}.tmplt".format(tmpltPath), "r")
+    tmpltDict = pickle.load(fp)
+    fp.close()
+    if subName is not None:
+        tmpltDict = tmpltDict[subName]
+    return Template(**tmpltDict)
+
+def grid_index(parList):
+    """
+    Build the index of the templates if their parameters are the Cartesian
+    product of the values on each axis.
+
+    Parameters
+    ----------
+    parList : array like, shape (n_templates, n_parameters)
+        The parameters of the templates.
+
+    Returns
+    -------
+    (gridAxes, gridIndex) : tuple
+        gridAxes : list of arrays
+            The sorted unique values of each parameter.
+        gridIndex : int array, shape (len(axis_1), ..., len(axis_n))
+            The index of the template at each node of the grid.
+        (None, None) is returned if the parameters are not on a grid.
+
+    Notes
+    -----
+    None.
+    """
+    try:
+        parArray = np.array(parList, dtype=float)
+    except (TypeError, ValueError):
+        return (None, None)
+    if (parArray.ndim != 2) or (len(parArray) == 0):
+        return (None, None)
+    gridAxes = [np.unique(parArray[:, loop]) for loop in range(parArray.shape[1])]
+    gridShape = tuple([len(axis) for axis in gridAxes])
+    if np.prod(gridShape) != len(parArray):
+        return (None, None)
+    idxList = [np.searchsorted(gridAxes[loop], parArray[:, loop])
+               for loop in range(parArray.shape[1])]
+    gridIndex = -np.ones(gridShape, dtype=int)
+    gridIndex[tuple(idxList)] = np.arange(len(parArray))
+    if np.any(gridIndex < 0): # Some nodes are repeated and some are missing
+        return (None, None)
+    return (gridAxes, gridIndex)
+
 def PCA_decompose(X, n_components, **kwargs):
     """
     Use PCA to decompose the input templates.
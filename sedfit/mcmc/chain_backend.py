@@ -0,0 +1,229 @@
+import os
+import h5py
+import shutil
+import numpy as np
+import cPickle as pickle
+
+#The sampler attributes that are saved besides the chain
+samplerAttrs = {
+    "EnsembleSampler": ["naccepted"],
+    "PTSampler": ["nswap", "nswap_accepted", "nprop", "nprop_accepted"]
+}
+
+def dump_state(state):
+    """
+    Convert the random state into an attribute of the HDF5 file.
+    """
+    return np.void(pickle.dumps(state, protocol=2))
+
+def load_state(attr):
+    """
+    Convert the attribute of the HDF5 file into the random state.
+    """
+    return pickle.loads(attr.tostring())
+
+class ChainBackend(object):
+    """
+    The HDF5 file to save the emcee runs incrementally.  Each run is saved in a
+    group with the chain, the ln probability (and the ln likelihood of the
+    PTSampler), the last positions, the acceptance counts and the random
+    states, so that the run can continue from the last checkpoint.
+
+    Parameters
+    ----------
+    fileName : string
+        The path of the HDF5 file.
+    checkStep : int, default: 100
+        The number of steps between the checkpoints.
+    resume : bool, default: False
+        Keep the runs in the file to resume them if True, otherwise, the file
+        is overwritten.
+
+    Notes
+    -----
+    The checkpoints are only made when the number of steps is a multiple of
+    the thin of the run, so the stored samples are the same as those without
+    the interruption.  Each checkpoint is written to a copy of the file, which
+    then replaces the file, so the file keeps the previous checkpoint if the
+    run is killed during the saving.
+    """
+    def __init__(self, fileName, checkStep=100, resume=False):
+        self.fileName = fileName
+        self.checkStep = int(checkStep)
+        if (not resume) or (not os.path.isfile(fileName)):
+            h5py.File(fileName, "w").close()
+
+    def get_runNames(self):
+        """
+        Get the names of the runs in the file.
+        """
+        runNames = []
+        h = h5py.File(self.fileName, "r")
+        h.visititems(lambda name, obj: runNames.append(name) if "nstep" in obj.attrs else None)
+        h.close()
+        return runNames
+
+    def check_point(self, nstep, iterations, thin):
+        """
+        Check whether a checkpoint is made after nstep steps of the run.
+        """
+        if nstep == iterations:
+            return True
+        return (nstep % self.checkStep == 0) & (nstep % thin == 0)
+
+    def save(self, runName, sampler, samplerType, pos, lnprob, logl, nstep,
+             iterations, thin, finished=False, random=None, nfev=None):
+        """
+        Append the new samples of the run to the file and update the last
+        positions and the states.
+
+        Parameters
+        ----------
+        runName : string
+            The name of the run.
+        sampler : emcee sampler
+            The EnsembleSampler or the PTSampler of the run.
+        samplerType : string
+            "EnsembleSampler" or "PTSampler".
+        pos : array
+            The current positions of the walkers.
+        lnprob : array
+            The ln probability of the current positions.
+        logl : array or None
+            The ln likelihood of the current positions, only for PTSampler.
+        nstep : int
+            The number of steps finished.
+        iterations : int
+            The total steps of the run.
+        thin : int
+            The thin of the run.
+        finished : bool, default: False
+            Whether the run stops before the iterations, e.g., converged.
+        random : RandomState or None by default
+            The random number generator of the initial positions, if it is not
+            the global numpy random state.
+        nfev : int or None by default
+            The likelihood calls of the run until nstep, including those
+            before the run resumed.
+        """
+        if samplerType == "EnsembleSampler":
+            nsave = -(-nstep // thin)
+            arrays = {"chain": sampler._chain[:, :nsave],
+                      "lnprob": sampler._lnprob[:, :nsave]}
+            axis = 1
+        else:
+            nsave = nstep // thin
+            arrays = {"chain": sampler._chain[:, :, :nsave],
+                      "lnprob": sampler._lnprob[:, :, :nsave],
+                      "lnlike": sampler._lnlikelihood[:, :, :nsave]}
+            axis = 2
+        #->Write the checkpoint to a copy and replace the file afterwards
+        tempPath = "{0}.tmp".format(self.fileName)
+        shutil.copyfile(self.fileName, tempPath)
+        h = h5py.File(tempPath, "a")
+        try:
+            grp = h.require_group(runName)
+            for name, array in arrays.items():
+                if name in grp:
+                    dset = grp[name]
+                    nsave0 = dset.shape[axis]
+                    shape = list(array.shape)
+                    dset.resize(shape)
+                    index = [slice(None)] * array.ndim
+                    index[axis] = slice(nsave0, None)
+                    dset[tuple(index)] = array[tuple(index)]
+                else:
+                    maxshape = list(array.shape)
+                    maxshape[axis] = None
+                    grp.create_dataset(name, data=array, maxshape=tuple(maxshape))
+            lastDict = {"pos": pos, "pos_lnprob": lnprob, "pos_lnlike": logl}
+            for name in samplerAttrs[samplerType]:
+                lastDict[name] = getattr(sampler, name)
+            for name, array in lastDict.items():
+                if array is None:
+                    continue
+                if name in grp:
+                    grp[name][...] = array
+                else:
+                    grp.create_dataset(name, data=array)
+            grp.attrs["sampler"] = samplerType
+            grp.attrs["nstep"] = nstep
+            grp.attrs["iterations"] = iterations
+            grp.attrs["thin"] = thin
+            grp.attrs["finished"] = finished or (nstep == iterations)
+            if not nfev is None:
+                grp.attrs["nfev"] = nfev
+            if samplerType == "EnsembleSampler":
+                grp.attrs["random_state"] = dump_state(sampler.random_state)
+            grp.attrs["np_random_state"] = dump_state(np.random.get_state())
+            if not random is None:
+                grp.attrs["init_random_state"] = dump_state(random.get_state())
+        except:
+            h.close()
+            os.remove(tempPath)
+            raise
+        h.close()
+        os.rename(tempPath, self.fileName)
+
+    def load(self, runName):
+        """
+        Load the run from the file.
+
+        Parameters
+        ----------
+        runName : string
+            The name of the run.
+
+        Returns
+        -------
+        runDict : dict or None
+            The arrays and the attributes of the run, None if the run is not
+            found.
+        """
+        h = h5py.File(self.fileName, "r")
+        if not runName in h:
+            h.close()
+            return None
+        grp = h[runName]
+        runDict = {}
+        for name in grp.keys():
+            runDict[name] = grp[name][...]
+        for name in ["sampler", "nstep", "iterations", "thin", "finished"]:
+            runDict[name] = grp.attrs[name]
+        if "nfev" in grp.attrs:
+            runDict["nfev"] = grp.attrs["nfev"]
+        if "random_state" in grp.attrs:
+            runDict["random_state"] = load_state(grp.attrs["random_state"])
+        runDict["np_random_state"] = load_state(grp.attrs["np_random_state"])
+        if "init_random_state" in grp.attrs:
+            runDict["init_random_state"] = load_state(grp.attrs["init_random_state"])
+        h.close()
+        return runDict
+
+    def restore(self, sampler, runDict, random=None):
+        """
+        Put the saved samples and the states of the run back to the sampler.
+
+        Parameters
+        ----------
+        sampler : emcee sampler
+            The new sampler of the run.
+        runDict : dict
+            The run loaded from the file.
+        random : RandomState or None by default
+            The random number generator of the initial positions, if it is not
+            the global numpy random state.
+        """
+        samplerType = runDict["sampler"]
+        sampler._chain = runDict["chain"]
+        sampler._lnprob = runDict["lnprob"]
+        for name in samplerAttrs[samplerType]:
+            setattr(sampler, name, runDict[name])
+        if samplerType == "EnsembleSampler":
+            sampler.iterations = runDict["nstep"]
+            sampler.random_state = runDict["random_state"]
+        else:
+            sampler._lnlikelihood = runDict["lnlike"]
+        np.random.set_state(runDict["np_random_state"])
+        if (not random is None) and ("init_random_state" in runDict):
+            random.set_state(runDict["init_random_state"])
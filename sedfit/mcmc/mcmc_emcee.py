@@ -1,13 +1,18 @@
-import acor
 import emcee
 import corner
 import numpy as np
+import multiprocessing
 import matplotlib.pyplot as plt
 from matplotlib.ticker import MaxNLocator
+from functools import partial
+from scipy import fftpack
 from scipy.stats import truncnorm
+from scipy.optimize import minimize, differential_evolution
 from time import time
 from ..SED_Toolkit import WaveFromMicron, WaveToMicron
 from .. import fit_functions as sedff
+from .chain_backend import ChainBackend
+from .results_catalog import ResultCatalog, summarize_fitrs
 #from .. import fit_functions_erf as sedff
 ls_mic = 2.99792458e14 # micron/s
 
@@ -15,6 +20,12 @@ ls_mic = 2.99792458e14 # micron/s
 lnlike = sedff.logLFunc
 #The log_likelihood function using Gaussian process regression
 lnlike_gp = sedff.logLFunc_gp
+#The log_likelihood function using Gaussian process regression for a batch of parameters
+lnlike_gp_batch = sedff.logLFunc_gp_batch
+#The log_likelihood function for a batch of parameters
+lnlike_batch = sedff.logLFunc_batch
+#The log_likelihood function with the linear amplitudes solved
+lnlike_amp = sedff.logLFunc_amp
 
 def lnprior(params, data, model, ModelUnct, unctDict=None):
     """
@@ -68,17 +79,331 @@ def lnprob_gp(params, data, model, ModelUnct, unctDict):
         return -np.inf
     return lp + lnlike_gp(params, data, model)
 
+def lnprob_amp(params, data, model, ModelUnct, unctDict):
+    """
+    Calculate the probability at the parameter spacial position.
+    The linear amplitudes of the model are solved in the likelihood.
+    """
+    lp = lnprior(params, data, model, ModelUnct, unctDict)
+    if not np.isfinite(lp):
+        return -np.inf
+    return lp + lnlike_amp(params, data, model)
+
+def lnprob_pt(params, data, model, logl, logp, loglargs=(), logpargs=()):
+    """
+    Calculate the ln likelihood and the ln prior for the PTSampler, the same
+    as the emcee PTLikePrior, logl(params, data, model, *loglargs) and
+    logp(params, data, model, *logpargs).
+    """
+    lp = logp(params, data, model, *logpargs)
+    if lp == -np.inf:
+        return lp, lp
+    return logl(params, data, model, *loglargs), lp
+
+def lnprob_map(params, data, model, ModelUnct, unctDict, lnprobFunc, method, bounds):
+    """
+    Find the maximum of the ln probability from the position params, with the
+    method of scipy.optimize.minimize() within the bounds.
+
+    Returns
+    -------
+    (pmax, lnpmax, nfev) : tuple
+        The position and the ln probability of the maximum, and the number of
+        the ln probability evaluations.
+    """
+    bounds = np.asarray(bounds, dtype=float)
+    nfev = [0]
+    def negLnprob(p):
+        nfev[0] += 1
+        #-> The methods without bounds and the numerical gradients may step
+        #outside the prior ranges.
+        lnp = lnprobFunc(np.clip(p, bounds[:, 0], bounds[:, 1]), data, model,
+                         ModelUnct, unctDict)
+        if np.isfinite(lnp):
+            return -lnp
+        else:
+            return 1e300
+    if method == "L-BFGS-B":
+        res = minimize(negLnprob, params, method=method, bounds=bounds)
+    else:
+        res = minimize(negLnprob, params, method=method)
+    pmax = np.clip(res.x, bounds[:, 0], bounds[:, 1])
+    return pmax, -res.fun, nfev[0]
+
+def get_parRanges(data, model, ModelUnct, unctDict=None):
+    """
+    Get the ranges of all the parameters, including the parameters of the
+    model uncertainty, shape (ndim, 2).
+    """
+    pRange = model.get_parVaryRanges()
+    if ModelUnct:
+        if data.check_dsData():
+            pRange.append(unctDict["lnf"])
+        if data.check_csData():
+            pRange.append(unctDict["lna"])
+            pRange.append(unctDict["lntau"])
+    return np.array(pRange, dtype=float)
+
+def lnprior_batch(parArray, data, model, ModelUnct, unctDict=None):
+    """
+    Calculate the ln prior probability for a batch of parameters.
+    """
+    pRange = get_parRanges(data, model, ModelUnct, unctDict)
+    fltr = np.any((parArray < pRange[:, 0]) | (parArray > pRange[:, 1]), axis=1)
+    lnprior = np.where(fltr, -np.inf, 0.0)
+    return lnprior
+
+def lnlike_batch_any(parArray, data, model, ModelUnct):
+    """
+    Calculate the ln likelihood for a batch of parameters.
+    """
+    if ModelUnct:
+        return lnlike_gp_batch(parArray, data, model)
+    elif len(model.get_linearAmp()) > 0:
+        return np.array([lnlike_amp(params, data, model) for params in parArray])
+    else:
+        return lnlike_batch(parArray, data, model)
+
+def lnprob_batch(parArray, data, model, ModelUnct, unctDict):
+    """
+    Calculate the probability for a batch of parameters.  Only the positions
+    within the prior ranges are calculated for the likelihood.
+    """
+    lnprob = lnprior_batch(parArray, data, model, ModelUnct, unctDict)
+    fltr = np.isfinite(lnprob)
+    if np.any(fltr):
+        lnprob[fltr] += lnlike_batch_any(parArray[fltr], data, model, ModelUnct)
+    return lnprob
+
+def lnprob_pt_batch(parArray, data, model, ModelUnct, unctDict):
+    """
+    Calculate the ln likelihood and ln prior for a batch of parameters in the
+    form required by the PTSampler.
+    """
+    logp = lnprior_batch(parArray, data, model, ModelUnct, unctDict)
+    logl = logp.copy()
+    fltr = np.isfinite(logp)
+    if np.any(fltr):
+        logl[fltr] = lnlike_batch_any(parArray[fltr], data, model, ModelUnct)
+    return zip(logl, logp)
+
+class BatchPool(object):
+    """
+    A pool-like object that evaluates all the walkers in one call.  The emcee
+    samplers send the positions of all the walkers through pool.map(), so the
+    batch function takes over the per-walker function.
+
+    Parameters
+    ----------
+    batchFunc : function
+        The function to calculate a 2D array of positions, shape
+        (nwalkers, ndim), and return the results in a sequence.
+    args : list
+        The additional arguments of the batchFunc.
+    """
+    def __init__(self, batchFunc, args=[]):
+        self.batchFunc = batchFunc
+        self.args = args
+
+    def map(self, func, iterable):
+        parArray = np.atleast_2d(np.array(list(iterable), dtype=float))
+        return list(self.batchFunc(parArray, *self.args))
+
+    def close(self):
+        pass
+
+#-->The integrated autocorrelation time of the chains with the FFT, following
+#emcee 3 and Sokal's automatic windowing, for all the walkers and parameters.
+def autocorr_function(chain):
+    """
+    Calculate the normalized autocorrelation functions of the chains.
+
+    Parameters
+    ----------
+    chain : array
+        The chains, shape (nwalkers, nsteps, ndim).
+
+    Returns
+    -------
+    acf : array
+        The autocorrelation functions, shape (nwalkers, ndim, nsteps).  It is
+        nan if the chain does not change.
+    """
+    #-> The FFT runs along the last axis, which is contiguous.
+    x = np.ascontiguousarray(np.swapaxes(np.asarray(chain, dtype=float), 1, 2))
+    nsteps = x.shape[-1]
+    nfft = 2**int(np.ceil(np.log2(2 * nsteps)))
+    x -= np.mean(x, axis=-1, keepdims=True)
+    #-> The power spectrum in the packed format of the real FFT of fftpack,
+    #[y(0), Re(y(1)), Im(y(1)), ..., Re(y(n/2))].
+    f = fftpack.rfft(x, n=nfft)
+    f *= f
+    f[..., 1:-1:2] += f[..., 2::2]
+    f[..., 2::2] = 0.
+    acf = fftpack.irfft(f)[..., :nsteps]
+    with np.errstate(divide="ignore", invalid="ignore"):
+        acf /= acf[..., :1]
+    return acf
+
+def auto_window(acf, c=5):
+    """
+    Calculate the integrated time with the window of Sokal, i.e., the
+    smallest M that M >= c * tau(M), along the last axis of the acf.
+    """
+    taus = 2. * np.cumsum(acf, axis=-1) - 1.
+    with np.errstate(invalid="ignore"):
+        m = np.arange(acf.shape[-1]) < c * taus
+    window = np.where(np.all(m, axis=-1), acf.shape[-1] - 1, np.argmin(m, axis=-1))
+    return np.take_along_axis(taus, window[..., np.newaxis], axis=-1)[..., 0]
+
+def integrated_time(chain, c=5):
+    """
+    Estimate the integrated autocorrelation time of the chains.
+
+    Parameters
+    ----------
+    chain : array
+        The chains, shape (nwalkers, nsteps, ndim).
+    c : float, default: 5
+        The window of Sokal in the unit of the integrated time.
+
+    Returns
+    -------
+    tauWalker : array
+        The integrated time of each walker and parameter, shape
+        (nwalkers, ndim), nan for the chains that do not change.
+    tauMean : array
+        The integrated time of each parameter from the autocorrelation
+        function averaged over the walkers, shape (ndim,).
+    """
+    acf = autocorr_function(chain)
+    tauWalker = auto_window(acf, c)
+    fltr = np.isfinite(acf[..., 0])
+    acfMean = np.sum(np.where(fltr[..., np.newaxis], acf, 0.), axis=0)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        acfMean /= np.sum(fltr, axis=0)[:, np.newaxis]
+    tauMean = auto_window(acfMean, c)
+    return tauWalker, tauMean
+
+workerState = {} # The data and model installed in the processes of WorkerPool
+def init_worker(data, model):
+    """
+    Install the data and model in the worker process of WorkerPool.
+    """
+    workerState["data"] = data
+    workerState["model"] = model
+
+def call_worker(task):
+    """
+    Calculate one task of WorkerPool.  The data and model installed in the
+    process are passed after the position if useData is True.
+    """
+    func, params, args, kwargs, useData = task
+    if useData:
+        return func(params, workerState["data"], workerState["model"], *args, **kwargs)
+    return func(params, *args, **kwargs)
+
+class WorkerPool(object):
+    """
+    A pool of processes that keep the data and model.  The data and model are
+    sent to each process only once when the pool starts, and each task only
+    sends the function, the position of the walker and the small arguments,
+    while the threads of emcee send the data and model with every walker.
+
+    Parameters
+    ----------
+    data : DataSet
+        The data to fit.
+    model : ModelCombiner
+        The model to fit the data.
+    processes : int or None by default
+        The number of processes, the number of CPUs by default.
+
+    Notes
+    -----
+    The functions passed to map() by the emcee samplers (with the args),
+    the emcee PTLikePrior and the functools.partial are unwrapped, and the
+    data and model in their arguments are replaced by those in the
+    processes, if they are the same objects as those of the pool.  The other
+    functions are sent with each task.  The data and model in the processes
+    are not updated after the pool starts.
+    """
+    def __init__(self, data, model, processes=None):
+        self.pool = multiprocessing.Pool(processes, initializer=init_worker,
+                                         initargs=(data, model))
+        self.data = data
+        self.model = model
+
+    def is_installed(self, args):
+        """
+        Check whether the first two of the args are the data and model of
+        the pool.
+        """
+        return (len(args) >= 2) and (args[0] is self.data) and (args[1] is self.model)
+
+    def unwrap(self, func):
+        """
+        Get the (func, args, kwargs, useData) of the tasks to calculate
+        func(params), see call_worker().
+        """
+        if isinstance(func, emcee.ensemble._function_wrapper):
+            if self.is_installed(func.args):
+                return func.f, tuple(func.args[2:]), func.kwargs, True
+        elif isinstance(func, emcee.ptsampler.PTLikePrior):
+            if self.is_installed(func.loglargs) and self.is_installed(func.logpargs) and \
+               (not func.loglkwargs) and (not func.logpkwargs):
+                return lnprob_pt, (func.logl, func.logp, tuple(func.loglargs[2:]),
+                                   tuple(func.logpargs[2:])), {}, True
+        elif isinstance(func, partial):
+            kwargs = dict(func.keywords or {})
+            if (kwargs.get("data", None) is self.data) and (kwargs.get("model", None) is self.model):
+                kwargs.pop("data")
+                kwargs.pop("model")
+                return func.func, func.args, kwargs, True
+            if self.is_installed(func.args):
+                return func.func, tuple(func.args[2:]), kwargs, True
+        return func, (), {}, False
+
+    def map(self, func, iterable):
+        func, args, kwargs, useData = self.unwrap(func)
+        tasks = [(func, params, args, kwargs, useData) for params in iterable]
+        return self.pool.map(call_worker, tasks)
+
+    def close(self):
+        self.pool.close()
+        self.pool.join()
+
+def check_vectorize(kwargs):
+    """
+    Warn that the threads or the pool of the sampler kwargs are replaced by
+    the BatchPool of the vectorize option, and drop the threads.
+    """
+    threads = kwargs.pop("threads", 1)
+    if (threads > 1) or (not kwargs.get("pool", None) is None):
+        print("[MCMC Warning]: The threads or the pool are not used with vectorize, "
+              "the walkers are calculated together in this process!")
+
 class EmceeModel(object):
     """
     The MCMC model for emcee.
     """
-    def __init__(self, data, model, ModelUnct=False, unctDict=None, sampler=None):
+    def __init__(self, data, model, ModelUnct=False, unctDict=None, sampler=None,
+                 random=None):
         self.__data = data
         self.__model = model
         self.__modelunct = ModelUnct
         self.__unctDict = unctDict
         self.__sampler = sampler
+        self.__ampList = list(model.get_linearAmp()) # The linear amplitudes
+        self.__ampRecovered = False
+        self.__psCache = (None, None)
+        self.__runLog = [] # The records of the runs
+        self.set_random(random)
         print("[EmceeModel]: {0}".format(sampler))
+        if len(self.__ampList) > 0:
+            if ModelUnct:
+                raise ValueError("The linear amplitudes do not work with the model uncertainty!")
+            print("[EmceeModel]: {0} linear amplitudes are solved!".format(len(self.__ampList)))
         edim = 0
         if ModelUnct: #If the uncertainty is modeled, there are some extra parameters.
             if data.check_dsData():
@@ -90,13 +415,15 @@ class EmceeModel(object):
             print "[EmceeModel]: ModelUnct is off!"
         self.__dim = len(model.get_parVaryList()) + edim
 
-    def from_prior(self):
+    def get_priorArrays(self):
         """
-        The prior of all the parameters are uniform.
+        Get the ranges of all the parameters, shape (ndim, 2), and the values
+        of the discrete parameters, a dict with the indices of the parameters
+        as the keys.
         """
-        parList = []
+        pRange = []
+        pDiscrete = {}
         parDict = self.__model.get_modelParDict()
-        unctDict = self.__unctDict
         for modelName in self.__model._modelList:
             parFitDict = parDict[modelName]
             for parName in parFitDict.keys():
@@ -104,57 +431,185 @@ class EmceeModel(object):
                     parRange = parFitDict[parName]["range"]
                     parType  = parFitDict[parName]["type"]
                     if parType == "c":
-                        r1, r2 = parRange
-                        p = (r2 - r1) * np.random.rand() + r1 #Uniform distribution
+                        pRange.append(parRange)
                     elif parType == "d":
-                        p = np.random.choice(parRange, 1)[0]
+                        pDiscrete[len(pRange)] = np.array(parRange)
+                        pRange.append([np.min(parRange), np.max(parRange)])
                     else:
                         raise TypeError("The parameter type '{0}' is not recognised!".format(parType))
-                    parList.append(p)
-                else:
-                    pass
         #If the uncertainty is modeled, there are extra parameters.
         if self.__modelunct:
+            unctDict = self.__unctDict
             if unctDict is None:
                 raise ValueError("No uncertainty model parameter range is provided!")
             if self.__data.check_dsData():
-                rf1, rf2 = unctDict["lnf"]
-                lnf = (rf2 - rf1) * np.random.rand() + rf1
-                parList.append(lnf)
+                pRange.append(unctDict["lnf"])
             #If there is contiuous data, the residual correlation is considered.
             if self.__data.check_csData():
-                ra1, ra2 = unctDict["lna"]
-                rt1, rt2 = unctDict["lntau"]
-                lna = (ra2 - ra1) * np.random.rand() + ra1
-                lntau = (rt2 - rt1) * np.random.rand() + rt1
-                parList.append(lna)
-                parList.append(lntau)
-        parList = np.array(parList)
-        return parList
-
-    def EnsembleSampler(self, nwalkers, **kwargs):
+                pRange.append(unctDict["lna"])
+                pRange.append(unctDict["lntau"])
+        pRange = np.array(pRange, dtype=float).reshape((-1, 2))
+        return pRange, pDiscrete
+
+    def sample_prior(self, shape=()):
+        """
+        Draw the positions from the prior, which is uniform for all the
+        parameters, in shape + (ndim,).
+        """
+        pRange, pDiscrete = self.get_priorArrays()
+        random = self.get_random()
+        p = pRange[:, 0] + (pRange[:, 1] - pRange[:, 0]) * \
+            random.random_sample(tuple(shape) + (len(pRange),))
+        for d in pDiscrete.keys():
+            p[..., d] = random.choice(pDiscrete[d], size=shape)
+        return p
+
+    def from_prior(self):
+        """
+        The prior of all the parameters are uniform.
+        """
+        return self.sample_prior()
+
+    def set_random(self, random=None):
+        """
+        Set the random number generator of the initial positions, a seed or a
+        numpy RandomState.  The global numpy random state is used if None.
+        If the sampler is set afterwards, the random states of the sampler
+        are seeded by the generator as well.
+        """
+        if random is None:
+            self.__random = None
+        elif isinstance(random, np.random.RandomState):
+            self.__random = random
+        else:
+            self.__random = np.random.RandomState(random)
+
+    def get_random(self):
+        """
+        Get the random number generator of the initial positions.
+        """
+        if self.__random is None:
+            return np.random
+        else:
+            return self.__random
+
+    def get_lnprob(self):
+        """
+        Get the ln probability function of the model.
+        """
         if self.__modelunct:
-            self.__lnprob = lnprob_gp
+            return lnprob_gp
+        elif len(self.__ampList) > 0:
+            return lnprob_amp
+        else:
+            return lnprob
+
+    def p_map(self, nstart=16, method="L-BFGS-B", pool=None, QuietMode=True):
+        """
+        Find the maximum a posteriori (MAP) position with the optimizations
+        from nstart positions drawn from the prior.
+
+        Parameters
+        ----------
+        nstart : int, default: 16
+            The number of the starting positions.
+        method : string, default: "L-BFGS-B"
+            The method of scipy.optimize.minimize(), e.g., "L-BFGS-B" or
+            "Nelder-Mead", or "differential_evolution", which runs once over
+            the prior ranges.
+        pool : pool object or None by default
+            The pool to run the optimizations of the starting positions in
+            parallel, e.g., the WorkerPool, the MPIPool or the multiprocessing
+            Pool.
+        QuietMode : bool, default: True
+            Print the results if False.
+
+        Returns
+        -------
+        (pmax, lnpmax, nfev) : tuple
+            The MAP position, its ln probability, and the total number of the
+            ln probability evaluations.
+        """
+        lnprobFunc = self.get_lnprob()
+        pRange = self.get_priorArrays()[0]
+        args = [self.__modelunct, self.__unctDict]
+        if method == "differential_evolution":
+            nfev = [0]
+            def negLnprob(p):
+                nfev[0] += 1
+                lnp = lnprobFunc(p, self.__data, self.__model, *args)
+                if np.isfinite(lnp):
+                    return -lnp
+                else:
+                    return 1e300
+            res = differential_evolution(negLnprob, pRange, seed=self.__random, polish=True)
+            resList = [(res.x, -res.fun, nfev[0])]
         else:
-            self.__lnprob = lnprob
+            pStart = self.sample_prior((nstart,))
+            mapFunc = partial(lnprob_map, data=self.__data, model=self.__model,
+                              ModelUnct=args[0], unctDict=args[1], lnprobFunc=lnprobFunc,
+                              method=method, bounds=pRange)
+            if pool is None:
+                resList = map(mapFunc, pStart)
+            else:
+                resList = pool.map(mapFunc, pStart)
+        lnpList = np.array([res[1] for res in resList])
+        idx = np.argmax(lnpList)
+        pmax = resList[idx][0]
+        lnpmax = lnpList[idx]
+        nfev = np.sum([res[2] for res in resList])
+        if not QuietMode:
+            pname = self.__model.get_parVaryNames(latex=False)
+            print("[EmceeModel]: MAP ({0}) lnprob: {1:.3e}, {2} evaluations".format(method,
+                  lnpmax, nfev))
+            for p, name in enumerate(pname):
+                print("{0:18s} {1:10.3e}".format(name, pmax[p]))
+        return pmax, lnpmax, nfev
+
+    def EnsembleSampler(self, nwalkers, vectorize=False, **kwargs):
+        """
+        Setup the EnsembleSampler.  If vectorize is True, the models of all
+        the walkers are calculated together in each step.
+        """
+        self.__lnprob = self.get_lnprob()
+        if vectorize:
+            check_vectorize(kwargs)
+            kwargs["pool"] = BatchPool(lnprob_batch, [self.__data, self.__model,
+                                       self.__modelunct, self.__unctDict])
         self.sampler = emcee.EnsembleSampler(nwalkers, self.__dim, self.__lnprob,
                        args=[self.__data, self.__model, self.__modelunct, self.__unctDict],
                        **kwargs)
+        if not self.__random is None:
+            self.sampler.random_state = np.random.RandomState(
+                self.__random.randint(2**31)).get_state()
         self.__nwalkers = nwalkers
         self.__sampler = "EnsembleSampler"
         return self.sampler
 
-    def PTSampler(self, ntemps, nwalkers, **kwargs):
+    def PTSampler(self, ntemps, nwalkers, vectorize=False, **kwargs):
+        """
+        Setup the PTSampler.  If vectorize is True, the models of all the
+        walkers at all the temperatures are calculated together in each step.
+        """
         if self.__modelunct:
             self.__lnlike = lnlike_gp
+        elif len(self.__ampList) > 0:
+            self.__lnlike = lnlike_amp
         else:
             self.__lnlike = lnlike
+        if vectorize:
+            check_vectorize(kwargs)
+            kwargs["pool"] = BatchPool(lnprob_pt_batch, [self.__data, self.__model,
+                                       self.__modelunct, self.__unctDict])
         self.sampler = emcee.PTSampler(ntemps, nwalkers, self.__dim,
                        logl=self.__lnlike, logp=lnprior,
                        loglargs=[self.__data, self.__model],
                        logpargs=[self.__data, self.__model,
                                  self.__modelunct, self.__unctDict],
                         **kwargs)
+        #-> The PTSampler of emcee draws from the global numpy random state.
+        if not self.__random is None:
+            np.random.seed(self.__random.randint(2**31))
         self.__ntemps = ntemps
         self.__nwalkers = nwalkers
         self.__sampler = "PTSampler"
@@ -166,43 +621,22 @@ class EmceeModel(object):
         The scipy.stats.truncnorm is used to generate the truncated normal distrubution
         of the parameters within the prior ranges.
         """
-        ndim = self.__dim
         if nwalkers is None:
             nwalkers = self.__nwalkers
-        pRange = self.__model.get_parVaryRanges()
-        unctDict = self.__unctDict
-        #If the uncertainty is modeled, there are extra parameters.
-        if self.__modelunct:
-            if unctDict is None:
-                raise ValueError("No uncertainty model parameter range is provided!")
-            if self.__data.check_dsData():
-                pRange.append(unctDict["lnf"]) #For lnf
-            #If there is contiuous data, the residual correlation is considered.
-            if self.__data.check_csData():
-                pRange.append(unctDict["lna"])  #For lna
-                pRange.append(unctDict["lntau"])  #For lntau
-        pRange = np.array(pRange)
+        pRange = self.get_priorArrays()[0]
         sampler = self.__sampler
         if sampler == "EnsembleSampler":
-            p = np.zeros((nwalkers, ndim))
-            for d in range(ndim):
-                r0, r1 = pRange[d]
-                std = (r1 - r0) * ratio
-                loc = p0[d]
-                a = (r0 - loc) / std
-                b = (r1 - loc) /std
-                p[:, d] = truncnorm.rvs(a=a, b=b, loc=loc, scale=std, size=nwalkers)
-        if sampler == "PTSampler":
-            ntemps = self.__ntemps
-            p = np.zeros((ntemps, nwalkers, ndim))
-            for t in range(ntemps):
-                for d in range(ndim):
-                    r0, r1 = pRange[d]
-                    std = (r1 - r0) * ratio
-                    loc = p0[d]
-                    a = (r0 - loc) / std
-                    b = (r1 - loc) /std
-                    p[t, :, d] = truncnorm.rvs(a=a, b=b, loc=loc, scale=std, size=nwalkers)
+            shape = (nwalkers,)
+        elif sampler == "PTSampler":
+            shape = (self.__ntemps, nwalkers)
+        else:
+            raise ValueError("The sampler '{0}' is unrecognised!".format(sampler))
+        std = (pRange[:, 1] - pRange[:, 0]) * ratio
+        loc = np.array(p0, dtype=float)
+        a = (pRange[:, 0] - loc) / std
+        b = (pRange[:, 1] - loc) / std
+        p = truncnorm.rvs(a=a, b=b, loc=loc, scale=std, size=shape+(len(pRange),),
+                          random_state=self.__random)
         return p
 
     def p_prior(self):
@@ -213,15 +647,10 @@ class EmceeModel(object):
         """
         sampler  = self.__sampler
         nwalkers = self.__nwalkers
-        dim      = self.__dim
         if sampler == "EnsembleSampler":
-            p0 = [self.from_prior() for i in range(nwalkers)]
+            p0 = self.sample_prior((nwalkers,))
         elif sampler == "PTSampler":
-            ntemps = self.__ntemps
-            p0 = np.zeros((ntemps, nwalkers, dim))
-            for loop_t in range(ntemps):
-                for loop_w in range(nwalkers):
-                    p0[loop_t, loop_w, :] = self.from_prior()
+            p0 = self.sample_prior((self.__ntemps, nwalkers))
         else:
             raise ValueError("The sampler '{0}' is unrecognised!".format(sampler))
         return p0
@@ -244,6 +673,8 @@ class EmceeModel(object):
                 lnlike = self.sampler.lnlikelihood[0, ...]
         idx = lnlike.ravel().argmax()
         p   = chain.reshape(-1, self.__dim)[idx]
+        if self.__ampRecovered:
+            p = sedff.recover_amplitudes(p, self.__data, self.__model, self.__ampList)[0]
         return p
 
     def p_logl_min(self):
@@ -260,6 +691,8 @@ class EmceeModel(object):
             lnlike = self.sampler.lnlikelihood[0, ...]
         idx = lnlike.ravel().argmin()
         p   = chain.reshape(-1, self.__dim)[idx]
+        if self.__ampRecovered:
+            p = sedff.recover_amplitudes(p, self.__data, self.__model, self.__ampList)[0]
         return p
 
     def get_logl(self, p):
@@ -275,23 +708,93 @@ class EmceeModel(object):
         else:
             raise ValueError("'{0}' is not recognised!".format(sampler))
 
-    def run_mcmc(self, pos, iterations, printFrac=1, quiet=False, **kwargs):
+    def run_mcmc(self, pos, iterations, printFrac=1, quiet=False, backend=None,
+                 runName=None, converge=None, **kwargs):
         """
         Run the MCMC chain.
         This function just wraps up the sampler.sample() so that there is output
-        in the middle of the run.
+        in the middle of the run.  If the backend (ChainBackend) is provided,
+        the run is saved at the checkpoints with the runName, and the run
+        continues from the last checkpoint if it is found in the backend.
+
+        If converge is provided, the integrated autocorrelation time (tau) is
+        estimated every "check" steps, and the run stops when the steps are
+        more than "ntau" times tau and tau changes less than the fraction
+        "dtau", or at "maxiter" steps.  The default is
+            {"check": 100, "ntau": 50, "dtau": 0.01, "maxiter": iterations}.
+        The steps of the run are recorded in the run log.
         """
         sampler = self.__sampler
+        thin = kwargs.get("thin", 1)
+        if converge is None:
+            nIter = iterations
+        else:
+            nIter   = converge.get("maxiter", iterations)
+            nCheck  = converge.get("check", 100)
+            nTau    = converge.get("ntau", 50)
+            dTau    = converge.get("dtau", 0.01)
+            tauLast = np.inf
+        nMax = nIter
+        tau = np.nan
+        converged = False
+        nstep0 = 0
+        #-> The likelihood calls per step and those before the run resumed
+        if sampler == "EnsembleSampler":
+            nChain = self.__nwalkers
+        else:
+            nChain = self.__nwalkers * self.__ntemps
+        nfev0 = 0
+        if not backend is None:
+            runDict = backend.load(runName)
+            if not runDict is None:
+                backend.restore(self.sampler, runDict, self.__random)
+                nstep0 = runDict["nstep"]
+                nfev0 = runDict.get("nfev", nstep0 * nChain)
+                if runDict["finished"]:
+                    nIter = nstep0
+                    nMax = runDict["iterations"]
+                    converged = nstep0 < nMax
+                pos = runDict["pos"]
+                lnprob = runDict["pos_lnprob"]
+                if sampler == "EnsembleSampler":
+                    logl = runDict["random_state"]
+                    kwargs["lnprob0"] = lnprob
+                elif sampler == "PTSampler":
+                    logl = runDict["pos_lnlike"]
+                    kwargs["lnprob0"] = lnprob
+                    kwargs["lnlike0"] = logl
+                if not quiet:
+                    print("MCMC ({0}) resumes from step {1}".format(runName, nstep0))
         if not quiet:
             print("MCMC ({0}) is running...".format(sampler))
             t0 = time()
+        gpTimer = sedff.gpTimer
+        gpTimer.update({"model": 0., "gp": 0., "ncall": 0})
+        nPrint = int(printFrac * nIter)
+        nstep = nstep0
         #Notice that the third parameters yielded by EnsembleSampler and PTSampler are different.
-        for i, (pos, lnprob, logl) in enumerate(self.sampler.sample(pos, iterations=iterations, **kwargs)):
-            if not (i + 1) % int(printFrac * iterations):
+        for i, (pos, lnprob, logl) in enumerate(self.sampler.sample(pos,
+                iterations=nIter-nstep0, **kwargs)):
+            nstep = nstep0 + i + 1
+            if (not converge is None) and (not nstep % nCheck):
+                tau = self.chain_tau(nstep, thin)
+                converged = (nstep > nTau * tau) & (np.abs(tau - tauLast) < dTau * tau)
+                tauLast = tau
+                if not quiet:
+                    print("**Step {0}: tau = {1:.1f}".format(nstep, tau))
+            if (not backend is None) and (converged or backend.check_point(nstep, nIter, thin)):
+                nfev = nfev0 + (nstep - nstep0) * nChain
+                if sampler == "EnsembleSampler":
+                    backend.save(runName, self.sampler, sampler, pos, lnprob, None,
+                                 nstep, nIter, thin, converged, self.__random, nfev)
+                else:
+                    backend.save(runName, self.sampler, sampler, pos, lnprob, logl,
+                                 nstep, nIter, thin, converged, self.__random, nfev)
+            if not nstep % nPrint:
                 if quiet:
                     pass
                 else:
-                    progress = 100. * (i + 1) / iterations
+                    progress = 100. * nstep / nIter
                     if sampler == "EnsembleSampler":
                         lnlike = lnprob
                         pos0   = pos
@@ -309,35 +812,111 @@ class EmceeModel(object):
                     for p, name in enumerate(pname):
                         print("{0:18s} {1:10.3e}".format(name, pmax[p]))
                     print( "**MCMC time elapsed: {0:.3f} min".format( (time()-t0)/60. ) )
+                    #-> The batch likelihood with the GP is timed in this process.
+                    if gpTimer["ncall"] > 0:
+                        print("**Time per step: model {0:.3e} s, GP {1:.3e} s".format(
+                              gpTimer["model"] / nPrint, gpTimer["gp"] / nPrint))
+                        gpTimer.update({"model": 0., "gp": 0., "ncall": 0})
+            if converged:
+                #-> Drop the samples allocated for the steps not run.
+                self.truncate_chain(nstep, thin)
+                break
+        #-> The likelihood calls of the run, including those restored
+        nfev = nfev0 + (nstep - nstep0) * nChain
+        #-> The steps not run out of the maximum steps
+        nsave = max(nMax - nstep, 0)
+        self.__runLog.append({
+            "run": runName,
+            "iterations": iterations,
+            "nstep": nstep,
+            "saved": nsave,
+            "tau": tau,
+            "converged": converged,
+            "nfev": nfev
+        })
         if not quiet:
+            if not converge is None:
+                print("**{0} steps run ({1} steps saved), tau = {2:.1f}, converged: {3}".format(
+                      nstep, nsave, tau, converged))
             print("MCMC finishes!")
         return pos, lnprob, logl
 
-    def integrated_time(self):
+    def get_nsave(self, nstep, thin):
+        """
+        Get the number of the samples stored by the sampler after nstep steps.
+        """
+        if self.__sampler == "EnsembleSampler":
+            return -(-nstep // thin)
+        else:
+            return nstep // thin
+
+    def truncate_chain(self, nstep, thin):
+        """
+        Keep the samples of the first nstep steps in the sampler, when the
+        run stops before the iterations.
+        """
+        nsave = self.get_nsave(nstep, thin)
+        if self.__sampler == "EnsembleSampler":
+            self.sampler._chain = self.sampler._chain[:, :nsave]
+            self.sampler._lnprob = self.sampler._lnprob[:, :nsave]
+        else:
+            self.sampler._chain = self.sampler._chain[:, :, :nsave]
+            self.sampler._lnprob = self.sampler._lnprob[:, :, :nsave]
+            self.sampler._lnlikelihood = self.sampler._lnlikelihood[:, :, :nsave]
+
+    def chain_tau(self, nstep, thin):
+        """
+        Estimate the integrated autocorrelation time (steps) of the chain of
+        the first nstep steps, the largest of all the parameters averaged over
+        the walkers.  It is inf if it cannot be estimated.
+        """
+        nsave = self.get_nsave(nstep, thin)
+        if self.__sampler == "EnsembleSampler":
+            chain = self.sampler._chain[:, :nsave]
+        else:
+            chain = self.sampler._chain[0, :, :nsave]
+        tauPar = self.integrated_time(chain, average=True)
+        if np.all(np.isfinite(tauPar)):
+            return np.max(tauPar) * thin
+        else:
+            return np.inf
+
+    def get_runLog(self):
+        """
+        Get the records of the runs, the planned iterations, the steps run,
+        the steps saved by the convergence, the autocorrelation time, whether
+        the run converged and the likelihood calls.
+        """
+        return self.__runLog
+
+    def set_runLog(self, runLog):
+        """
+        Set the records of the runs, e.g., including the previous stages.
+        """
+        self.__runLog = runLog
+
+    def integrated_time(self, chain=None, average=False):
         """
         Estimate the integrated autocorrelation time of a time series.
-        Since it seems there is something wrong with the sampler.integrated_time(),
-        I have to calculated myself using acor package.
+        The chain of the sampler is used if the chain, shape
+        (nwalkers, nstep, ndim), is not provided.  Return the times of each
+        parameter and walker, shape (ndim, nwalkers), or those of each
+        parameter averaged over the walkers, shape (ndim,), if average is True.
         """
         sampler = self.__sampler
-        if sampler == "EnsembleSampler":
+        if not chain is None:
+            pass
+        elif sampler == "EnsembleSampler":
             chain = self.sampler.chain
         elif sampler == "PTSampler":
             chain = self.sampler.chain[0, ...]
         else:
             raise ValueError("{0} is an unrecognised sampler!".format(sampler))
-        tauParList = []
-        for npar in range(self.__dim):
-            tauList = []
-            for nwal in range(self.__nwalkers):
-                pchain = chain[nwal, :, npar]
-                try:
-                    tau, mean, sigma = acor.acor(pchain)
-                except:
-                    tau = np.nan
-                tauList.append(tau)
-            tauParList.append(tauList)
-        return tauParList
+        tauWalker, tauMean = integrated_time(chain)
+        if average:
+            return tauMean
+        else:
+            return tauWalker.T
 
     def accfrac_mean(self):
         """
@@ -366,6 +945,14 @@ class EmceeModel(object):
             samples = chain[fltr, burnin:, :].reshape((-1, self.__dim))
         else:
             samples = chain[:, burnin:, :].reshape((-1, self.__dim))
+        #-> The amplitudes are solved once for the same samples.
+        if self.__ampRecovered:
+            psKey = (burnin, fraction, chain.shape)
+            if self.__psCache[0] != psKey:
+                samples = sedff.recover_amplitudes(samples, self.__data, self.__model,
+                                                   self.__ampList)
+                self.__psCache = (psKey, samples)
+            samples = self.__psCache[1].copy()
         return samples
 
     def p_median(self, ps=None, **kwargs):
@@ -413,7 +1000,7 @@ class EmceeModel(object):
         tt = " ".join(["{0:12s}".format(i) for i in ttList])
         print("{:-<74}".format(""))
         print(tt)
-        for d in range(self.__dim):
+        for d in range(len(nameList)):
             plow = parRange[0, d]
             pcen = parRange[1, d]
             phgh = parRange[2, d]
@@ -453,7 +1040,7 @@ class EmceeModel(object):
         tt = " ".join(["{0:12s}".format(i) for i in ttList])
         fp = open(filename, "w")
         fp.write(tt+"\n")
-        for d in range(self.__dim):
+        for d in range(len(nameList)):
             plow = parRange[0, d]
             pcen = parRange[1, d]
             phgh = parRange[2, d]
@@ -483,9 +1070,9 @@ class EmceeModel(object):
         else:
             nNui = 0
         if nuisance:
-            dim = self.__dim
+            dim = len(parname)
         else:
-            dim = self.__dim - nNui
+            dim = len(parname) - nNui
         fig = corner.corner(ps[:, 0:dim], labels=parname[0:dim], **kwargs)
         if filename is None:
             return fig
@@ -584,7 +1171,7 @@ class EmceeModel(object):
     def plot_chain(self, filename=None, truths=None):
         dim = self.__dim
         sampler = self.sampler
-        nameList = self.__model.get_parVaryNames()
+        nameList = self.get_chainNames()
         if self.__modelunct:
             if self.__data.check_dsData():
                 nameList.append(r"$\mathrm{ln}f$")
@@ -632,12 +1219,124 @@ class EmceeModel(object):
         Reset the sampler, for completeness.
         """
         self.sampler.reset()
+        self.__psCache = (None, None)
+
+    def recover_amplitudes(self):
+        """
+        Put the linear amplitudes back to the parameters of the model after
+        the sampling.  Afterwards, the posterior samples, the best-fit
+        parameters and the plots include the amplitudes solved for each
+        sample of the nonlinear parameters.
+        """
+        if (len(self.__ampList) == 0) or self.__ampRecovered:
+            return
+        self.__model.reset_linearAmp()
+        self.__ampRecovered = True
+        self.__lnprob = lnprob
+        self.__lnlike = lnlike
+
+    def get_chainNames(self, latex=True):
+        """
+        Get the names of the model parameters in the chain, i.e. without the
+        linear amplitudes.
+        """
+        nameList = self.__model.get_parVaryNames(latex=latex)
+        if self.__ampRecovered:
+            ampIndex = sedff.get_ampIndex(self.__model, self.__ampList)
+            nameList = [name for loop, name in enumerate(nameList) if not loop in ampIndex]
+        return nameList
+
+    def get_parKeys(self):
+        """
+        Get the keys of the parameters, "{model}.{parameter}", which are unique
+        unlike the parameter names, followed by those of the model
+        uncertainty.
+        """
+        keyList = []
+        parDict = self.__model.get_modelParDict()
+        for modelName in self.__model._modelList:
+            parFitDict = parDict[modelName]
+            for parName in parFitDict.keys():
+                if parFitDict[parName]["vary"]:
+                    keyList.append("{0}.{1}".format(modelName, parName))
+        if self.__modelunct:
+            if self.__data.check_dsData():
+                keyList.append("lnf")
+            if self.__data.check_csData():
+                keyList.append("lna")
+                keyList.append("lntau")
+        return keyList
+
+    def get_chainKeys(self):
+        """
+        Get the keys of the parameters in the chain, i.e. without the linear
+        amplitudes, see get_parKeys().
+        """
+        keyList = self.get_parKeys()
+        if self.__ampRecovered:
+            ampIndex = sedff.get_ampIndex(self.__model, self.__ampList)
+            keyList = [key for loop, key in enumerate(keyList) if not loop in ampIndex]
+        return keyList
+
+    def get_summary(self, low=16, center=50, high=84, burnin=50, fraction=0):
+        """
+        Summarize the fitting result for the ResultCatalog.
+
+        Parameters
+        ----------
+        low, center, high : float
+            The percentiles of the posterior samples.
+        burnin : int
+            The burn-in steps dropped from the posterior samples.
+        fraction : float
+            The fraction of walkers with the lowest ln probability dropped.
+
+        Returns
+        -------
+        summary : dict
+            "parKeys": the keys of the parameters from get_parKeys();
+            "percentiles": [low, center, high];
+            "quantiles": the percentiles of each parameter, shape (npar, 3);
+            "pmax": the parameters of the highest probability;
+            "lnprob_max": the highest ln probability;
+            "tau": the autocorrelation time of each parameter, NaN for the
+            linear amplitudes which are not sampled;
+            "acceptance": the mean acceptance fraction.
+        """
+        keyList = self.get_parKeys()
+        parRange = self.p_uncertainty(low, center, high, burnin=burnin, fraction=fraction)
+        #-> The highest ln probability of the chain, the lowest temperature for the PTSampler
+        if self.__sampler == "PTSampler":
+            chain = self.sampler.chain[0, ...]
+            lnprob = self.sampler.lnprobability[0, ...]
+        else:
+            chain = self.sampler.chain
+            lnprob = self.sampler.lnprobability
+        pmax = self.p_logl_max(chain, lnprob)
+        tau = np.full(len(keyList), np.nan)
+        tauChain = self.integrated_time(average=True)
+        if self.__ampRecovered:
+            ampIndex = sedff.get_ampIndex(self.__model, self.__ampList)
+            chainIndex = [loop for loop in range(len(keyList)) if not loop in ampIndex]
+        else:
+            chainIndex = range(len(keyList))
+        tau[chainIndex] = tauChain
+        summary = {
+            "parKeys": keyList,
+            "percentiles": np.array([low, center, high]),
+            "quantiles": parRange.T,
+            "pmax": pmax,
+            "lnprob_max": np.max(lnprob),
+            "tau": tau,
+            "acceptance": self.accfrac_mean()
+        }
+        return summary
 
     def diagnose(self):
         """
         Diagnose whether the MCMC run is reliable.
         """
-        nameList = self.__model.get_parVaryNames(latex=False)
+        nameList = self.get_chainNames(latex=False)
         if self.__modelunct:
             if self.__data.check_dsData():
                 nameList.append("lnf")
@@ -646,11 +1345,15 @@ class EmceeModel(object):
                 nameList.append("lntau")
         print("---------------------------------")
         print("Mean acceptance fraction: {0:.3f}".format(self.accfrac_mean()))
-        print("PN       : ACT (min-max)")
-        it = self.integrated_time()
+        print("PN       : ACT (min-max), ACT of the ensemble")
+        if self.__sampler == "PTSampler":
+            tauWalker, tauMean = integrated_time(self.sampler.chain[0, ...])
+        else:
+            tauWalker, tauMean = integrated_time(self.sampler.chain)
         for loop in range(self.__dim):
-            itPar = it[loop]
-            print("{0:9s}: {i[0]:.3f}-{i[1]:.3f}".format(nameList[loop], i=[min(itPar), max(itPar)]))
+            itPar = tauWalker[:, loop]
+            print("{0:9s}: {i[0]:.3f}-{i[1]:.3f}, {i[2]:.3f}".format(nameList[loop],
+                  i=[np.nanmin(itPar), np.nanmax(itPar), tauMean[loop]]))
 
     def sampler_type(self):
         return self.__sampler
@@ -660,6 +1363,11 @@ class EmceeModel(object):
 
     def __setstate__(self, dict):
         self.__dict__ = dict
+        self.__dict__.setdefault("_EmceeModel__ampList", [])
+        self.__dict__.setdefault("_EmceeModel__ampRecovered", False)
+        self.__dict__.setdefault("_EmceeModel__psCache", (None, None))
+        self.__dict__.setdefault("_EmceeModel__runLog", [])
+        self.__dict__.setdefault("_EmceeModel__random", None)
 
     def __del__(self):
         del self.__data
@@ -0,0 +1,359 @@
+import os
+import h5py
+import fcntl
+import numpy as np
+from .chain_backend import dump_state, load_state
+
+#The columns of the parameter tables
+parColumns = ["low", "center", "high", "max", "tau"]
+#The columns of the targets besides the parameters
+targColumns = ["redshift", "distance", "lnprob_max", "acceptance"]
+#The arrays of the fitrs saved as the compressed datasets
+chainArrays = ["chain", "lnprobability", "posterior_sample"]
+
+class ResultCatalog(object):
+    """
+    The HDF5 files to collect the fitting results of many targets.  The
+    summaries of the targets are saved in columns, one row per target, so a
+    quantity of all the targets is read at once.  The chains, the posterior
+    samples and the information of the fitting are saved in a file of each
+    target, which is only read when the target is loaded.
+
+    The catalog file contains:
+        summary/targname : the names of the targets.
+        summary/percentiles : the percentiles of "low", "center" and "high".
+        summary/{redshift, distance, lnprob_max, acceptance} : the information
+            of the targets, where lnprob_max is the highest ln probability.
+        summary/parameters/{model}.{parameter} : shape (ntarget, 5), the
+            "low", "center", "high", "max" (the highest probability) and "tau"
+            (the autocorrelation time) of the parameter, NaN for the targets
+            without the parameter.
+    The file of each target, "{fileName}.targets/{targname}.hdf5", contains
+    the compressed chain, lnprobability and posterior_sample, the rest of the
+    fitrs pickled in "info" and the summary pickled in "summary".
+
+    Parameters
+    ----------
+    fileName : string
+        The path of the HDF5 file, which is created if it does not exist.
+
+    Notes
+    -----
+    The files are never changed in place.  A target is written to a temporary
+    file, which replaces the file of the target once it is complete, so the
+    target is fitted if its file exists.  The summary is then merged into a
+    new catalog file, which replaces the catalog.  The merging is locked with
+    "{fileName}.lock", so the fittings running at the same time (e.g.,
+    batch_fitter() or mpi_batch_fitter()) can save to the same catalog, and
+    the readers always open a complete file without the lock.  A fitting
+    killed before the merging leaves the target out of the summary until the
+    next merge().
+    """
+    def __init__(self, fileName):
+        self.fileName = fileName
+        self.lockName = "{0}.lock".format(fileName)
+        self.targetPath = "{0}.targets".format(fileName)
+        if not os.path.isdir(self.targetPath):
+            try:
+                os.makedirs(self.targetPath)
+            except OSError: #Made by another process
+                pass
+        if not os.path.isfile(fileName):
+            self.merge()
+
+    def __lock(self):
+        self.__lockFile = open(self.lockName, "a")
+        fcntl.flock(self.__lockFile, fcntl.LOCK_EX)
+
+    def __unlock(self):
+        fcntl.flock(self.__lockFile, fcntl.LOCK_UN)
+        self.__lockFile.close()
+
+    def get_targetFile(self, targname):
+        """
+        Get the path of the file of the target.
+        """
+        return os.path.join(self.targetPath, "{0}.hdf5".format(targname))
+
+    def get_targets(self):
+        """
+        Get the names of the targets saved, including those not merged.
+        """
+        return sorted([fileName[:-5] for fileName in os.listdir(self.targetPath)
+                       if fileName.endswith(".hdf5")])
+
+    def get_index(self):
+        """
+        Get the dict of the row of each target in the summary.
+        """
+        h = h5py.File(self.fileName, "r")
+        try:
+            if "summary/targname" in h:
+                nameList = h["summary/targname"][...]
+            else:
+                nameList = []
+        finally:
+            h.close()
+        return dict([(name, loop) for loop, name in enumerate(nameList)])
+
+    def has_target(self, targname):
+        """
+        Check whether the target is saved in the catalog.
+        """
+        return os.path.isfile(self.get_targetFile(targname))
+
+    def save(self, targname, summary, fitrs, merge=True):
+        """
+        Save the fitting result of the target.  The target is replaced if it
+        is already in the catalog.
+
+        Parameters
+        ----------
+        targname : string
+            The name of the target.
+        summary : dict
+            The summary from EmceeModel.get_summary() or summarize_fitrs().
+        fitrs : dict
+            The fitting result as that saved in the fitrs file.
+        merge : bool, default: True
+            Merge the summary into the catalog, otherwise, the target is only
+            in the summary after merge(), e.g., to save many targets.
+        """
+        dataPck = fitrs["dataPck"]
+        summary = dict(summary, redshift=dataPck["redshift"], distance=dataPck["distance"])
+        targetFile = self.get_targetFile(targname)
+        tempPath = "{0}.tmp".format(targetFile)
+        h = h5py.File(tempPath, "w")
+        try:
+            info = {}
+            for name in fitrs.keys():
+                if name in chainArrays:
+                    h.create_dataset(name, data=fitrs[name], compression="gzip",
+                                     shuffle=True)
+                else:
+                    info[name] = fitrs[name]
+            h.create_dataset("info", data=dump_state(info))
+            h.create_dataset("summary", data=dump_state(summary))
+        except:
+            h.close()
+            os.remove(tempPath)
+            raise
+        h.close()
+        os.rename(tempPath, targetFile)
+        if merge:
+            self.merge([targname])
+
+    def merge(self, targnames=[]):
+        """
+        Merge the summaries of the targets into the catalog file.
+
+        Parameters
+        ----------
+        targnames : list, default: []
+            The names of the targets saved again.  The targets not in the
+            summary yet are always merged.
+
+        Returns
+        -------
+        nMerge : int
+            The number of the targets merged.
+        """
+        self.__lock()
+        try:
+            if os.path.isfile(self.fileName):
+                catalog = self.load_summary()
+            else:
+                catalog = {"targname": np.array([])}
+            nameList = list(catalog["targname"])
+            targnames = [name for name in targnames if self.has_target(name)]
+            targnames += [name for name in self.get_targets()
+                          if not (name in nameList) and not (name in targnames)]
+            #-> The rows of the catalog followed by those of the new targets
+            rowList = []
+            for loop, name in enumerate(nameList):
+                if not name in targnames:
+                    rowList.append(dict([(key, value[loop]) for key, value in catalog.items()]))
+            for name in targnames:
+                h = h5py.File(self.get_targetFile(name), "r")
+                try:
+                    summary = load_state(h["summary"][()])
+                finally:
+                    h.close()
+                row = {"targname": name}
+                for key in ["percentiles"] + targColumns:
+                    row[key] = summary[key]
+                for loop, key in enumerate(summary["parKeys"]):
+                    row[key] = np.concatenate([summary["quantiles"][loop],
+                                               [summary["pmax"][loop], summary["tau"][loop]]])
+                rowList.append(row)
+            #-> Write a new catalog file to replace the old one
+            tempPath = "{0}.tmp".format(self.fileName)
+            h = h5py.File(tempPath, "w")
+            try:
+                grp = h.create_group("summary")
+                grp.create_dataset("targname", shape=(len(rowList),),
+                                   dtype=h5py.special_dtype(vlen=str))
+                if len(rowList) > 0:
+                    grp["targname"][...] = [row["targname"] for row in rowList]
+                grp.create_dataset("percentiles", data=np.array([row["percentiles"] for row in rowList],
+                                   dtype=float).reshape(-1, 3))
+                for name in targColumns:
+                    grp.create_dataset(name, data=np.array([row[name] for row in rowList],
+                                       dtype=float))
+                parGrp = grp.create_group("parameters")
+                keyList = []
+                for row in rowList:
+                    keyList += [key for key in row.keys() if not (key in keyList) and
+                                not (key in ["targname", "percentiles"] + targColumns)]
+                for key in keyList:
+                    values = np.full((len(rowList), len(parColumns)), np.nan)
+                    for loop, row in enumerate(rowList):
+                        if key in row:
+                            values[loop] = row[key]
+                    parGrp.create_dataset(key, data=values)
+                    parGrp[key].attrs["columns"] = parColumns
+            except:
+                h.close()
+                os.remove(tempPath)
+                raise
+            h.close()
+            os.rename(tempPath, self.fileName)
+        finally:
+            self.__unlock()
+        return len(targnames)
+
+    def load_summary(self, columns=None):
+        """
+        Load the summary of all the targets.
+
+        Parameters
+        ----------
+        columns : list or None by default
+            The columns to load, the target columns or the keys of the
+            parameters, besides the target names.  All the columns are loaded
+            if None.
+
+        Returns
+        -------
+        summary : dict
+            The arrays of the columns, with the target names in "targname".
+        """
+        h = h5py.File(self.fileName, "r")
+        try:
+            if not "summary" in h:
+                return {"targname": np.array([])}
+            grp = h["summary"]
+            if columns is None:
+                columns = ["percentiles"] + targColumns + grp["parameters"].keys()
+            summary = {"targname": grp["targname"][...]}
+            for name in columns:
+                if name in grp["parameters"]:
+                    summary[name] = grp["parameters"][name][...]
+                else:
+                    summary[name] = grp[name][...]
+        finally:
+            h.close()
+        return summary
+
+    def load_parameter(self, parKey, column="center"):
+        """
+        Load one column of a parameter of all the targets.
+
+        Parameters
+        ----------
+        parKey : string
+            The key of the parameter, "{model}.{parameter}".
+        column : string, default: "center"
+            One of "low", "center", "high", "max" and "tau".
+
+        Returns
+        -------
+        values : array
+            The values of the targets, NaN if the parameter is not fitted.
+        """
+        h = h5py.File(self.fileName, "r")
+        try:
+            values = h["summary/parameters"][parKey][:, parColumns.index(column)]
+        finally:
+            h.close()
+        return values
+
+    def load_fitrs(self, targname):
+        """
+        Load the fitting result of the target, the same as the fitrs file.
+        """
+        h = h5py.File(self.get_targetFile(targname), "r")
+        try:
+            fitrs = load_state(h["info"][()])
+            for name in chainArrays:
+                if name in h:
+                    fitrs[name] = h[name][...]
+        finally:
+            h.close()
+        return fitrs
+
+def summarize_fitrs(fitrs):
+    """
+    Summarize the fitting result of a fitrs file for the ResultCatalog, to
+    migrate the fitrs files.  The "max" and "lnprob_max" are taken from the
+    highest lnprobability of the chain, and the acceptance is not known.  The
+    "max" and "tau" of the linear amplitudes, which are not in the chain, are
+    NaN.  They are NaN for all the parameters if the fitrs does not have the
+    "chainKeys" and the chain does not include the linear amplitudes.
+    """
+    from .mcmc_emcee import integrated_time
+    from .. import model_functions as sedmf
+    modelPck = fitrs["modelPck"]
+    modelDict = modelPck["modelDict"]
+    ppDict = fitrs["ppDict"]
+    ps = fitrs["posterior_sample"]
+    #-> The keys of the parameters in the order of the SedModel
+    keyList = []
+    for modelName in modelDict.keys():
+        model = modelDict[modelName]
+        for parName in sedmf.funcLib[model["function"]]["param_fit"]:
+            if model[parName]["vary"]:
+                keyList.append("{0}.{1}".format(modelName, parName))
+    nNui = ps.shape[1] - len(keyList)
+    if nNui == 1:
+        keyList.append("lnf")
+    elif nNui == 2:
+        keyList += ["lna", "lntau"]
+    elif nNui == 3:
+        keyList += ["lnf", "lna", "lntau"]
+    elif nNui != 0:
+        keyList = ["par{0}".format(loop) for loop in range(ps.shape[1])]
+    #-> The chain of the lowest temperature for the PTSampler
+    chain = fitrs["chain"]
+    lnprob = fitrs["lnprobability"]
+    if chain.ndim == 4:
+        chain = chain[0]
+        lnprob = lnprob[0]
+    percentiles = np.array([ppDict.get("low", 16), ppDict.get("center", 50),
+                            ppDict.get("high", 84)])
+    #-> The columns of the chain in the keyList, without the linear amplitudes
+    chainKeys = fitrs.get("chainKeys", None)
+    if chainKeys is None:
+        if chain.shape[-1] == len(keyList):
+            chainIndex = range(len(keyList))
+        else:
+            chainIndex = []
+    elif set(chainKeys).issubset(keyList):
+        chainIndex = [keyList.index(key) for key in chainKeys]
+    else:
+        chainIndex = []
+    pmax = np.full(len(keyList), np.nan)
+    tau = np.full(len(keyList), np.nan)
+    if len(chainIndex) > 0:
+        pmax[chainIndex] = chain.reshape(-1, chain.shape[-1])[lnprob.argmax()]
+        tau[chainIndex] = integrated_time(chain)[1]
+    summary = {
+        "parKeys": keyList,
+        "percentiles": percentiles,
+        "quantiles": np.percentile(ps, percentiles, axis=0).T,
+        "pmax": pmax,
+        "lnprob_max": np.max(lnprob),
+        "tau": tau,
+        "acceptance": np.nan
+    }
+    return summary
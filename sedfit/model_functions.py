@@ -1,23 +1,9 @@
-import os
 import numpy as np
 from collections import OrderedDict
-import cPickle as pickle
-from dir_list import root_path
-__all__ = ["funcLib", "discreteFuncList"]
+__all__ = ["funcLib", "discreteFuncList", "vectorFuncList", "load_models",
+           "get_function"]
 
-#-> Load the modelDict to select the modules to import
-modelDictPath = "{0}temp_model.dict".format(root_path)
-if os.path.isfile(modelDictPath):
-    fp = open(modelDictPath, "r")
-    modelDict = pickle.load(fp)
-    fp.close()
-    #--> No need to import all the modules
-    import_all = 0
-else:
-    #--> Need to import all the modules
-    import_all = 1
-    print("Cannot find the temp_model.dict in {0}!".format(root_path))
-#-> Load the modules
+#-> The modules of the model functions
 import_dict = {
     "model_bc03": ["BC03", "BC03_PosPar"],
     "model_bc03_refine": ["BC03_ref", "BC03_ref_PosPar"],
@@ -35,23 +21,58 @@ import_dict = {
     "model_extinction": ["Calzetti00"],
     "model_mir_extinction": ["Smith07"],
 }
-if import_all:
+
+def load_models(modelDict=None):
+    """
+    Import the modules of the model functions into this module.  The modules
+    (and their templates) are only loaded once in a process, so different
+    modelDicts can be loaded one after another.
+
+    Parameters
+    ----------
+    modelDict : dict or None by default
+        The dict of the models, the "function" of each model is used to choose
+        the modules to import.  All the modules are imported if None.
+
+    Returns
+    -------
+    funcLib : dict
+        The dict of the supporting functions.
+    """
+    if modelDict is None:
+        funcNames = None
+    else:
+        funcNames = [modelDict[fnm]["function"] for fnm in modelDict.keys()]
+    #-> Go through the import_dict and find the modules in use
     for mds in import_dict.keys():
         funcList = import_dict[mds]
-        exec "from models.{0} import {1}".format(mds, ",".join(funcList))
-else:
-    #-> Go through the functions in the modelDict
-    for fnm in modelDict.keys():
-        funcName = modelDict[fnm]["function"]
-        #--> Go through the import_dict and find the modules in use
-        for mds in import_dict.keys():
-            funcList = import_dict[mds]
-            if funcName in funcList:
-                exec "from models.{0} import {1}".format(mds, ",".join(funcList))
+        if not funcNames is None:
+            if len(set(funcNames) & set(funcList)) == 0:
+                continue
+        if all([fn in globals() for fn in funcList]):
+            continue
+        exec "from models.{0} import {1}".format(mds, ",".join(funcList)) in globals()
+    return funcLib
+
+def get_function(funcName):
+    """
+    Get the model function, and import its module if it is not loaded yet.
+    """
+    if not funcName in globals():
+        load_models({funcName: {"function": funcName}})
+    return globals()[funcName]
+
 #-> Discrete functions
 discreteFuncList = ["BC03", "BC03_ref", "Torus_Emission", "DL07", "Cat3d_G",
                     "Cat3d_H", "Cat3d_H_wind"]
-#-> Dict of the supporting functions
+#-> Vectorized functions, which accept the fitting parameters in shape (n, 1)
+#   and return the models in shape (n, len(x)).
+vectorFuncList = ["Linear", "BC03", "BC03_ref", "Torus_Emission", "DL07",
+                  "BlackBody", "Modified_BlackBody", "Power_Law", "Synchrotron",
+                  "Line_Gaussian_L", "pah", "Torus_Template", "Cat3d_G",
+                  "Cat3d_H", "Cat3d_H_wind", "Calzetti00", "Smith07", "Poly3"]
+#-> Dict of the supporting functions.  The optional "param_amp" is the log10
+#   amplitude parameter that the additive model is proportional to.
 funcLib = {
     "Linear":{
         "x_name": "x",
@@ -63,16 +84,19 @@ funcLib = {
         "x_name": "wave",
         "param_fit": ["logMs", "age"],
         "param_add": ["DL", "z", "frame", "t"],
+        "param_amp": "logMs",
     },
     "BC03_ref":{
         "x_name": "wave",
         "param_fit": ["logMs", "logAge", "sfh"],
         "param_add": ["DL", "z", "frame", "t"],
+        "param_amp": "logMs",
     },
     "CLUMPY_intp": {
         "x_name": "wave",
         "param_fit": ["logL", "i", "tv", "q", "N0", "sigma", "Y"],
-        "param_add": ["DL", "z", "frame", "t"]
+        "param_add": ["DL", "z", "frame", "t"],
+        "param_amp": "logL"
     },
     "Torus_Emission": {
         "x_name": "wave",
@@ -83,60 +107,71 @@ funcLib = {
     "DL07": {
         "x_name": "wave",
         "param_fit": ["logumin", "logumax", "qpah", "loggamma", "logMd"],
-        "param_add": ["t", "DL", "z", "frame"]
+        "param_add": ["t", "DL", "z", "frame"],
+        "param_amp": "logMd"
     },
     "BlackBody": {
         "x_name": "wave",
         "param_fit": ["logOmega", "T"],
-        "param_add": []
+        "param_add": [],
+        "param_amp": "logOmega"
     },
     "Modified_BlackBody": {
         "x_name": "wave",
         "param_fit": ["logM", "beta", "T"],
-        "param_add": ["DL", "z", "kappa0", "lambda0", "frame"]
+        "param_add": ["DL", "z", "kappa0", "lambda0", "frame"],
+        "param_amp": "logM"
     },
     "Power_Law": {
         "x_name": "wave",
         "param_fit": ["PL_alpha", "PL_logsf"],
-        "param_add": []
+        "param_add": [],
+        "param_amp": "PL_logsf"
     },
     "Synchrotron": {
         "x_name": "wave",
         "param_fit": ["Sn_alpha", "Sn_logsf"],
-        "param_add": ["lognuc", "lognum"]
+        "param_add": ["lognuc", "lognum"],
+        "param_amp": "Sn_logsf"
     },
     "Line_Gaussian_L": {
         "x_name": "wavelength",
         "param_fit": ["logLum", "lambda0", "FWHM"],
         "param_add": ["DL"],
+        "param_amp": "logLum",
         "operation": ["+", "*"]
     },
     "pah": {
         "x_name": "wave",
         "param_fit": ["logLpah"],
-        "param_add": ["t", "DL", "z", "frame", "waveLim"]
+        "param_add": ["t", "DL", "z", "frame", "waveLim"],
+        "param_amp": "logLpah"
     },
     "Torus_Template": {
         "x_name": "wave",
         "param_fit": ["logLtorus"],
-        "param_add": ["DL", "z", "frame", "ttype", "waveLim"]
+        "param_add": ["DL", "z", "frame", "ttype", "waveLim"],
+        "param_amp": "logLtorus"
     },
     "Cat3d_G": {
         "x_name": "wave",
         "param_fit": ["a", "theta", "N0", "i", "logL"],
         "param_add": ["DL", "z", "frame", "t"],
+        "param_amp": "logL",
         "operation": ["+"]
     },
     "Cat3d_H": {
         "x_name": "wave",
         "param_fit": ["a", "h", "N0", "i", "logL"],
         "param_add": ["DL", "z", "frame", "t"],
+        "param_amp": "logL",
         "operation": ["+"]
     },
     "Cat3d_H_wind": {
         "x_name": "wave",
         "param_fit": ["a", "h", "N0", "i", 'fwd', 'aw', 'thetaw', 'thetasig', "logL"],
         "param_add": ["DL", "z", "frame", "t"],
+        "param_amp": "logL",
         "operation": ["+"]
     },
     "Calzetti00": {
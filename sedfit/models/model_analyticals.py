@@ -131,13 +131,10 @@ def Synchrotron(Sn_alpha, Sn_logsf, wave, lognuc=13, lognum=14):
     """
     num = 10**(lognum - lognuc)
     nu = np.atleast_1d(ls_mic / wave) / 10**lognuc
-    fltr_m = nu < num
-    fltr_h = (nu > 1) & fltr_m
-    fltr_l = (nu <= 1) & fltr_m
-    flux = np.zeros_like(nu)
     sf = 10**Sn_logsf
-    flux[fltr_h] = sf * nu[fltr_h]**(-Sn_alpha-0.5)
-    flux[fltr_l] = sf * nu[fltr_l]**(-Sn_alpha)
+    #-> The spectral index is steeper by 0.5 above the cooling frequency.
+    idx = np.where(nu > 1, -Sn_alpha-0.5, -Sn_alpha)
+    flux = np.where(nu < num, sf * nu**idx, 0.)
     return flux
 
 def Linear(a, b, x):
@@ -177,10 +174,10 @@ def Line_Gaussian_L(wavelength, logLum, lambda0, FWHM, DL):
     fnu  = rmt.Line_Profile_Gaussian(nu, flux, nu0, FWHM, norm="integrate")
     return fnu
 
-from numpy.polynomial.polynomial import polyval
 def Poly3(x, c0, c1, c2, c3):
     """
-    This is a log 3rd order polynomial function.  It calls polyval from numpy.
+    This is a log 3rd order polynomial function, calculated with the Horner
+    scheme so that the coefficients can be arrays.
         y = 10^(c0 + c1 * x + c2 * x^2 + c3 * x^3)
 
     Parameters
@@ -196,7 +193,7 @@ def Poly3(x, c0, c1, c2, c3):
         The function result.
     """
     x = np.atleast_1d(x)
-    y = 10**polyval(x, [c0, c1, c2, c3])
+    y = 10**(((c3 * x + c2) * x + c1) * x + c0)
     return y
 
 if __name__ == "__main__":
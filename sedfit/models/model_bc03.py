@@ -1,6 +1,5 @@
 import numpy as np
-import cPickle as pickle
-from ..fitter.template import Template
+from ..fitter.template import load_template
 from ..dir_list import template_path
 
 Msun = 1.9891e33 #unit: gram
@@ -8,10 +7,7 @@ Mpc = 3.08567758e24 #unit: cm
 mJy = 1e26 #unit: erg/s/cm^2/Hz
 pi  = np.pi
 
-fp = open(template_path+"bc03_kdt.tmplt")
-tp_bc03 = pickle.load(fp)
-fp.close()
-bc03 = Template(**tp_bc03)
+bc03 = load_template(template_path+"bc03_kdt")
 waveLim = [1e-2, 1e3]
 def BC03(logMs, age, DL, wave, z, frame="rest", t=bc03, waveLim=waveLim):
     """
@@ -20,9 +16,9 @@ def BC03(logMs, age, DL, wave, z, frame="rest", t=bc03, waveLim=waveLim):
 
     Parameters
     ----------
-    logMs : float
+    logMs : float or array
         The log10 of stellar mass with the unit solar mass.
-    age : float
+    age : float or array
         The age of the stellar population with the unit Gyr.
     DL : float
         The luminosity distance with the unit Mpc.
@@ -44,20 +40,22 @@ def BC03(logMs, age, DL, wave, z, frame="rest", t=bc03, waveLim=waveLim):
 
     Notes
     -----
-    None.
+    The parameters can be arrays in shape (n, 1) to calculate a batch of
+    models, then the output is in shape (n, len(wave)).
     """
-    flux = np.zeros_like(wave)
     fltr = (wave > waveLim[0]) & (wave < waveLim[1])
     if np.sum(fltr) == 0:
         return np.zeros_like(wave)
-    flux[fltr] = t(wave[fltr], [age])
     if frame == "rest":
         idx = 2.0
     elif frame == "obs":
         idx = 1.0
     else:
         raise ValueError("The frame '{0}' is not recognised!".format(frame))
-    fnu = (1.0 + z)**idx * flux * 10**logMs / (4 * pi * (DL * Mpc)**2) * mJy
+    flux = t(wave[fltr], [age])
+    fnuFltr = (1.0 + z)**idx * flux * 10**logMs / (4 * pi * (DL * Mpc)**2) * mJy
+    fnu = np.zeros(fnuFltr.shape[:-1] + wave.shape)
+    fnu[..., fltr] = fnuFltr
     return fnu
 
 def BC03_PosPar(logMs, age, t=bc03):
@@ -1,6 +1,5 @@
 import numpy as np
-import cPickle as pickle
-from ..fitter.template import Template
+from ..fitter.template import load_template
 from ..dir_list import template_path
 
 Msun = 1.9891e33 #unit: gram
@@ -8,10 +7,7 @@ Mpc = 3.08567758e24 #unit: cm
 mJy = 1e26 #unit: erg/s/cm^2/Hz
 pi  = np.pi
 
-fp = open(template_path+"bc03_sps_cha_kdt.tmplt")
-tp_bc03 = pickle.load(fp)
-fp.close()
-bc03 = Template(**tp_bc03)
+bc03 = load_template(template_path+"bc03_sps_cha_kdt")
 waveLim = [1e-2, 1e3]
 def BC03_ref(logMs, logAge, sfh, DL, wave, z, frame="rest", t=bc03, waveLim=waveLim):
     """
@@ -57,19 +53,20 @@ def BC03_ref(logMs, logAge, sfh, DL, wave, z, frame="rest", t=bc03, waveLim=wave
     -----
     None.
     """
-    flux = np.zeros_like(wave)
     fltr = (wave > waveLim[0]) & (wave < waveLim[1])
     if np.sum(fltr) == 0:
         return np.zeros_like(wave)
     age = 10**logAge
-    flux[fltr] = t(wave[fltr], [age, sfh])
     if frame == "rest":
         idx = 2.0
     elif frame == "obs":
         idx = 1.0
     else:
         raise ValueError("The frame '{0}' is not recognised!".format(frame))
-    fnu = (1.0 + z)**idx * flux * 10**logMs / (4 * pi * (DL * Mpc)**2) * mJy
+    flux = t(wave[fltr], [age, sfh])
+    fnuFltr = (1.0 + z)**idx * flux * 10**logMs / (4 * pi * (DL * Mpc)**2) * mJy
+    fnu = np.zeros(fnuFltr.shape[:-1] + wave.shape)
+    fnu[..., fltr] = fnuFltr
     return fnu
 
 def BC03_ref_PosPar(logMs, logAge, sfh, t=bc03):
@@ -1,6 +1,5 @@
 import numpy as np
-import cPickle as pickle
-from ..fitter.template import Template
+from ..fitter.template import load_template
 from scipy.interpolate import splev
 from ..dir_list import template_path
 
@@ -9,10 +8,7 @@ Mpc = 3.08567758e24 #unit: cm
 m_H = 1.6726219e-24 #unit: gram
 r0 = 1.1  # pc
 
-fp = open(template_path+"Cat3d_H.tmplt")
-tp_cat3d_H = pickle.load(fp)
-fp.close()
-tcat3d_H = Template(**tp_cat3d_H)
+tcat3d_H = load_template(template_path+"Cat3d_H")
 waveLim = [1.0, 1e4]
 
 
@@ -65,8 +61,9 @@ def Cat3d_H(a, h, N0, i, logL, DL, z, wave, frame="rest", t=tcat3d_H, waveLim=wa
     else:
         raise ValueError("The frame '{0}' is not recognised!".format(frame))
     f0 = (1 + z)**idx * 10**(logL - 46) * (r0 / DL * 1e-6)**2
-    flux = np.zeros_like(wave)
-    flux[fltr] = f0 * t(wave[fltr], para) * 1e29  # unit: mJy
+    fluxFltr = f0 * t(wave[fltr], para) * 1e29  # unit: mJy
+    flux = np.zeros(fluxFltr.shape[:-1] + wave.shape)
+    flux[..., fltr] = fluxFltr
     return flux
 
 
@@ -1,9 +1,11 @@
+import os
 import h5py
+import fcntl
 import numpy as np
 import cPickle as pickle
 import ndiminterpolation as ndip
 from ..fitter.template import Template
-from ..dir_list import template_path
+from ..dir_list import template_path, cache_path
 
 pi = np.pi
 Mpc = 3.08567758e24 #unit: cm
@@ -14,20 +16,77 @@ Mpc = 3.08567758e24 #unit: cm
 #-------------------------------------#
 #From: dev_CLUMPY_intp.ipynb
 ### CLUMPY template
-try:
-    #clumpyFile = template_path+"clumpy_models_201410_tvavg.hdf5"
-    clumpyFile = template_path+"clumpy_fnu_norm.hdf5"
-    h = h5py.File(clumpyFile,"r")
-    theta = [np.unique(h[par][:]) for par in ("i","tv","q","N0","sig","Y","wave")]
-    data = h["flux_tor"].value
-    wave_tmpl = h["wave"].value
-    ip = ndip.NdimInterpolation(data,theta)
-    h.close()
-except:
-    print("[model_functions]: Fail to import the CLUMPY template from: {0}".format(clumpyFile))
-    ip = None
+#clumpyFile = template_path+"clumpy_models_201410_tvavg.hdf5"
+clumpyFile = template_path+"clumpy_fnu_norm.hdf5"
+#The log10 of the data cube, which is interpolated, kept in the cache path
+clumpyLogFile = cache_path+"clumpy_fnu_norm_log10.npy"
+ip = None # The interpolator is loaded at the first call of CLUMPY_intp()
+def load_logCube(dset, shape):
+    """
+    Return the log10 of the CLUMPY data cube, as a hypercube of the shape,
+    mapped read-only from clumpyLogFile in the cache path ($GSF_CACHE or
+    ~/.cache/gsf/), so that it is shared by all the processes on the node.
+    The file is written once from the dataset, and it is written again if
+    it is older than the template.  The cube is read into the process if the
+    file cannot be written.
+    """
+    if not os.path.isdir(cache_path):
+        try:
+            os.makedirs(cache_path)
+        except OSError: #Made by another process, or the lock below fails
+            pass
+    try:
+        #-> The lock makes the other processes wait until the file is written.
+        fpLock = open("{0}.lock".format(clumpyLogFile), "a")
+    except IOError:
+        print("[model_functions]: Cannot write {0}, the CLUMPY cube is not shared!".format(clumpyLogFile))
+        return np.log10(dset[...]).reshape(shape, order="F")
+    fcntl.flock(fpLock, fcntl.LOCK_EX)
+    try:
+        if (not os.path.isfile(clumpyLogFile)) or \
+           (os.path.getmtime(clumpyLogFile) < os.path.getmtime(clumpyFile)):
+            tempPath = "{0}.{1}.tmp".format(clumpyLogFile, os.getpid())
+            logCube = np.lib.format.open_memmap(tempPath, mode="w+", dtype=dset.dtype,
+                                                shape=shape)
+            if dset.shape == shape:
+                #-> Write the cube slice by slice to avoid a private copy.
+                for loop in range(shape[0]):
+                    logCube[loop] = np.log10(dset[loop])
+            else:
+                logCube[...] = np.log10(dset[...]).reshape(shape, order="F")
+            logCube.flush()
+            del logCube
+            os.rename(tempPath, clumpyLogFile)
+    finally:
+        fcntl.flock(fpLock, fcntl.LOCK_UN)
+        fpLock.close()
+    #-> A plain array view keeps the memory map open.
+    return np.load(clumpyLogFile, mmap_mode="r").view(np.ndarray)
+
+def load_clumpy():
+    """
+    Load the CLUMPY template and build the interpolator.  The data cube is
+    only read when the model is used, and its log10 is memory mapped (see
+    load_logCube()).
+    """
+    global ip
+    if ip is None:
+        h = None
+        try:
+            h = h5py.File(clumpyFile,"r")
+            theta = [np.unique(h[par][:]) for par in ("i","tv","q","N0","sig","Y","wave")]
+            logCube = load_logCube(h["flux_tor"], tuple([len(t) for t in theta]))
+            ip = ndip.NdimInterpolation(logCube,theta,mode="log10")
+        except:
+            print("[model_functions]: Fail to import the CLUMPY template from: {0}".format(clumpyFile))
+            raise
+        finally:
+            if not h is None:
+                h.close()
+    return ip
+
 waveLim = [1e-2, 1e3]
-def CLUMPY_intp(logL, i, tv, q, N0, sigma, Y, wave, DL, z, frame="rest", t=ip, waveLim=waveLim):
+def CLUMPY_intp(logL, i, tv, q, N0, sigma, Y, wave, DL, z, frame="rest", t=None, waveLim=waveLim):
     """
     This function provide the dust torus MIR flux with CLUMPY model.
 
@@ -57,6 +116,7 @@ def CLUMPY_intp(logL, i, tv, q, N0, sigma, Y, wave, DL, z, frame="rest", t=ip, w
         "rest" for the rest frame SED and "obs" for the observed frame.
     t : NdimInterpolation class
         The NdimInterpolation class obtained from Nikutta"s interpolation code.
+        The default template is loaded if it is None.
     waveLim : list
         The min and max of the wavelength covered by the template.
 
@@ -69,6 +129,8 @@ def CLUMPY_intp(logL, i, tv, q, N0, sigma, Y, wave, DL, z, frame="rest", t=ip, w
     -----
     None.
     """
+    if t is None:
+        t = load_clumpy()
     vector = np.array([i, tv, q, N0, sigma, Y])
     if frame == "rest":
         idx = 2.0
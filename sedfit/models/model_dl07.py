@@ -1,6 +1,5 @@
 import numpy as np
-import cPickle as pickle
-from ..fitter.template import Template
+from ..fitter.template import load_template
 from scipy.interpolate import splev
 from ..dir_list import template_path
 
@@ -8,10 +7,7 @@ Msun = 1.9891e33 #unit: gram
 Mpc = 3.08567758e24 #unit: cm
 m_H = 1.6726219e-24 #unit: gram
 
-fp = open(template_path+"dl07_kdt_mw.tmplt")
-tp_dl07 = pickle.load(fp)
-fp.close()
-tdl07 = Template(**tp_dl07)
+tdl07 = load_template(template_path+"dl07_kdt_mw")
 modelInfo = tdl07.get_modelInfo()
 qpahList = modelInfo["qpah"]
 mdust2mh = modelInfo["mdmh"]
@@ -58,17 +54,18 @@ def DL07(logumin, logumax, qpah, loggamma, logMd, DL, z, wave, frame="rest", t=t
     umin = 10**logumin
     umax = 10**logumax
     gamma = 10**loggamma
-    pmin = t.get_nearestParameters([umin, umin, qpah])
-    qpah_min = pmin[2]
+    pmin = np.asarray(t.get_nearestParameters([umin, umin, qpah]))
+    qpah_min = pmin[..., 2]
     ppl = [umin, umax, qpah_min] # In order to avoid inconsistency, the qpah of
                                  # the pl component is matched to that of the
                                  # min component.
     fltr = (wave > waveLim[0]) & (wave < waveLim[1])
     if np.sum(fltr) == 0:
         return np.zeros_like(wave)
-    jnu_min = t(wave[fltr], pmin)
+    jnu_min = t(wave[fltr], pmin.T)
     jnu_pl  = t(wave[fltr], ppl)
-    mdmh = mdust2mh[qpahList.index(qpah_min)]
+    mdmh = [mdust2mh[qpahList.index(q)] for q in np.atleast_1d(qpah_min)]
+    mdmh = np.reshape(mdmh, np.shape(qpah_min) + (1,))
     jnu = (1 - gamma) * jnu_min + gamma * jnu_pl
     if frame == "rest":
         idx = 2.0
@@ -76,8 +73,9 @@ def DL07(logumin, logumax, qpah, loggamma, logMd, DL, z, wave, frame="rest", t=t
         idx = 1.0
     else:
         raise ValueError("The frame '{0}' is not recognised!".format(frame))
-    flux = np.zeros_like(wave)
-    flux[fltr] = (1 + z)**idx * 10**logMd * Msun/m_H * jnu/(DL * Mpc)**2 / mdmh * 1e3 #unit: mJy
+    fluxFltr = (1 + z)**idx * 10**logMd * Msun/m_H * jnu/(DL * Mpc)**2 / mdmh * 1e3 #unit: mJy
+    flux = np.zeros(fluxFltr.shape[:-1] + wave.shape)
+    flux[..., fltr] = fluxFltr
     return flux
 
 def DL07_PosPar(logumin, logumax, qpah, loggamma, logMd, t=tdl07):
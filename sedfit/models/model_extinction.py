@@ -11,11 +11,11 @@ def Calzetti00(Av, wave, Rv=3.1, waveLim=waveLim, QuietMode=True):
 
     Parameters
     ----------
-    Av : float
+    Av : float or array
         The Av, V band extinction.
     wave : array
         The wavelength to calculate the extinction, units: micron.
-    Rv : float
+    Rv : float or array
         Ratio of total to selective extinction, A_V / E(B-V).
 
     Returns
@@ -25,7 +25,7 @@ def Calzetti00(Av, wave, Rv=3.1, waveLim=waveLim, QuietMode=True):
 
     Notes
     -----
-    None.
+    If Av or Rv are arrays, the output is in shape (n, len(wave)).
     """
     #-> Check the wavelength coverage.
     fltr = (wave >= waveLim[0]) & (wave <= waveLim[1])
@@ -36,9 +36,16 @@ def Calzetti00(Av, wave, Rv=3.1, waveLim=waveLim, QuietMode=True):
         return np.ones_like(wave)
     #-> Calculate the extinction within the effective regime.
     wave_aa = wave[fltr] * 1e4
-    av = calzetti00(wave_aa, Av, Rv)
-    f0 = np.ones_like(wave)
-    f0[fltr] = 10**(-0.4 * av)
+    if np.isscalar(Av) and np.isscalar(Rv):
+        av = calzetti00(wave_aa, Av, Rv)
+    elif np.size(Rv) == 1:
+        #-> The extinction curve is linear in Av with Rv fixed.
+        av = np.reshape(Av, (-1, 1)) * calzetti00(wave_aa, 1.0, np.ravel(Rv)[0])
+    else:
+        Av, Rv = np.broadcast_arrays(np.ravel(Av), np.ravel(Rv))
+        av = np.array([calzetti00(wave_aa, a, r) for a, r in zip(Av, Rv)])
+    f0 = np.ones(av.shape[:-1] + wave.shape)
+    f0[..., fltr] = 10**(-0.4 * av)
     return f0
 
 if __name__ == "__main__":
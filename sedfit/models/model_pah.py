@@ -49,12 +49,13 @@ def pah(logLpah, wave, DL, z, frame="rest", t=tPAH, waveLim=waveLim):
         idx = 1.0
     else:
         raise ValueError("The frame '{0}' is not recognised!".format(frame))
-    flux = np.zeros_like(wave)
     fltr = (wave > waveLim[0]) & (wave < waveLim[1])
     if np.sum(fltr) == 0:
         return np.zeros_like(wave)
     f0 = (1 + z)**idx * 10**(logLpah+26) / (4 * pi * (DL * Mpc)**2.) #Convert to mJy unit
-    flux[fltr] = f0 * t(wave[fltr])
+    fluxFltr = f0 * t(wave[fltr])
+    flux = np.zeros(fluxFltr.shape[:-1] + wave.shape)
+    flux[..., fltr] = fluxFltr
     return flux
 
 if __name__ == "__main__":
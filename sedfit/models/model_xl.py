@@ -1,7 +1,6 @@
 import numpy as np
-import cPickle as pickle
 import Radiation_Model_Toolkit as rmt
-from ..fitter.template import Template
+from ..fitter.template import load_template
 from ..dir_list import template_path
 
 ls_mic = 2.99792458e14 #unit: micron/s
@@ -50,14 +49,8 @@ def Dust_Emission(T, Md, kappa, wave, DL, z, frame="rest"):
     de = (1 + z)**idx * (Md * Msun) * bb * kappa / (DL * Mpc)**2 * 1e26 #Unit: mJy
     return de
 
-fp = open(template_path+"dust_xl_kdt.tmplt", "r")
-grainModel = pickle.load(fp)
-fp.close()
-#print grainModel["readMe"]
-silDict = grainModel["Silicate"]
-graDict = grainModel["Graphite"]
-tSil = Template(**silDict)
-tGra = Template(**graDict)
+tSil = load_template(template_path+"dust_xl_kdt", "Silicate")
+tGra = load_template(template_path+"dust_xl_kdt", "Graphite")
 waveLim = [0.1, 1e3]
 
 def Torus_Emission(typeSil, size, T1Sil, T2Sil, logM1Sil, logM2Sil,
@@ -88,8 +81,9 @@ def Torus_Emission(typeSil, size, T1Sil, T2Sil, logM1Sil, logM2Sil,
     de2Sil  = Dust_Emission(T2Sil, M2Sil, kappaSil, wave[fltr], DL, z, frame)
     de1Gra  = Dust_Emission(T1Gra, M1Gra, kappaGra, wave[fltr], DL, z, frame)
     de2Gra  = Dust_Emission(T2Gra, M2Gra, kappaGra, wave[fltr], DL, z, frame)
-    deTorus = np.zeros_like(wave)
-    deTorus[fltr] = de1Sil + de2Sil + de1Gra + de2Gra
+    deFltr  = de1Sil + de2Sil + de1Gra + de2Gra
+    deTorus = np.zeros(deFltr.shape[:-1] + wave.shape)
+    deTorus[..., fltr] = deFltr
     return deTorus
 
 def Torus_Emission_PosPar(typeSil, size, T1Sil, T2Sil, logM1Sil, logM2Sil,
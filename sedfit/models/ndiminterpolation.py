@@ -70,7 +70,9 @@ class NdimInterpolation:
             severely improves the interpolation accuracy if the data
             span many orders of magnitude. This is of course only
             applicable if all entries in 'data' are greater than
-            0. Any string other that 'log' will keep 'data' as-is.
+            0. 'log10' takes 'data' as already in log10, e.g. a
+            read-only memory map, so it is used without a copy. Any
+            other string will keep 'data' as-is.
 
         Returns
         -------
@@ -175,7 +177,7 @@ class NdimInterpolation:
         elif self.order == 3:
             aux = ndimage.map_coordinates(self.coeffs,self.get_coords(vector,pivots=pivots),order=3,prefilter=False)
 
-        if self.mode == 'log':
+        if self.mode in ('log','log10'):
             aux = 10.**aux
 
         return aux
@@ -7,6 +7,7 @@ from fitter import basicclass as bc
 from . import bandfunc as bf
 from .dir_list import filter_path
 from scipy.interpolate import splrep, splev
+from scipy.sparse import csr_matrix
 from collections import OrderedDict
 import SED_Toolkit as sedt
 #import sedfit.SED_Toolkit as sedt
@@ -86,6 +87,9 @@ class SedClass(bc.DataSet):
             self.spc_WaveLength = np.max(spc_wave) - np.min(spc_wave)
             self.spc_FluxMedian = np.sqrt(np.sum((spc_flux / spc_unct)**2) / np.sum(spc_unct**-2))
         self.__bandDict = {}
+        self.__projWave = None # The wavelength of the cached band projection
+        self.__projMatrix = None
+        self.__unionWave = None # The cached union of model and spectral wavelength
         if Dist is None:
             if redshift > 1e-2:
                 #Calculate the luminosity distance
@@ -231,12 +235,27 @@ class SedClass(bc.DataSet):
             FigAx = self.plot_spc(FigAx=FigAx, **kwargs)
         return FigAx
 
+    def add_DiscreteSet(self, dSetDict):
+        bc.DataSet.add_DiscreteSet(self, dSetDict)
+        #-> The band projection and the union wavelength need to be recalculated.
+        self.__projWave = None
+        self.__projMatrix = None
+        self.__unionWave = None
+
+    def add_ContinueSet(self, cSetDict):
+        bc.DataSet.add_ContinueSet(self, cSetDict)
+        #-> The union wavelength needs to be recalculated.
+        self.__unionWave = None
+
     def add_bandpass(self, bandDict):
         for bn in bandDict.keys():
             if isinstance(bandDict[bn], bf.BandPass):
                 self.__bandDict[bn] = bandDict[bn]
             else:
                 raise ValueError('The bandpass {0} has incorrect type!'.format(bn))
+        #-> The band projection needs to be recalculated.
+        self.__projWave = None
+        self.__projMatrix = None
 
     def set_bandpass(self, bandList, sedwave, silent=True):
         z = self.redshift
@@ -308,22 +327,146 @@ class SedClass(bc.DataSet):
         wavelength : float array
             The wavelength of the input spectrum.
         flux : float array
-            The flux of the input spectrum.
+            The flux of the input spectrum, 1D or 2D.
 
         Returns
         -------
-        fluxList : list
-            The model flux at all the wavelengths of the photometric SED.
+        fluxList : list or 2D array
+            The model flux at all the wavelengths of the photometric SED.  If
+            the flux is 2D, shape (n, len(wavelength)), the result is an array
+            in shape (n, nbands).
+
+        Notes
+        -----
+        The band fluxes are calculated with the projection matrix from
+        get_projection().
+        """
+        proj = self.get_projection(wavelength)
+        flux = np.asarray(flux)
+        if flux.ndim == 1:
+            fluxList = list(proj.dot(flux))
+        else:
+            fluxList = proj.dot(flux.T).T
+        return fluxList
+
+    def get_projection(self, wavelength):
+        """
+        Get the sparse matrix to project the spectrum on the input wavelength
+        to the flux density of all the bands of the photometric data.  The
+        matrix is calculated once and reused while the wavelength is the same.
+
+        Parameters
+        ----------
+        wavelength : float array
+            The wavelength of the input spectrum.
+
+        Returns
+        -------
+        proj : csr_matrix
+            The projection matrix, shape (nbands, len(wavelength)).
 
         Notes
         -----
         None.
         """
+        projWave = self.__projWave
+        if projWave is not None:
+            if (wavelength is projWave) or np.array_equal(wavelength, projWave):
+                return self.__projMatrix
+        wavelength = np.array(wavelength)
         bandNameList = self.get_unitNameList()
-        fluxList = []
-        for bandName in bandNameList:
-            fluxList.append(self.filtering(bandName, wavelength, flux)[1])
-        return fluxList
+        rowList = []
+        colList = []
+        dataList = []
+        for loop, bandName in enumerate(bandNameList):
+            bandpass = self.__bandDict.get(bandName, None)
+            if bandpass is None:
+                raise AttributeError("The bandpass '{0}' is not found!".format(bandName))
+            index, weights = bandpass.projection(wavelength)
+            rowList.append(np.full(len(index), loop, dtype=int))
+            colList.append(index)
+            dataList.append(weights)
+        if len(bandNameList):
+            rowList = np.concatenate(rowList)
+            colList = np.concatenate(colList)
+            dataList = np.concatenate(dataList)
+        proj = csr_matrix((dataList, (rowList, colList)),
+                          shape=(len(bandNameList), len(wavelength)))
+        self.__projWave = wavelength
+        self.__projMatrix = proj
+        return proj
+
+    def get_unionWave(self, wavelength):
+        """
+        Get the union of the input wavelength and the wavelength of all the
+        spectra, so that the model can be calculated only once for both the
+        photometric and spectral data.  The result is reused while the input
+        wavelength is the same.
+
+        Parameters
+        ----------
+        wavelength : float array
+            The wavelength of the model spectrum.
+
+        Returns
+        -------
+        (waveUnion, idxModel, idxSpc) : tuple
+            The union wavelength and the indices to get the input wavelength
+            and the spectral wavelength from it.
+
+        Notes
+        -----
+        None.
+        """
+        unionWave = self.__unionWave
+        if unionWave is not None:
+            if (wavelength is unionWave[0]) or np.array_equal(wavelength, unionWave[0]):
+                return unionWave[1:]
+        wavelength = np.array(wavelength)
+        cWave = self.get_csArray('x')
+        if len(cWave) > 0:
+            waveUnion, idxInv = np.unique(np.concatenate([wavelength, cWave]),
+                                          return_inverse=True)
+            idxModel = idxInv[:len(wavelength)]
+            idxSpc = idxInv[len(wavelength):]
+        else:
+            waveUnion = wavelength
+            idxModel = slice(None)
+            idxSpc = np.array([], dtype=int)
+        self.__unionWave = (wavelength, waveUnion, idxModel, idxSpc)
+        return self.__unionWave[1:]
+
+    def model_sed(self, wavelength, fluxFunc):
+        """
+        Calculate the model flux density of both the photometric and spectral
+        data with one calculation of the model on the union wavelength.
+
+        Parameters
+        ----------
+        wavelength : float array
+            The wavelength of the model spectrum used by the photometric data.
+        fluxFunc : function
+            The function to return the model fluxes.  It may return a 2D array
+            in shape (n, len(x)) for a batch of models.
+
+        Returns
+        -------
+        (fluxPht, fluxSpc) : tuple
+            The model flux of the photometric and spectral data, lists for 1D
+            model fluxes and arrays in shape (n, ndata) for 2D model fluxes.
+
+        Notes
+        -----
+        The results are the same as model_pht() and model_spc(), since the
+        models are calculated at each wavelength independently.
+        """
+        waveUnion, idxModel, idxSpc = self.get_unionWave(wavelength)
+        fluxUnion = np.asarray(fluxFunc(waveUnion))
+        fluxPht = self.model_pht(wavelength, fluxUnion[..., idxModel])
+        fluxSpc = fluxUnion[..., idxSpc]
+        if fluxUnion.ndim == 1:
+            fluxSpc = list(fluxSpc)
+        return (fluxPht, fluxSpc)
 
     def model_spc(self, fluxFunc, cSetName=None):
         """
@@ -366,6 +509,11 @@ class SedClass(bc.DataSet):
 
     def __setstate__(self, dict):
         self.__dict__ = dict
+        self.__dict__.setdefault("_SedClass__projWave", None)
+        self.__dict__.setdefault("_SedClass__projMatrix", None)
+        self.__dict__.setdefault("_SedClass__unionWave", None)
+        self.__dict__.setdefault("_DataSet__arrayCache", {})
+        self.__dict__.setdefault("_DataSet__arrayRevision", None)
 
 
 def setSedData(targname, redshift, distance, dataDict, sedPck, silent=True):
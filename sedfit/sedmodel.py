@@ -237,9 +237,9 @@ if __name__ == "__main__":
         return config
 
     config = configImporter("/Users/shangguan/Work/Fitter/configs/config_goals_hon.py")
-    funcLib   = sedmf.funcLib
     waveModel = config.waveModel
     modelDict = config.modelDict
+    funcLib   = sedmf.load_models(modelDict)
 
     try:
         parAddDict_all = config.parAddDict_all
@@ -0,0 +1,56 @@
+#This code converts the pickled templates (*.tmplt) into the template stores
+#(*.tstore), which are loaded lazily with memory mapping.
+#
+#Usage: python template/tmplt2store.py [file1.tmplt file2.tmplt ...]
+#All the *.tmplt files in the template directory are converted if no file is
+#provided.  The files containing several templates (e.g. dust_xl_kdt.tmplt)
+#are saved as one sub-directory for each template.
+from __future__ import print_function
+import os
+import sys
+import glob
+import cPickle as pickle
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from sedfit.fitter.template import dump_store, load_template
+from sedfit.dir_list import template_path
+
+def convert(tmpltFile):
+    """
+    Convert one pickled template file into the template store.
+    """
+    tmpltPath = tmpltFile[:-len(".tmplt")]
+    storePath = "{0}.tstore".format(tmpltPath)
+    fp = open(tmpltFile, "r")
+    tmpltDict = pickle.load(fp)
+    fp.close()
+    if "tckList" in tmpltDict:
+        dump_store(tmpltDict, storePath)
+        subNameList = [None]
+    else:
+        subNameList = []
+        for subName in tmpltDict.keys():
+            if isinstance(tmpltDict[subName], dict) and ("tckList" in tmpltDict[subName]):
+                dump_store(tmpltDict[subName], os.path.join(storePath, subName))
+                subNameList.append(subName)
+    #-> Check the stored templates with the pickled ones.
+    for subName in subNameList:
+        if subName is None:
+            tDict = tmpltDict
+        else:
+            tDict = tmpltDict[subName]
+        tStore = load_template(tmpltPath, subName)
+        tckList = tStore._Template__tckList
+        for loop in range(len(tDict["tckList"])):
+            t0, c0, k0 = tDict["tckList"][loop]
+            t1, c1, k1 = tckList[loop]
+            assert (list(t0) == list(t1)) & (list(c0) == list(c1)) & (k0 == k1)
+        print("{0} -> {1} ({2} templates)".format(tmpltFile, storePath if subName is None
+              else os.path.join(storePath, subName), len(tckList)))
+
+if __name__ == "__main__":
+    if len(sys.argv) > 1:
+        fileList = sys.argv[1:]
+    else:
+        fileList = sorted(glob.glob("{0}*.tmplt".format(template_path)))
+    for tmpltFile in fileList:
+        convert(tmpltFile)